@@ -0,0 +1,169 @@
+"""
+Diffusion des événements d'alerte (Server-Sent Events).
+
+Les événements sont relevés par les écritures (crud._track_stock_changes, qui
+appelle crud._alert_events) et inscrits par crud._log_changes.
+Un seul lecteur par worker, le hub, les lit en base et les distribue en
+mémoire aux flux ouverts du site concerné : un onglet connecté ne coûte
+aucune requête tant que le stock ne change pas.
+
+Le hub est réveillé immédiatement par les écritures de son propre worker
+(notify), et relit la table toutes les ALERT_POLL_INTERVAL secondes pour les
+écritures des autres workers (une requête indexée par worker, pas par client).
+
+Les événements sont suivis par leur numéro dans le site (seq), attribué dans
+l'ordre des commits (crud._log_changes), et non par leur id : un id plus petit
+peut être validé après un plus grand, et serait sauté.
+
+Reprise après coupure : le navigateur renvoie le numéro du dernier événement
+reçu (en-tête Last-Event-ID, automatique avec EventSource) ; les événements
+manqués sont relus en base avant le direct.
+"""
+import asyncio
+import json
+from typing import AsyncIterator, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+
+from . import crud, schemas
+from .database import SessionLocal
+
+FETCH_LIMIT = 1000
+QUEUE_SIZE = 1000          # au-delà, le client trop lent est déconnecté (il reprendra)
+HEARTBEAT_INTERVAL = 15    # commentaire SSE pour garder la connexion ouverte
+RETRY_MS = 3000            # délai de reconnexion conseillé au navigateur
+
+
+def _fetch(positions: dict[int, int]) -> list[schemas.AlertEventOut]:
+    db = SessionLocal()
+    try:
+        return [
+            schemas.AlertEventOut.model_validate(event)
+            for event in crud.get_alert_events(db, positions, FETCH_LIMIT)
+        ]
+    finally:
+        db.close()
+
+
+def _last_seq(site_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return crud.get_last_alert_seq(db, site_id)
+    finally:
+        db.close()
+
+
+class _Subscriber:
+    def __init__(self, site_id: int):
+        self.site_id = site_id
+        self.queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, event: schemas.AlertEventOut) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class AlertHub:
+    def __init__(self):
+        self.positions: dict[int, int] = {}    # site → dernier numéro distribué
+        self._subscribers: dict[int, set[_Subscriber]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def notify(self) -> None:
+        """Signale de nouveaux événements ; appelable depuis n'importe quel thread."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def subscribe(self, site_id: int) -> tuple[_Subscriber, int]:
+        """Abonne au site ; renvoie aussi le numéro à partir duquel le hub distribue."""
+        last_seq = None if site_id in self.positions else await run_in_threadpool(_last_seq, site_id)
+        # Sans await d'ici au return : aucun événement ne peut être distribué entre-temps
+        self.positions.setdefault(site_id, last_seq)
+        subscriber = _Subscriber(site_id)
+        self._subscribers.setdefault(site_id, set()).add(subscriber)
+        return subscriber, self.positions[site_id]
+
+    def unsubscribe(self, subscriber: _Subscriber) -> None:
+        subscribers = self._subscribers.get(subscriber.site_id)
+        if subscribers:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.site_id]
+                self.positions.pop(subscriber.site_id, None)
+
+    async def run(self, poll_interval: int) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), poll_interval or None)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                await self._dispatch()
+        finally:
+            self._loop = None
+
+    async def _dispatch(self) -> None:
+        # Seuls les sites suivis sont relus, chacun depuis son propre numéro
+        while self.positions:
+            events = await run_in_threadpool(_fetch, dict(self.positions))
+            for event in events:
+                # Site abandonné (ou repris plus loin) pendant la lecture
+                if self.positions.get(event.site_id, event.seq) >= event.seq:
+                    continue
+                self.positions[event.site_id] = event.seq
+                for subscriber in self._subscribers.get(event.site_id, ()):
+                    subscriber.push(event)
+            if len(events) < FETCH_LIMIT:
+                return
+
+
+hub = AlertHub()
+
+
+def notify() -> None:
+    hub.notify()
+
+
+def format_event(event: schemas.AlertEventOut) -> str:
+    data = json.dumps(jsonable_encoder(event), ensure_ascii=False)
+    return f"id: {event.seq}\nevent: alert\ndata: {data}\n\n"
+
+
+async def stream(site_id: int, last_event_id: Optional[int]) -> AsyncIterator[str]:
+    """Flux SSE d'un site : événements manqués depuis `last_event_id`, puis le direct."""
+    subscriber, position = await hub.subscribe(site_id)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        # Abonné avant la relecture : rien ne se perd entre les deux, les
+        # doublons éventuels sont écartés par leur numéro.
+        sent = position if last_event_id is None else last_event_id
+        while True:
+            missed = await run_in_threadpool(_fetch, {site_id: sent})
+            for event in missed:
+                sent = event.seq
+                yield format_event(event)
+            if len(missed) < FETCH_LIMIT:
+                break
+        while not subscriber.overflowed:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event.seq > sent:
+                sent = event.seq
+                yield format_event(event)
+    finally:
+        hub.unsubscribe(subscriber)
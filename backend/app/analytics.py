@@ -0,0 +1,327 @@
+"""
+Analyses calculées en base : niveau de stock jour par jour, consommation par
+période et plus gros consommateurs.
+
+Les calculs sont faits par la base : agrégats (GROUP BY), série de jours générée
+et fonctions de fenêtre pour le niveau de stock. Python remet les lignes en
+tableaux colonnes directement exploitables par les graphiques, et complète les
+périodes sans sortie de la consommation pour renvoyer des séries denses.
+"""
+from datetime import date, timedelta
+from itertools import groupby
+from operator import itemgetter
+from typing import Literal, Optional
+
+from sqlalchemy import Date, Float, String, and_, cast, exists, func, literal, literal_column, or_, select, true, union_all
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+Grouping = Literal["product", "category", "total"]
+Period = Literal["day", "week", "month"]
+
+TOTAL_KEY = "total"
+
+def _group_columns(group_by: Grouping):
+    """(clé, libellé, colonnes du GROUP BY) du regroupement, en SQL sur products."""
+    if group_by == "product":
+        return models.Product.id, func.min(models.Product.name), (models.Product.id,)
+    if group_by == "category":
+        return models.Product.category, models.Product.category, (models.Product.category,)
+    # Constantes écrites en clair : PostgreSQL refuse un paramètre dans GROUP BY
+    return literal_column(f"'{TOTAL_KEY}'", String), literal_column("'Total'", String), ()
+
+
+def _filter_products(q, site_id: int, product_id: Optional[int], category: Optional[str]):
+    q = q.where(models.Product.site_id == site_id)
+    if product_id is not None:
+        q = q.where(models.Product.id == product_id)
+    if category:
+        q = q.where(models.Product.category == category)
+    return q
+
+
+def _days(date_from: date, date_to: date) -> list[date]:
+    return [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+
+
+# ─── Niveau de stock par jour ─────────────────────────────────────────────────
+
+def stock_levels(
+    db: Session,
+    site_id: int,
+    date_from: date,
+    date_to: date,
+    group_by: Grouping = "total",
+    product_id: Optional[int] = None,
+    category: Optional[str] = None,
+) -> schemas.StockLevels:
+    """Stock en fin de journée, repris des photos de stock (crud.take_stock_snapshot).
+
+    Une photo donne le stock réel de son jour, sorties ramenées à zéro et
+    corrections manuelles comprises, qu'aucun mouvement ne décrit ; entre deux
+    photos, le niveau suit les mouvements :
+
+        niveau(j) = photo(A) + Σ mouvements de ]A, j]    A : dernière photo ≤ j
+
+    Un produit absent de la photo A (créé depuis) y compte pour sa quantité
+    actuelle moins les mouvements postérieurs à A. Sans photo antérieure à
+    date_from, le premier jour est reconstitué ainsi, à rebours depuis la
+    quantité actuelle. Aujourd'hui, sans photo, le niveau est la quantité
+    actuelle (moins les mouvements datés plus tard).
+
+    Tout est calculé en une requête : série de jours depuis la dernière photo
+    avant la période, niveau de départ aux jours de photo (et au premier jour,
+    et aujourd'hui), puis somme cumulée des mouvements par fonction de fenêtre
+    jusqu'au départ suivant.
+    """
+    key, label, group_cols = _group_columns(group_by)
+    snapshot = models.StockSnapshot
+
+    first_anchor = db.scalar(
+        select(func.max(snapshot.date)).where(snapshot.site_id == site_id, snapshot.date <= date_from)
+    )
+    start = first_anchor or date_from
+    today = date.today()
+
+    current = _filter_products(
+        select(
+            key.label("key"),
+            label.label("label"),
+            func.sum(models.Product.quantity).label("quantity"),
+        ).group_by(*group_cols),
+        site_id, product_id, category,
+    ).subquery()
+    days = _date_series(db.get_bind().dialect.name, start, date_to)
+
+    # Jours de départ : premier jour de la série, jours de photo, aujourd'hui.
+    # MATERIALIZED : calculés une fois, et non pour chaque produit (SQLite
+    # intègre sinon la CTE dans la requête qui la lit)
+    reset_days = select(days.c.day).where(or_(
+        days.c.day == start,
+        days.c.day == today,
+        exists().where(snapshot.site_id == site_id, snapshot.date == days.c.day),
+    )).cte("reset_days").prefix_with("MATERIALIZED")
+
+    # Niveau de départ : les photos du jour, plus les produits absents de la
+    # photo (ou sans photo ce jour-là) pour leur quantité actuelle moins les
+    # mouvements datés après ce jour
+    photographed = _filter_products(
+        select(key.label("key"), snapshot.date.label("day"), func.sum(snapshot.quantity).label("level"))
+        .join(models.Product, models.Product.id == snapshot.product_id)
+        .where(snapshot.site_id == site_id, snapshot.date >= start, snapshot.date <= date_to)
+        .group_by(*group_cols, snapshot.date),
+        site_id, product_id, category,
+    )
+    later = (
+        select(func.coalesce(func.sum(models.SIGNED_QUANTITY), 0))
+        .where(models.Movement.product_id == models.Product.id, models.Movement.date > reset_days.c.day)
+        .scalar_subquery()
+    )
+    unphotographed = _filter_products(
+        select(key.label("key"), reset_days.c.day, func.sum(models.Product.quantity - later).label("level"))
+        .select_from(models.Product)
+        .join(reset_days, true())
+        .where(~exists().where(snapshot.product_id == models.Product.id, snapshot.date == reset_days.c.day))
+        .group_by(*group_cols, reset_days.c.day),
+        site_id, product_id, category,
+    )
+    starting = union_all(photographed, unphotographed).subquery()
+    resets = (
+        select(starting.c.key, starting.c.day, func.sum(starting.c.level).label("level"))
+        .group_by(starting.c.key, starting.c.day)
+        .subquery()
+    )
+
+    daily = _filter_products(
+        select(key.label("key"), models.Movement.date.label("day"), func.sum(models.SIGNED_QUANTITY).label("net"))
+        .select_from(models.Movement)
+        .join(models.Product, models.Product.id == models.Movement.product_id)
+        .where(models.Movement.site_id == site_id, models.Movement.date > start, models.Movement.date <= date_to)
+        .group_by(*group_cols, models.Movement.date),
+        site_id, product_id, category,
+    ).subquery()
+
+    # Un segment par jour de départ : son niveau, puis les mouvements des jours suivants
+    grid = (
+        select(
+            current.c.key,
+            current.c.label,
+            days.c.day,
+            func.coalesce(resets.c.level, daily.c.net, 0).label("change"),
+            func.count(resets.c.level).over(partition_by=current.c.key, order_by=days.c.day).label("segment"),
+        )
+        .select_from(current)
+        .join(days, true())
+        .outerjoin(resets, and_(resets.c.key == current.c.key, resets.c.day == days.c.day))
+        .outerjoin(daily, and_(daily.c.key == current.c.key, daily.c.day == days.c.day))
+        .where(current.c.quantity.is_not(None))    # regroupement "total" sans aucun produit
+        .subquery()
+    )
+    levels = select(
+        grid.c.key,
+        grid.c.label,
+        grid.c.day,
+        func.sum(grid.c.change, type_=Float).over(
+            partition_by=(grid.c.key, grid.c.segment), order_by=grid.c.day,
+        ).label("level"),
+    ).subquery()
+    rows = db.execute(
+        select(levels.c.key, levels.c.label, levels.c.level)
+        .where(levels.c.day >= date_from)
+        .order_by(levels.c.label, levels.c.key, levels.c.day)
+    )
+
+    series = [
+        schemas.AnalyticsSeries(key=k, label=lbl, values=[level for _, _, level in group])
+        for (k, lbl), group in groupby(rows, key=itemgetter(0, 1))
+    ]
+    return schemas.StockLevels(dates=_days(date_from, date_to), series=series)
+
+
+def _date_series(dialect: str, start: date, end: date):
+    """Jours de start à end inclus, en SQL (colonne `day`)."""
+    if dialect == "postgresql":
+        day = cast(func.generate_series(start, end, literal_column("interval '1 day'")), Date)
+        return select(day.label("day")).cte("days")
+    days = select(literal(start, Date).label("day")).cte("days", recursive=True)
+    return days.union_all(
+        select(func.date(days.c.day, "+1 day", type_=Date)).where(days.c.day < end)
+    )
+
+
+# ─── Consommation par période ─────────────────────────────────────────────────
+
+def period_start(day: date, period: Period) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start: date, period: Period) -> date:
+    if period == "week":
+        return start + timedelta(days=7)
+    if period == "month":
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def previous_period(start: date, period: Period) -> date:
+    if period == "month":
+        return (start - timedelta(days=1)).replace(day=1)
+    return start - timedelta(days=7 if period == "week" else 1)
+
+
+def _period_column(dialect: str, period: Period):
+    """Premier jour de la période (lundi pour les semaines) en SQL."""
+    col = models.Movement.date
+    if period == "day":
+        return col
+    if dialect == "postgresql":
+        # Unité écrite en clair : l'expression doit être identique dans SELECT et GROUP BY
+        return cast(func.date_trunc(literal_column(f"'{period}'"), col), Date)
+    if period == "week":
+        return func.date(col, "weekday 0", "-6 days", type_=Date)
+    return func.date(col, "start of month", type_=Date)
+
+
+def consumption(
+    db: Session,
+    site_id: int,
+    date_from: date,
+    date_to: date,
+    period: Period = "month",
+    group_by: Grouping = "total",
+    product_id: Optional[int] = None,
+    category: Optional[str] = None,
+) -> schemas.Consumption:
+    """Quantités sorties par période, avec la période précédente en regard."""
+    key, label, group_cols = _group_columns(group_by)
+    bucket = _period_column(db.get_bind().dialect.name, period).label("bucket")
+
+    first = period_start(date_from, period)
+    before_first = previous_period(first, period)
+    rows = db.execute(
+        _filter_products(
+            select(key.label("key"), label.label("label"), bucket,
+                   func.sum(models.Movement.quantity).label("consumed"))
+            .select_from(models.Movement)
+            .join(models.Product, models.Product.id == models.Movement.product_id)
+            .where(
+                models.Movement.site_id == site_id,
+                models.Movement.type == "Sortie",
+                models.Movement.date >= before_first,
+                models.Movement.date <= date_to,
+            )
+            .group_by(*group_cols, bucket),
+            site_id, product_id, category,
+        )
+    ).all()
+
+    periods = []
+    start = first
+    while start <= date_to:
+        periods.append(start)
+        start = next_period(start, period)
+    index = {p: i + 1 for i, p in enumerate(periods)}
+    index[before_first] = 0
+
+    grouped: dict = {}
+    for row in rows:
+        values, _ = grouped.setdefault(row.key, ([0.0] * (len(periods) + 1), row.label))
+        values[index[row.bucket]] += float(row.consumed)
+
+    series = [
+        schemas.ConsumptionSeries(key=k, label=lbl, values=values[1:], previous=values[:-1])
+        for k, (values, lbl) in sorted(grouped.items(), key=lambda item: item[1][1])
+    ]
+    return schemas.Consumption(period=period, periods=periods, series=series)
+
+
+# ─── Plus gros consommateurs ──────────────────────────────────────────────────
+
+def top_consumers(
+    db: Session,
+    site_id: int,
+    date_from: date,
+    date_to: date,
+    limit: int = 10,
+    category: Optional[str] = None,
+) -> schemas.TopConsumers:
+    consumed = func.sum(models.Movement.quantity)
+    days = (date_to - date_from).days + 1
+    rows = db.execute(
+        _filter_products(
+            select(
+                models.Product.id,
+                models.Product.name,
+                models.Product.category,
+                models.Product.unit,
+                consumed.label("consumed"),
+                # La fenêtre est évaluée avant LIMIT : total de tous les produits
+                func.sum(consumed).over().label("total"),
+            )
+            .join(models.Movement, models.Movement.product_id == models.Product.id)
+            .where(
+                models.Movement.site_id == site_id,
+                models.Movement.type == "Sortie",
+                models.Movement.date >= date_from,
+                models.Movement.date <= date_to,
+            )
+            .group_by(models.Product.id, models.Product.name, models.Product.category, models.Product.unit)
+            .order_by(consumed.desc(), models.Product.id)
+            .limit(limit),
+            site_id, None, category,
+        )
+    ).all()
+    return schemas.TopConsumers(
+        product_id=[r.id for r in rows],
+        name=[r.name for r in rows],
+        category=[r.category for r in rows],
+        unit=[r.unit for r in rows],
+        consumed=[float(r.consumed) for r in rows],
+        daily_average=[float(r.consumed) / days for r in rows],
+        share=[float(r.consumed / r.total) for r in rows],
+    )
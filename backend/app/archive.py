@@ -0,0 +1,319 @@
+"""
+Archivage des vieux mouvements en fichiers Parquet.
+
+Les mois antérieurs à la fenêtre de rétention (MOVEMENT_RETENTION_MONTHS) sont
+écrits dans ARCHIVE_DIR, un fichier par mois trié comme l'API (date, id
+décroissants), puis retirés de la base : partition détachée puis supprimée si
+movements est partitionnée par mois, DELETE sinon. Le nom du produit est
+recopié dans l'archive, qui reste lisible après sa suppression. Une partition
+détachée lors d'un passage interrompu est reprise au passage suivant.
+
+L'export des mouvements relit ces fichiers (iter_archived_movements) : un
+export sur une période archivée renvoie les mêmes lignes qu'avant archivage.
+Les stocks et les photos de fin de mois ne sont pas touchés ; la valorisation
+à une date archivée reste exacte en fin de mois.
+
+Nécessite le paquet `pyarrow`.
+
+Utilisation : python -m app.archive [--months N] [--dir DOSSIER]
+"""
+import heapq
+import os
+import re
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator, NamedTuple, Optional
+
+from sqlalchemy import Engine, MetaData, Table, func, select, text
+from sqlalchemy.orm import Session
+
+from . import crud, models, partitions
+from .config import settings
+
+BATCH_SIZE = 10_000
+FILE_PATTERN = re.compile(r"^movements_(\d{4})_(\d{2})(?:\.(\d+))?\.parquet$")
+
+
+class ArchivedMovement(NamedTuple):
+    """Ligne d'archive, mêmes champs que crud.MOVEMENT_COLUMNS."""
+    id:           int
+    site_id:      int
+    product_id:   int
+    product_name: str
+    type:         str
+    quantity:     Decimal
+    date:         date
+    comment:      Optional[str]
+    created_at:   Optional[datetime]
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("L'archivage des mouvements nécessite le paquet `pyarrow`") from e
+    return pyarrow
+
+
+def _schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("site_id", pa.int32()),
+        ("product_id", pa.int64()),
+        ("product_name", pa.string()),
+        ("type", pa.string()),
+        ("quantity", pa.decimal128(10, 2)),
+        ("date", pa.date32()),
+        ("comment", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+    ])
+
+
+def _archive_files(directory: str) -> dict[date, list[str]]:
+    """Fichiers d'archive par mois (un mois peut avoir plusieurs parties)."""
+    files: dict[date, list[str]] = {}
+    if not os.path.isdir(directory):
+        return files
+    for name in sorted(os.listdir(directory)):
+        match = FILE_PATTERN.match(name)
+        if match:
+            month = date(int(match[1]), int(match[2]), 1)
+            files.setdefault(month, []).append(os.path.join(directory, name))
+    return files
+
+
+def _new_file(directory: str, month: date) -> str:
+    """Chemin du prochain fichier du mois : movements_AAAA_MM.parquet, puis .1, .2…"""
+    base = partitions.month_partition(month)
+    path, part = os.path.join(directory, f"{base}.parquet"), 0
+    while os.path.exists(path):
+        part += 1
+        path = os.path.join(directory, f"{base}.{part}.parquet")
+    return path
+
+
+# ─── Écriture ─────────────────────────────────────────────────────────────────
+
+def _source(name: str) -> Table:
+    """Table movements, ou une de ses partitions détachées (mêmes colonnes)."""
+    table = models.Movement.__table__
+    return table if name == table.name else table.to_metadata(MetaData(), name=name)
+
+
+def _month_filter(source: Table, month: date):
+    return source.c.date >= month, source.c.date < partitions.add_months(month, 1)
+
+
+def _write_month(conn, source: Table, month: date, max_id: int, directory: str) -> tuple[str, int]:
+    """Écrit les mouvements du mois (id <= max_id) ; renvoie (fichier, nombre de lignes)."""
+    pa = _pyarrow()
+    schema = _schema(pa)
+    product = models.Product
+    rows = conn.execution_options(yield_per=BATCH_SIZE).execute(
+        select(
+            source.c.id, source.c.site_id, source.c.product_id, product.name.label("product_name"),
+            source.c.type, source.c.quantity, source.c.date, source.c.comment, source.c.created_at,
+        )
+        .join(product, product.id == source.c.product_id)
+        .where(*_month_filter(source, month), source.c.id <= max_id)
+        .order_by(source.c.date.desc(), source.c.id.desc())
+    )
+    os.makedirs(directory, exist_ok=True)
+    path = _new_file(directory, month)
+    tmp, written = path + ".tmp", 0
+    with pa.parquet.ParquetWriter(tmp, schema, compression="zstd") as writer:
+        for batch in rows.partitions():
+            records = [
+                {**row._mapping, "quantity": Decimal(row.quantity).quantize(Decimal("0.01"))}
+                for row in batch
+            ]
+            writer.write_table(pa.Table.from_pylist(records, schema=schema))
+            written += len(records)
+    os.replace(tmp, path)    # fichier visible seulement une fois complet
+    return path, written
+
+
+def _archive_rows(engine: Engine, name: str, month: date, directory: str, drop: bool = False) -> int:
+    """Archive les lignes du mois présentes dans `name`, puis les supprime.
+
+    Seules les lignes existant au moment de l'écriture (id <= max) sont
+    supprimées, dans la même transaction ; si leur nombre ne correspond pas,
+    rien n'est supprimé et le fichier est retiré. `drop` : `name` est une
+    partition détachée, supprimée d'un DROP dans cette même transaction.
+    """
+    source = _source(name)
+    path, written = None, 0
+    try:
+        with engine.begin() as conn:
+            max_id = conn.scalar(select(func.max(source.c.id)).where(*_month_filter(source, month)))
+            if max_id is not None:
+                path, written = _write_month(conn, source, month, max_id, directory)
+            if drop:
+                conn.exec_driver_sql(f"DROP TABLE {name}")
+            elif max_id is not None:
+                deleted = conn.execute(
+                    source.delete().where(*_month_filter(source, month), source.c.id <= max_id)
+                ).rowcount
+                if deleted != written:
+                    raise RuntimeError(
+                        f"{month:%Y-%m} : {written} lignes archivées mais {deleted} à supprimer, "
+                        "archivage du mois annulé"
+                    )
+    except Exception:
+        # Pas de fichier pour des lignes restées en base : l'export les lirait deux fois
+        if path:
+            os.remove(path)
+        raise
+    return written
+
+
+def archive_movements(engine: Engine, months: int, directory: str) -> dict[date, int]:
+    """Archive les mois antérieurs aux `months` derniers (mois courant compris)."""
+    _pyarrow()
+    cutoff = partitions.add_months(date.today().replace(day=1), -(months - 1))
+    with engine.connect() as conn:
+        oldest = conn.scalar(select(func.min(models.Movement.date)))
+        by_month = partitions.strategy(conn) == "month"
+    archived: dict[date, int] = {}
+    if by_month:
+        # Partitions restées détachées par un passage interrompu
+        for name, month in _detached_partitions(engine):
+            if month < cutoff:
+                archived[month] = _archive_rows(engine, name, month, directory, drop=True)
+    month = oldest.replace(day=1) if oldest else cutoff
+    while month < cutoff:
+        count = 0
+        if by_month:
+            count += _archive_partition(engine, month, directory)
+        # Table non partitionnée, ou lignes du mois rangées dans DEFAULT
+        count += _archive_rows(engine, "movements", month, directory)
+        if count:
+            archived[month] = archived.get(month, 0) + count
+        month = partitions.add_months(month, 1)
+    return archived
+
+
+def _detached_partitions(engine: Engine) -> list[tuple[str, date]]:
+    """Partitions mensuelles détachées de movements mais pas encore supprimées."""
+    with engine.connect() as conn:
+        names = conn.scalars(text(
+            "SELECT relname FROM pg_class "
+            "WHERE relkind = 'r' AND NOT relispartition AND relname ~ '^movements_[0-9]{4}_[0-9]{2}$' "
+            "AND relnamespace = current_schema()::regnamespace"
+        )).all()
+    return sorted((name, date(int(name[10:14]), int(name[15:17]), 1)) for name in names)
+
+
+def _archive_partition(engine: Engine, month: date, directory: str) -> int:
+    """Détache la partition du mois, l'archive puis la supprime en un DROP.
+
+    Détachée, elle ne reçoit plus d'écriture : pas besoin de DELETE ligne à
+    ligne. Le DETACH est validé seul, pour ne pas verrouiller movements
+    pendant l'écriture du fichier ; fichier et DROP sont ensuite validés
+    ensemble. En cas d'échec la partition est rattachée ; si le processus
+    s'arrête avant, elle reste détachée sous son nom et archive_movements la
+    reprend au passage suivant.
+    """
+    name = partitions.month_partition(month)
+    with engine.begin() as conn:
+        attached = conn.scalar(
+            text("SELECT relispartition FROM pg_class WHERE oid = to_regclass(:t)"), {"t": name}
+        )
+        if not attached:
+            return 0
+        conn.exec_driver_sql(f"ALTER TABLE movements DETACH PARTITION {name}")
+    try:
+        return _archive_rows(engine, name, month, directory, drop=True)
+    except Exception:
+        end = partitions.add_months(month, 1)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                f"ALTER TABLE movements ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        raise
+
+
+# ─── Lecture ──────────────────────────────────────────────────────────────────
+
+def has_archives(directory: str, date_from: Optional[date] = None) -> bool:
+    files = _archive_files(directory)
+    return any(date_from is None or partitions.add_months(m, 1) > date_from for m in files)
+
+
+def archives_readable(date_from: Optional[date] = None) -> bool:
+    """Faux si des archives concernent la période mais que pyarrow manque.
+
+    À vérifier avant de commencer une réponse en flux : l'erreur ne peut plus
+    être renvoyée une fois les premières lignes parties.
+    """
+    if not has_archives(settings.archive_dir, date_from):
+        return True
+    try:
+        _pyarrow()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _read_file(pa, path: str, filters: list) -> list[ArchivedMovement]:
+    table = pa.parquet.read_table(path, filters=filters or None)
+    return [ArchivedMovement(**row) for row in table.to_pylist()]
+
+
+def iter_archived_movements(
+    directory: str,
+    site_id: int,
+    product_id: Optional[int] = None,
+    type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> Iterator[ArchivedMovement]:
+    """Mouvements archivés filtrés comme crud.movement_rows_stmt, (date, id) décroissants.
+
+    Un mois à la fois en mémoire ; les fichiers hors période ne sont pas ouverts.
+    """
+    pa = _pyarrow()
+    filters = [("site_id", "=", site_id)]
+    if product_id:
+        filters.append(("product_id", "=", product_id))
+    if type:
+        filters.append(("type", "=", type))
+    if date_from:
+        filters.append(("date", ">=", date_from))
+    if date_to:
+        filters.append(("date", "<=", date_to))
+    for month, paths in sorted(_archive_files(directory).items(), reverse=True):
+        if date_to and month > date_to:
+            continue
+        if date_from and partitions.add_months(month, 1) <= date_from:
+            break
+        parts = [_read_file(pa, path, filters) for path in paths]
+        yield from heapq.merge(*parts, key=lambda r: (r.date, r.id), reverse=True)
+
+
+def iter_movement_rows_with_archives(db: Session, site_id: int, **filters):
+    """crud.iter_movement_rows complété par les archives, dans le même ordre.
+
+    Un mouvement antidaté saisi après archivage de son mois est en base : les
+    deux flux triés sont fusionnés plutôt que mis bout à bout.
+    """
+    live = crud.iter_movement_rows(db, site_id, **filters)
+    if not has_archives(settings.archive_dir, filters.get("date_from")):
+        return live
+    archived = iter_archived_movements(settings.archive_dir, site_id, **filters)
+    return heapq.merge(live, archived, key=lambda r: (r.date, r.id), reverse=True)
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    args = sys.argv[1:]
+    months = int(args[args.index("--months") + 1]) if "--months" in args else settings.movement_retention_months
+    directory = args[args.index("--dir") + 1] if "--dir" in args else settings.archive_dir
+    result = archive_movements(engine, months, directory)
+    for month, count in sorted(result.items()):
+        print(f"  {month:%Y-%m} : {count} mouvements")
+    print(f"✓ {sum(result.values())} mouvements archivés dans {directory}.")
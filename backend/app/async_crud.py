@@ -0,0 +1,93 @@
+"""
+Équivalents asynchrones des fonctions de crud.py utilisées par les routes
+les plus sollicitées.
+
+Les lectures sont écrites en SQLAlchemy 2.0 asynchrone ; les écritures et le
+tableau de bord réutilisent tels quels les fonctions synchrones via
+AsyncSession.run_sync (même transaction, mêmes compteurs, même invalidation
+du cache), sans bloquer la boucle d'événements.
+"""
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud, models, schemas
+
+
+async def get_product_rows(db: AsyncSession, site_id: int, category: Optional[str] = None) -> list:
+    result = await db.execute(crud.product_rows_stmt(site_id, category))
+    return list(result)
+
+
+async def get_product(db: AsyncSession, site_id: int, product_id: int) -> Optional[models.Product]:
+    return await db.scalar(
+        select(models.Product).where(models.Product.site_id == site_id, models.Product.id == product_id)
+    )
+
+
+async def get_alert_product_rows(db: AsyncSession, site_id: int) -> list:
+    result = await db.execute(crud.alert_product_rows_stmt(site_id))
+    return list(result)
+
+
+async def get_movement_rows(
+    db: AsyncSession,
+    site_id: int,
+    product_id: Optional[int] = None,
+    type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> list:
+    stmt = crud.movement_rows_stmt(
+        site_id,
+        product_id=product_id,
+        type=type,
+        date_from=date_from,
+        date_to=date_to,
+        cursor=cursor,
+        limit=limit,
+    )
+    result = await db.execute(stmt)
+    return list(result)
+
+
+async def create_movement(
+    db: AsyncSession, site_id: int, data: schemas.MovementCreate
+) -> Optional[schemas.MovementOut]:
+    def create(session) -> Optional[schemas.MovementOut]:
+        movement = crud.create_movement(session, site_id, data)
+        if movement is None:
+            return None
+        return schemas.MovementOut(
+            id=movement.id,
+            site_id=movement.site_id,
+            product_id=movement.product_id,
+            product_name=movement.product.name,
+            type=movement.type,
+            quantity=movement.quantity,
+            date=movement.date,
+            comment=movement.comment,
+            created_at=movement.created_at,
+        )
+
+    return await db.run_sync(create)
+
+
+async def create_movements_batch(
+    db: AsyncSession, site_id: int, items: list[schemas.MovementCreate]
+) -> Optional[list[schemas.MovementOut]]:
+    return await db.run_sync(crud.create_movements_batch, site_id, items)
+
+
+async def create_movements_once(
+    db: AsyncSession, site_id: int, items: list[schemas.QueuedMovement]
+) -> list[schemas.QueuedMovementResult]:
+    return await db.run_sync(crud.create_movements_once, site_id, items)
+
+
+async def get_dashboard_stats(db: AsyncSession, site_id: int) -> schemas.DashboardStats:
+    return await db.run_sync(crud.get_dashboard_stats, site_id)
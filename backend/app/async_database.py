@@ -0,0 +1,101 @@
+"""
+Pile base de données asynchrone (SQLAlchemy asyncio + asyncpg / aiosqlite).
+
+Activée par DB_ASYNC=true : les routes les plus sollicitées sont alors servies
+par routers/async_routes.py, sans passer par le pool de threads de FastAPI.
+Expérimental : aucun gain de débit n'a été mesuré (débit égal au mode
+synchrone sur SQLite, non mesuré sur PostgreSQL). À n'activer qu'après avoir
+mesuré sur sa propre base avec bench/async_vs_sync.py.
+Le moteur n'est créé qu'au premier usage, le pilote asynchrone n'est donc
+requis que si ce mode est activé.
+"""
+import asyncio
+import re
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from .config import settings
+from .database import pool_limits
+
+_ASYNC_DRIVERS = {
+    "postgres":            "postgresql+asyncpg",
+    "postgresql":          "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite":              "sqlite+aiosqlite",
+}
+
+
+def async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    if not sep or scheme not in _ASYNC_DRIVERS:
+        return url
+    driver = _ASYNC_DRIVERS[scheme]
+    rest = re.sub(r"([?&])pgbouncer=true&?", r"\1", rest).rstrip("?&")
+    if driver.endswith("asyncpg"):
+        # asyncpg attend ssl=… là où psycopg2 attend sslmode=…
+        rest = rest.replace("sslmode=", "ssl=")
+        if "pgbouncer=true" in url:
+            # pgbouncer en mode transaction ne supporte pas les requêtes préparées
+            rest += ("&" if "?" in rest else "?") + "prepared_statement_cache_size=0"
+    return f"{driver}://{rest}"
+
+
+_engines: dict[bool, AsyncEngine] = {}
+_sessionmakers: dict[bool, async_sessionmaker[AsyncSession]] = {}
+
+
+def get_async_engine(replica: bool = False) -> AsyncEngine:
+    """Moteur du primaire, ou du réplica en lecture (DATABASE_REPLICA_URL)."""
+    if replica not in _engines:
+        source = settings.database_replica_url if replica else settings.database_url
+        url = async_url(source)
+        options = {"pool_pre_ping": True}
+        connect_args = {}
+        if url.startswith("postgresql+asyncpg") and "pgbouncer=true" in source:
+            connect_args["statement_cache_size"] = 0
+        if not url.startswith("sqlite"):
+            # Moitié du budget de connexions du worker, l'autre allant à la pile synchrone
+            pool_size, max_overflow = pool_limits(settings.async_pool_size, settings.async_max_overflow, 0.5)
+            options.update(pool_size=pool_size, max_overflow=max_overflow)
+        engine = create_async_engine(url, connect_args=connect_args, **options)
+        if settings.metrics_enabled:
+            from . import metrics
+            metrics.instrument_engine(engine.sync_engine, "async_replica" if replica else "async")
+        _engines[replica] = engine
+        _sessionmakers[replica] = async_sessionmaker(
+            engine, autoflush=False, expire_on_commit=False, info={"replica": replica}
+        )
+    return _engines[replica]
+
+
+def AsyncSessionLocal(replica: bool = False) -> AsyncSession:
+    get_async_engine(replica)
+    return _sessionmakers[replica]()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def prewarm_async_pool(replica: bool = False) -> int:
+    """Équivalent asynchrone de database.prewarm_pool."""
+    engine = get_async_engine(replica)
+    count = engine.pool.size() if hasattr(engine.pool, "size") else 0
+    connections = await asyncio.gather(
+        *(engine.connect().start() for _ in range(count)), return_exceptions=True
+    )
+    opened = [c for c in connections if not isinstance(c, BaseException)]
+    for connection in opened:
+        await connection.close()
+    errors = [c for c in connections if isinstance(c, BaseException)]
+    if errors:
+        raise errors[0]
+    return len(opened)
+
+
+async def dispose_async_engine() -> None:
+    for engine in _engines.values():
+        await engine.dispose()
+    _engines.clear()
+    _sessionmakers.clear()
@@ -0,0 +1,243 @@
+"""
+Cache des réponses JSON des routes de lecture très sollicitées.
+
+Chaque entrée est rangée sous un espace de noms (produits, alertes, tableau de
+bord, analyses, prévisions) et un site, avec les numéros de version courants de cet espace
+et de cet espace pour ce site. Les fonctions d'écriture de crud.py incrémentent
+la version des espaces qu'elles modifient, pour leur site seulement : les
+anciennes entrées ne sont plus jamais lues et disparaissent d'elles-mêmes (LRU
+ou TTL). Avec le backend Redis, versions et entrées sont partagées entre les
+workers uvicorn ; le backend mémoire, propre à chaque worker, n'est utilisé
+qu'avec un seul worker (WEB_CONCURRENCY=1), sinon le cache est désactivé.
+
+Une réponse construite à partir du réplica en lecture (replicas.py) peut
+précéder une écriture déjà validée sur le primaire : elle est rangée sous une
+clé à part, que ne lisent que les requêtes servies par le réplica, et ne vit
+que REPLICA_MAX_LAG secondes.
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from .config import settings
+
+PRODUCTS = "products"
+ALERTS = "alerts"
+DASHBOARD = "dashboard"
+ANALYTICS = "analytics"
+FORECASTS = "forecasts"
+
+
+def scoped(namespace: str, site_id: int) -> str:
+    """Espace de noms propre à un site : une écriture n'invalide que son site."""
+    return f"{namespace}@{site_id}"
+
+
+class CacheEntry(NamedTuple):
+    etag: str
+    body: bytes
+
+
+# ─── Backends ─────────────────────────────────────────────────────────────────
+
+class MemoryBackend:
+    """LRU + TTL en mémoire, propre à chaque worker."""
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, CacheEntry]] = OrderedDict()
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def bump(self, namespace: str) -> None:
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry, ttl: Optional[int] = None) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisBackend:
+    """Cache partagé entre workers (nécessite le paquet `redis`)."""
+
+    PREFIX = "stock-manager:cache:"
+
+    def __init__(self, url: str, ttl: int):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis nécessite le paquet `redis`") from e
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def version(self, namespace: str) -> int:
+        return int(self.client.get(f"{self.PREFIX}version:{namespace}") or 0)
+
+    def bump(self, namespace: str) -> None:
+        self.client.incr(f"{self.PREFIX}version:{namespace}")
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        raw = self.client.get(self.PREFIX + key)
+        if raw is None:
+            return None
+        etag, _, body = raw.partition(b"\n")
+        return CacheEntry(etag.decode(), body)
+
+    def set(self, key: str, entry: CacheEntry, ttl: Optional[int] = None) -> None:
+        self.client.set(self.PREFIX + key, entry.etag.encode() + b"\n" + entry.body, ex=ttl or self.ttl)
+
+
+def _make_backend():
+    if settings.cache_backend == "none":
+        return None
+    if settings.cache_backend == "redis":
+        return RedisBackend(settings.redis_url, settings.cache_ttl)
+    if settings.web_concurrency > 1:
+        # Versions propres à chaque worker : une écriture servie par l'un
+        # n'invaliderait pas le cache des autres (listes et 304 périmés)
+        print(
+            f"[WARNING] CACHE_BACKEND=memory avec WEB_CONCURRENCY={settings.web_concurrency} : "
+            "cache des réponses désactivé, utiliser CACHE_BACKEND=redis"
+        )
+        return None
+    return MemoryBackend(settings.cache_max_entries, settings.cache_ttl)
+
+
+backend = _make_backend()
+
+# Durée de vie des réponses construites à partir du réplica
+REPLICA_TTL = max(1, math.ceil(settings.replica_max_lag))
+
+
+# ─── Utilisation ──────────────────────────────────────────────────────────────
+
+def invalidate(*namespaces: str) -> None:
+    """À appeler par les écritures une fois la transaction validée."""
+    if backend is None:
+        return
+    for namespace in namespaces:
+        try:
+            backend.bump(namespace)
+        except Exception as e:
+            print(f"[WARNING] Invalidation du cache « {namespace} » impossible : {e}")
+
+
+def _from_replica(request: Request) -> bool:
+    # Posé par replicas.get_read_db quand la session de la requête est sur le réplica
+    return getattr(request.state, "replica", False)
+
+
+def _cache_key(request: Request, namespace: str, version: str) -> str:
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    source = "~replica" if _from_replica(request) else ""
+    return f"{namespace}:{version}{source}:{request.url.path}?{query}"
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def _lookup(
+    request: Request, namespace: str, site_id: int
+) -> tuple[Optional[str], Optional[CacheEntry]]:
+    if backend is None:
+        return None, None
+    try:
+        # La version est lue avant de construire la réponse : si une écriture
+        # arrive entre-temps, l'entrée est rangée sous une version déjà périmée.
+        # Version globale (tous les sites) puis version du site.
+        site_namespace = scoped(namespace, site_id)
+        version = f"{backend.version(namespace)}.{backend.version(site_namespace)}"
+        key = _cache_key(request, site_namespace, version)
+        return key, backend.get(key)
+    except Exception as e:
+        print(f"[WARNING] Lecture du cache impossible : {e}")
+        return None, None
+
+
+def _store(request: Request, key: Optional[str], value: Any, adapter: TypeAdapter) -> CacheEntry:
+    if isinstance(value, bytes):
+        body = value    # déjà sérialisé (serialization.dumps) : pas de seconde validation
+    else:
+        body = adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+    entry = CacheEntry(_etag(body), body)
+    if key is not None:
+        try:
+            backend.set(key, entry, REPLICA_TTL if _from_replica(request) else None)
+        except Exception as e:
+            print(f"[WARNING] Écriture dans le cache impossible : {e}")
+    return entry
+
+
+def _respond(request: Request, entry: CacheEntry) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
+def cached_json(
+    request: Request,
+    namespace: str,
+    site_id: int,
+    build: Callable[[], Any],
+    adapter: TypeAdapter,
+) -> Response:
+    """Réponse JSON servie depuis le cache, ou 304 si le client a déjà cette version.
+
+    `build` n'est appelé qu'en cas d'absence ; son résultat est sérialisé une
+    fois avec `adapter` (le même schéma que le response_model de la route),
+    sauf s'il renvoie directement le JSON (bytes).
+    """
+    key, entry = _lookup(request, namespace, site_id)
+    if entry is None:
+        entry = _store(request, key, build(), adapter)
+    return _respond(request, entry)
+
+
+async def cached_json_async(
+    request: Request,
+    namespace: str,
+    site_id: int,
+    build: Callable[[], Awaitable[Any]],
+    adapter: TypeAdapter,
+) -> Response:
+    """Variante de cached_json pour les routes asynchrones."""
+    key, entry = _lookup(request, namespace, site_id)
+    if entry is None:
+        entry = _store(request, key, await build(), adapter)
+    return _respond(request, entry)
@@ -7,6 +7,84 @@ class Settings(BaseSettings):
     database_url: str
     allowed_origins: str = "http://localhost:5173"
 
+    # Migrations au démarrage de l'application : pratique en local ; en
+    # production, étape de déploiement séparée (python -m app.migrations)
+    migrate_on_startup: bool = False
+
+    # Pool de connexions par worker. Avec DB_MAX_CONNECTIONS (connexions
+    # permises à l'application entière : limite de PostgreSQL ou du pool
+    # pgbouncer), les tailles sont bornées à sa part par worker
+    # (WEB_CONCURRENCY, le nombre de workers uvicorn, transmis aux workers par
+    # les commandes de démarrage). Connexions ouvertes d'avance au démarrage si
+    # DB_POOL_PREWARM.
+    web_concurrency: int = 1
+    db_max_connections: int = 0
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_prewarm: bool = True
+
+    # Réplica en lecture (facultatif) : les routes de lecture y sont envoyées
+    # tant qu'il est joignable et en retard de moins de REPLICA_MAX_LAG secondes
+    # (voir app/replicas.py) ; état relevé toutes les REPLICA_CHECK_INTERVAL s
+    database_replica_url: str = ""
+    replica_max_lag: float = 5.0
+    replica_check_interval: int = 2
+
+    # Pile asynchrone (asyncpg) pour les routes les plus sollicitées, expérimentale
+    db_async: bool = False
+    async_pool_size: int = 10
+    async_max_overflow: int = 20
+
+    # Recalage des compteurs du tableau de bord (secondes, 0 = désactivé)
+    dashboard_reconcile_interval: int = 300
+
+    # Photos de stock : fréquence (secondes, 0 = désactivé) et nombre de jours
+    # pendant lesquels on garde une photo par jour (au-delà : fin de mois seulement)
+    snapshot_interval: int = 3600
+    snapshot_daily_retention: int = 62
+
+    # Archivage des mouvements (python -m app.archive) : mois conservés en base,
+    # répertoire des fichiers Parquet (relus par l'export)
+    movement_retention_months: int = 24
+    archive_dir: str = "archives"
+
+    # Flux d'alertes : relecture des événements des autres workers (secondes,
+    # 0 = seulement ceux du worker) et durée de conservation (jours)
+    alert_poll_interval: int = 5
+    alert_event_retention_days: int = 30
+
+    # Prévisions de consommation : fréquence du recalcul (secondes, 0 = désactivé),
+    # historique et horizon (jours), demi-vie de la pondération, délai de
+    # livraison et période couverte par une commande (jours), coefficient de
+    # sécurité (1.65 ≈ 95 % de service), fermetures déclarées
+    # ("AAAA-MM-JJ:AAAA-MM-JJ,...", vacances scolaires par exemple)
+    forecast_interval: int = 900
+    forecast_history_days: int = 182
+    forecast_horizon_days: int = 120
+    forecast_halflife_days: float = 28.0
+    forecast_lead_days: int = 7
+    forecast_cover_days: int = 14
+    forecast_service_z: float = 1.65
+    forecast_holidays: str = ""
+
+    # Lots : échéance (jours) à partir de laquelle un lot ouvert est signalé
+    # « à consommer rapidement » par le tableau de bord
+    lot_expiry_warning_days: int = 7
+
+    # Synchronisation des clients hors ligne : jours de journal des changements
+    # et de clés d'idempotence conservés (au-delà, le client recharge tout)
+    sync_retention_days: int = 30
+
+    # Cache des réponses : "memory" (un seul worker : désactivé si WEB_CONCURRENCY > 1),
+    # "redis" (partagé entre les workers) ou "none"
+    cache_backend: str = "memory"
+    cache_ttl: int = 60
+    cache_max_entries: int = 512
+    redis_url: str = "redis://localhost:6379/0"
+
+    # Instrumentation (latences, requêtes SQL, pool) exposée sur /metrics
+    metrics_enabled: bool = False
+
     @property
     def origins_list(self) -> list[str]:
         return [o.strip() for o in self.allowed_origins.split(",")]
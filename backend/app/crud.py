@@ -1,75 +1,298 @@
-from datetime import date
+from collections import Counter
+from datetime import date, timedelta
 from decimal import Decimal
-from typing import Optional
-from sqlalchemy import func, cast, Numeric
+from typing import Iterable, NamedTuple, Optional, Sequence
+from sqlalchemy import and_, func, bindparam, cast, Date, Numeric, case, delete, exists, insert, literal, or_, select, true, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
-from . import models, schemas
+from . import alerts, cache, models, schemas
+from .config import settings
+
+
+BULK_BATCH_SIZE = 1000
+
+
+def _chunks(items: list, size: int = BULK_BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _upsert(db: Session, model):
+    """INSERT ... ON CONFLICT du dialecte courant (PostgreSQL en production, SQLite en local)."""
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(model)
+
+
+def _invalidate_stock_views(site_id: int) -> None:
+    # Toute écriture sur les produits ou les mouvements change le stock affiché du site
+    cache.invalidate(*(
+        cache.scoped(namespace, site_id)
+        for namespace in (
+            cache.PRODUCTS, cache.ALERTS, cache.DASHBOARD, cache.ANALYTICS, cache.FORECASTS,
+        )
+    ))
+    # … et a pu enregistrer des événements d'alerte : le flux va les lire
+    alerts.notify()
+
+
+class StockState(NamedTuple):
+    """Ce qui, dans un produit, compte pour le tableau de bord."""
+    quantity:       Decimal
+    min_threshold:  Decimal
+    price_per_unit: Decimal
+
+    @classmethod
+    def of(cls, product) -> "StockState":
+        return cls(
+            Decimal(product.quantity),
+            Decimal(product.min_threshold),
+            Decimal(product.price_per_unit),
+        )
+
+    @property
+    def is_low(self) -> bool:
+        return self.quantity < self.min_threshold
+
+    @property
+    def value(self) -> Decimal:
+        return self.quantity * self.price_per_unit
+
+    @property
+    def status(self) -> str:
+        """Statut affiché par la page Alertes (un produit en alerte = LOW_STOCK)."""
+        if not self.is_low:
+            return "OK"
+        return "Rupture" if self.quantity <= 0 else "Alerte"
+
+
+# (product_id, état avant, état après) — None avant une création, après une suppression
+StockChange = tuple[int, Optional[StockState], Optional[StockState]]
+
+
+def _apply_stock_changes(
+    db: Session, site_id: int, deltas: dict[int, list[Decimal]]
+) -> dict[int, tuple[StockState, StockState]]:
+    """Applique des variations de stock à plusieurs produits, dans l'ordre donné.
+
+    Les produits sont verrouillés par id croissant (pas d'interblocage entre deux
+    lots concurrents), puis mis à jour en un UPDATE par lot de produits. Chaque
+    variation est bornée à zéro comme dans create_movement, le résultat est donc
+    le même que mouvement par mouvement. Renvoie (avant, après) par produit
+    trouvé dans le site.
+    """
+    changes: dict[int, tuple[StockState, StockState]] = {}
+    for chunk in _chunks(sorted(deltas)):
+        rows = (
+            db.query(
+                models.Product.id,
+                models.Product.quantity,
+                models.Product.min_threshold,
+                models.Product.price_per_unit,
+            )
+            .filter(models.Product.site_id == site_id, models.Product.id.in_(chunk))
+            .order_by(models.Product.id)
+            .with_for_update()
+        )
+        new_quantities: dict[int, Decimal] = {}
+        for product_id, *state in rows:
+            before = StockState(*state)
+            quantity = before.quantity
+            for delta in deltas[product_id]:
+                quantity = max(Decimal("0"), quantity + delta)
+            new_quantities[product_id] = quantity
+            changes[product_id] = (before, before._replace(quantity=quantity))
+        if new_quantities:
+            db.execute(
+                update(models.Product)
+                .where(models.Product.id.in_(list(new_quantities)))
+                .values(quantity=case(new_quantities, value=models.Product.id))
+                .execution_options(synchronize_session=False)
+            )
+    return changes
+
+
+# ─── Sites ────────────────────────────────────────────────────────────────────
+
+def get_sites(db: Session) -> list[models.Site]:
+    return db.query(models.Site).order_by(models.Site.name).all()
+
+
+def get_site_ids(db: Session) -> list[int]:
+    return list(db.scalars(select(models.Site.id).order_by(models.Site.id)))
+
+
+def site_exists(db: Session, site_id: int) -> bool:
+    return db.scalar(select(models.Site.id).where(models.Site.id == site_id)) is not None
+
+
+def get_site_by_name(db: Session, name: str) -> Optional[models.Site]:
+    return db.query(models.Site).filter(models.Site.name == name).first()
+
+
+def create_site(db: Session, data: schemas.SiteCreate) -> models.Site:
+    site = models.Site(**data.model_dump())
+    db.add(site)
+    db.flush()
+    db.add(models.DashboardCounters(id=site.id))
+    db.commit()
+    db.refresh(site)
+    return site
 
 
 # ─── Products ────────────────────────────────────────────────────────────────
 
-def get_products(db: Session, category: Optional[str] = None) -> list[models.Product]:
-    q = db.query(models.Product)
+# Colonnes de ProductOut, dans l'ordre du schéma (listes sérialisées sans ORM)
+PRODUCT_COLUMNS = tuple(getattr(models.Product, field) for field in schemas.ProductOut.model_fields)
+
+
+def product_rows_stmt(site_id: int, category: Optional[str] = None):
+    """Produits sous forme de lignes (pas d'objets ORM), triés par nom."""
+    stmt = select(*PRODUCT_COLUMNS).where(models.Product.site_id == site_id)
+    if category:
+        stmt = stmt.where(models.Product.category == category)
+    return stmt.order_by(models.Product.name)
+
+
+def alert_product_rows_stmt(site_id: int):
+    """Produits sous le seuil, sous forme de lignes, les plus critiques d'abord."""
+    return (
+        select(*PRODUCT_COLUMNS)
+        .where(models.Product.site_id == site_id, models.LOW_STOCK)
+        .order_by(models.ALERT_RATIO)
+    )
+
+
+def get_product_rows(db: Session, site_id: int, category: Optional[str] = None) -> list:
+    return db.execute(product_rows_stmt(site_id, category)).all()
+
+
+def iter_products(db: Session, site_id: int, category: Optional[str] = None, batch_size: int = 1000):
+    q = db.query(models.Product).filter(models.Product.site_id == site_id)
     if category:
         q = q.filter(models.Product.category == category)
-    return q.order_by(models.Product.name).all()
+    yield from q.order_by(models.Product.name, models.Product.id).yield_per(batch_size)
 
 
-def get_product(db: Session, product_id: int) -> Optional[models.Product]:
-    return db.query(models.Product).filter(models.Product.id == product_id).first()
+def get_product(db: Session, site_id: int, product_id: int) -> Optional[models.Product]:
+    return (
+        db.query(models.Product)
+        .filter(models.Product.site_id == site_id, models.Product.id == product_id)
+        .first()
+    )
 
 
-def create_product(db: Session, data: schemas.ProductCreate) -> models.Product:
-    product = models.Product(**data.model_dump())
+def _get_product_for_update(db: Session, site_id: int, product_id: int) -> Optional[models.Product]:
+    return (
+        db.query(models.Product)
+        .filter(models.Product.site_id == site_id, models.Product.id == product_id)
+        .with_for_update()
+        .first()
+    )
+
+
+def create_product(db: Session, site_id: int, data: schemas.ProductCreate) -> models.Product:
+    product = models.Product(**data.model_dump(), site_id=site_id)
     db.add(product)
+    db.flush()
+    alert_events = _track_stock_changes(db, site_id, [(product.id, None, StockState.of(data))])
+    _log_changes(db, site_id, products=[product.id], alert_events=alert_events)
     db.commit()
+    _invalidate_stock_views(site_id)
     db.refresh(product)
     return product
 
 
-def update_product(db: Session, product_id: int, data: schemas.ProductUpdate) -> Optional[models.Product]:
-    product = get_product(db, product_id)
+def bulk_create_products(db: Session, site_id: int, items: list[schemas.ProductCreate]) -> int:
+    """Insère les produits par requêtes multi-lignes, en une seule transaction."""
+    ids: list[int] = []
+    for chunk in _chunks(items):
+        ids += db.scalars(
+            insert(models.Product).returning(models.Product.id, sort_by_parameter_order=True),
+            [{**item.model_dump(), "site_id": site_id} for item in chunk],
+        ).all()
+    alert_events = _track_stock_changes(
+        db, site_id, [(product_id, None, StockState.of(item)) for product_id, item in zip(ids, items)]
+    )
+    _log_changes(db, site_id, products=ids, alert_events=alert_events)
+    db.commit()
+    _invalidate_stock_views(site_id)
+    return len(items)
+
+
+def update_product(
+    db: Session, site_id: int, product_id: int, data: schemas.ProductUpdate
+) -> Optional[models.Product]:
+    product = _get_product_for_update(db, site_id, product_id)
     if not product:
         return None
+    before = StockState.of(product)
     for field, value in data.model_dump().items():
         setattr(product, field, value)
+    # Correction manuelle de la quantité : elle vaut pour la photo du jour
+    _shift_snapshots(db, {(product_id, date.today()): data.quantity - before.quantity})
+    _trim_lots(db, product_id, data.quantity)
+    alert_events = _track_stock_changes(db, site_id, [(product_id, before, StockState.of(data))])
+    _log_changes(db, site_id, products=[product_id], alert_events=alert_events)
     db.commit()
+    _invalidate_stock_views(site_id)
     db.refresh(product)
     return product
 
 
-def delete_product(db: Session, product_id: int) -> bool:
-    product = get_product(db, product_id)
+def delete_product(db: Session, site_id: int, product_id: int) -> bool:
+    product = _get_product_for_update(db, site_id, product_id)
     if not product:
         return False
+    # Les mouvements du produit partent avec lui (cascade) : on les décompte
+    movement_counts = dict(
+        db.query(models.Movement.date, func.count(models.Movement.id))
+        .filter(models.Movement.product_id == product_id)
+        .group_by(models.Movement.date)
+        .all()
+    )
+    # Les photos passées restent (audit), celle du jour ne le compte plus
+    db.execute(
+        delete(models.StockSnapshot).where(
+            models.StockSnapshot.product_id == product_id,
+            models.StockSnapshot.date >= date.today(),
+        )
+    )
+    alert_events = _track_stock_changes(db, site_id, [(product_id, StockState.of(product), None)])
+    _bump_daily_counts(db, site_id, {day: -count for day, count in movement_counts.items()})
+    db.execute(delete(models.Lot).where(models.Lot.product_id == product_id))
+    # Le client efface les mouvements du produit avec lui : leurs entrées au
+    # journal ne servent plus
+    change = models.SyncChange
+    db.execute(
+        delete(change).where(
+            change.site_id == site_id,
+            change.entity == "movement",
+            change.entity_id.in_(select(models.Movement.id).where(models.Movement.product_id == product_id)),
+        )
+    )
+    _log_changes(db, site_id, deleted_products=[product_id], alert_events=alert_events)
     db.delete(product)
     db.commit()
+    _invalidate_stock_views(site_id)
     return True
 
 
-def get_alert_products(db: Session) -> list[models.Product]:
-    return (
-        db.query(models.Product)
-        .filter(models.Product.quantity < models.Product.min_threshold)
-        .order_by(
-            (models.Product.quantity / func.nullif(models.Product.min_threshold, 0))
-        )
-        .all()
-    )
+def get_alert_product_rows(db: Session, site_id: int) -> list:
+    return db.execute(alert_product_rows_stmt(site_id)).all()
 
 
 # ─── Movements ────────────────────────────────────────────────────────────────
 
-def get_movements(
-    db: Session,
+def _filter_movements(
+    q,
+    site_id: int,
     product_id: Optional[int] = None,
     type: Optional[str] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
-    limit: Optional[int] = None,
-) -> list[models.Movement]:
-    q = db.query(models.Movement).join(models.Product)
+):
+    q = q.filter(models.Movement.site_id == site_id)
     if product_id:
         q = q.filter(models.Movement.product_id == product_id)
     if type:
@@ -78,44 +301,989 @@ def get_movements(
         q = q.filter(models.Movement.date >= date_from)
     if date_to:
         q = q.filter(models.Movement.date <= date_to)
+    return q
+
+
+def get_movements(
+    db: Session,
+    site_id: int,
+    product_id: Optional[int] = None,
+    type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: Optional[int] = None,
+) -> list[models.Movement]:
+    q = db.query(models.Movement).join(models.Product)
+    q = _filter_movements(q, site_id, product_id, type, date_from, date_to)
     q = q.order_by(models.Movement.date.desc(), models.Movement.id.desc())
     if limit:
         q = q.limit(limit)
     return q.all()
 
 
-def create_movement(db: Session, data: schemas.MovementCreate) -> Optional[models.Movement]:
-    product = get_product(db, data.product_id)
-    if not product:
-        return None
+# Colonnes renvoyées par l'API pour un mouvement (schemas.MovementOut)
+MOVEMENT_COLUMNS = (
+    models.Movement.id,
+    models.Movement.site_id,
+    models.Movement.product_id,
+    models.Product.name.label("product_name"),
+    models.Movement.type,
+    models.Movement.quantity,
+    models.Movement.date,
+    models.Movement.comment,
+    models.Movement.created_at,
+)
+
+# Les mêmes, sans le nom du produit : RETURNING d'une insertion de mouvements
+INSERTED_MOVEMENT_COLUMNS = tuple(c for c in MOVEMENT_COLUMNS if c.key != "product_name")
+
+
+def encode_movement_cursor(row) -> str:
+    return f"{row.date.isoformat()}_{row.id}"
+
+
+def decode_movement_cursor(cursor: str) -> tuple[date, int]:
+    """Lève ValueError si le curseur est mal formé."""
+    day, _, movement_id = cursor.partition("_")
+    return date.fromisoformat(day), int(movement_id)
 
-    # Update stock quantity
-    delta = data.quantity if data.type == "Entrée" else -data.quantity
-    new_qty = max(Decimal("0"), Decimal(str(product.quantity)) + delta)
-    product.quantity = new_qty
 
-    movement = models.Movement(**data.model_dump())
+def movement_rows_stmt(
+    site_id: int,
+    product_id: Optional[int] = None,
+    type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+):
+    """Mouvements sous forme de lignes (pas d'objets ORM), nom du produit inclus.
+
+    Pagination par clé (date, id) décroissante : `cursor` est la valeur renvoyée
+    par encode_movement_cursor pour la dernière ligne de la page précédente.
+    """
+    stmt = select(*MOVEMENT_COLUMNS).join(
+        models.Product, models.Product.id == models.Movement.product_id
+    )
+    stmt = _filter_movements(stmt, site_id, product_id, type, date_from, date_to)
+    if cursor:
+        cursor_date, cursor_id = decode_movement_cursor(cursor)
+        # Comparaison de tuples : un seul parcours d'intervalle sur l'index (date, id).
+        # La borne sur date seule, redondante, permet d'écarter les partitions mensuelles.
+        stmt = stmt.filter(
+            models.Movement.date <= cursor_date,
+            tuple_(models.Movement.date, models.Movement.id) < tuple_(cursor_date, cursor_id),
+        )
+    stmt = stmt.order_by(models.Movement.date.desc(), models.Movement.id.desc())
+    if limit:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def get_movement_rows(db: Session, site_id: int, **filters) -> list:
+    return db.execute(movement_rows_stmt(site_id, **filters)).all()
+
+
+def iter_movement_rows(db: Session, site_id: int, batch_size: int = 1000, **filters):
+    """Parcourt les mouvements via un curseur serveur, par lots de `batch_size`."""
+    stmt = movement_rows_stmt(site_id, **filters).execution_options(yield_per=batch_size)
+    yield from db.execute(stmt)
+
+
+def movement_delta(data: schemas.MovementCreate) -> Decimal:
+    return data.quantity if data.type == "Entrée" else -data.quantity
+
+
+def create_movement(db: Session, site_id: int, data: schemas.MovementCreate) -> Optional[models.Movement]:
+    delta = movement_delta(data)
+    # Cas courant : une seule instruction, la base lit et écrit la quantité sous
+    # le verrou de ligne, deux sorties simultanées ne s'écrasent pas.
+    updated = db.execute(
+        update(models.Product)
+        .where(
+            models.Product.site_id == site_id,
+            models.Product.id == data.product_id,
+            models.Product.quantity + delta >= 0,
+        )
+        .values(quantity=models.Product.quantity + delta)
+        .returning(
+            models.Product.quantity,
+            models.Product.min_threshold,
+            models.Product.price_per_unit,
+        )
+        .execution_options(synchronize_session=False)
+    ).first()
+    if updated is not None:
+        after = StockState(*updated)
+        before = after._replace(quantity=after.quantity - delta)
+    else:
+        # Stock insuffisant (ou produit inexistant) : il faut la quantité exacte
+        # ramenée à zéro, on passe par le verrou explicite.
+        changes = _apply_stock_changes(db, site_id, {data.product_id: [delta]})
+        if data.product_id not in changes:
+            db.rollback()
+            return None
+        before, after = changes[data.product_id]
+
+    movement = models.Movement(**data.movement_fields(), site_id=site_id)
     db.add(movement)
+    db.flush()
+    _record_lots(db, site_id, [data], [movement.id], {data.product_id: (before, after)})
+    _shift_snapshots(db, {(data.product_id, data.date): after.quantity - before.quantity})
+    alert_events = _track_stock_changes(db, site_id, [(data.product_id, before, after)])
+    _bump_daily_counts(db, site_id, {data.date: 1})
+    _log_changes(
+        db, site_id, products=[data.product_id], movements=[movement.id], alert_events=alert_events
+    )
     db.commit()
+    _invalidate_stock_views(site_id)
     db.refresh(movement)
     return movement
 
 
+def bulk_create_movements(db: Session, site_id: int, items: list[schemas.MovementCreate]) -> int:
+    """Insère les mouvements par requêtes multi-lignes puis met à jour le stock
+    des produits concernés, en une seule transaction.
+    """
+    deltas: dict[int, list[Decimal]] = {}
+    for item in items:
+        deltas.setdefault(item.product_id, []).append(movement_delta(item))
+
+    changes = _apply_stock_changes(db, site_id, deltas)
+    movement_ids: list[int] = []
+    for chunk in _chunks(items):
+        movement_ids += db.scalars(
+            insert(models.Movement).returning(models.Movement.id, sort_by_parameter_order=True),
+            [{**item.movement_fields(), "site_id": site_id} for item in chunk],
+        ).all()
+    _record_lots(db, site_id, items, movement_ids, changes)
+    alert_events = _record_movements(db, site_id, items, changes)
+    _log_changes(db, site_id, products=changes, movements=movement_ids, alert_events=alert_events)
+    db.commit()
+    _invalidate_stock_views(site_id)
+    return len(items)
+
+
+def create_movements_batch(
+    db: Session, site_id: int, items: list[schemas.MovementCreate]
+) -> Optional[list[schemas.MovementOut]]:
+    """Saisie groupée (fin de service) : tout ou rien, un seul commit.
+
+    Renvoie None (rien n'est écrit) si un produit n'existe pas dans le site.
+    """
+    created = _write_movements(db, site_id, items)
+    if None in created:
+        db.rollback()
+        return None
+    db.commit()
+    _invalidate_stock_views(site_id)
+    return created
+
+
+def _write_movements(
+    db: Session, site_id: int, items: list[schemas.MovementCreate]
+) -> list[Optional[schemas.MovementOut]]:
+    """Écrit une saisie groupée, sans valider la transaction.
+
+    Les produits sont verrouillés une fois, par id croissant, et les mouvements
+    insérés en une instruction multi-lignes qui renvoie les lignes écrites :
+    la réponse porte les valeurs stockées (quantité à l'échelle de la colonne),
+    comme une lecture. Un résultat par mouvement, None si son produit n'existe
+    pas dans le site (rien n'est alors écrit pour lui).
+    """
+    deltas: dict[int, list[Decimal]] = {}
+    for item in items:
+        deltas.setdefault(item.product_id, []).append(movement_delta(item))
+
+    changes = _apply_stock_changes(db, site_id, deltas)
+    kept = [item for item in items if item.product_id in changes]
+    if not kept:
+        return [None] * len(items)
+    inserted = db.execute(
+        insert(models.Movement).returning(*INSERTED_MOVEMENT_COLUMNS, sort_by_parameter_order=True),
+        [{**item.movement_fields(), "site_id": site_id} for item in kept],
+    ).all()
+    movement_ids = [row.id for row in inserted]
+    names = dict(
+        db.execute(
+            select(models.Product.id, models.Product.name).where(models.Product.id.in_(list(changes)))
+        ).all()
+    )
+    _record_lots(db, site_id, kept, movement_ids, changes)
+    alert_events = _record_movements(db, site_id, kept, changes)
+    _log_changes(db, site_id, products=changes, movements=movement_ids, alert_events=alert_events)
+    created = iter(
+        schemas.MovementOut(**row._mapping, product_name=names[row.product_id]) for row in inserted
+    )
+    return [next(created) if item.product_id in changes else None for item in items]
+
+
+def _record_movements(
+    db: Session,
+    site_id: int,
+    items: list[schemas.MovementCreate],
+    changes: dict[int, tuple[StockState, StockState]],
+) -> list[dict]:
+    """Photos, compteurs et décompte par jour après une insertion groupée.
+
+    Renvoie les événements d'alerte, à passer à _log_changes.
+    """
+    shifts: Counter[tuple[int, date]] = Counter()
+    requested: Counter[int] = Counter()
+    last_date: dict[int, date] = {}
+    for item in items:
+        if item.product_id in changes:
+            shifts[item.product_id, item.date] += movement_delta(item)
+            requested[item.product_id] += movement_delta(item)
+            last_date[item.product_id] = max(item.date, last_date.get(item.product_id, item.date))
+    # Sortie ramenée à zéro : l'écart est reporté sur le dernier jour du lot,
+    # les photos suivantes restent égales au stock réel
+    for product_id, (before, after) in changes.items():
+        clamped = after.quantity - before.quantity - requested[product_id]
+        if clamped:
+            shifts[product_id, last_date[product_id]] += clamped
+    _shift_snapshots(db, shifts)
+    alert_events = _track_stock_changes(
+        db, site_id, [(product_id, *change) for product_id, change in changes.items()]
+    )
+    _bump_daily_counts(db, site_id, Counter(item.date for item in items))
+    return alert_events
+
+
+def get_existing_product_ids(db: Session, site_id: int, product_ids: set[int]) -> set[int]:
+    existing = set()
+    for chunk in _chunks(list(product_ids)):
+        rows = db.query(models.Product.id).filter(
+            models.Product.site_id == site_id, models.Product.id.in_(chunk)
+        )
+        existing.update(product_id for (product_id,) in rows)
+    return existing
+
+
+def get_product_ids_by_name(db: Session, site_id: int, names: set[str]) -> dict[str, list[int]]:
+    ids_by_name: dict[str, list[int]] = {}
+    for chunk in _chunks(list(names)):
+        rows = db.query(models.Product.name, models.Product.id).filter(
+            models.Product.site_id == site_id, models.Product.name.in_(chunk)
+        )
+        for name, product_id in rows:
+            ids_by_name.setdefault(name, []).append(product_id)
+    return ids_by_name
+
+
+# ─── Lots ─────────────────────────────────────────────────────────────────────
+
+# Ordre de prélèvement : date limite la plus proche, lots sans date en dernier,
+# puis ordre d'arrivée (celui de l'index ix_lots_product_fefo)
+FEFO_ORDER = (models.Lot.expiry_date.asc().nulls_last(), models.Lot.id)
+
+
+def _record_lots(
+    db: Session,
+    site_id: int,
+    items: list[schemas.MovementCreate],
+    movement_ids: list[int],
+    changes: dict[int, tuple[StockState, StockState]],
+) -> None:
+    """Lots après une insertion de mouvements : chaque entrée crée son lot,
+    puis les sorties puisent dans les lots ouverts (_consume_lots).
+
+    Le prélèvement d'un produit est ce que ses sorties ont réellement retiré du
+    stock (sortie ramenée à zéro comprise) : entrées reçues − variation appliquée.
+    """
+    received: Counter[int] = Counter()
+    lots = []
+    for item, movement_id in zip(items, movement_ids):
+        if item.type == "Entrée" and item.product_id in changes:
+            received[item.product_id] += item.quantity
+            lots.append({
+                "site_id": site_id,
+                "product_id": item.product_id,
+                "movement_id": movement_id,
+                "lot_number": item.lot_number,
+                "received_date": item.date,
+                "expiry_date": item.expiry_date,
+                "initial_quantity": item.quantity,
+                "quantity": item.quantity,
+            })
+    for chunk in _chunks(lots):
+        db.execute(insert(models.Lot), chunk)
+    _consume_lots(db, {
+        product_id: received[product_id] - (after.quantity - before.quantity)
+        for product_id, (before, after) in changes.items()
+    })
+
+
+def _consume_lots(db: Session, amounts: dict[int, Decimal]) -> None:
+    """Prélève des quantités dans les lots ouverts de chaque produit, FEFO, en
+    un seul UPDATE par paquet de produits.
+
+    Une fonction de fenêtre donne, pour chaque lot, ce que couvrent déjà les
+    lots qui passent avant lui : ceux couverts en entier sont vidés, le suivant
+    est entamé, les autres ne sont pas touchés. Ce qui dépasse les lots ouverts
+    est pris sur le stock sans lot. Les produits doivent être verrouillés
+    (toute écriture de lots passe d'abord par la ligne du produit).
+    """
+    amounts = {product_id: amount for product_id, amount in amounts.items() if amount > 0}
+    lot = models.Lot
+    for chunk in _chunks(sorted(amounts)):
+        requested = case({product_id: amounts[product_id] for product_id in chunk}, value=lot.product_id)
+        ranked = (
+            select(
+                lot.id,
+                requested.label("requested"),
+                (
+                    func.sum(lot.quantity).over(partition_by=lot.product_id, order_by=FEFO_ORDER)
+                    - lot.quantity
+                ).label("covered"),
+            )
+            .where(lot.product_id.in_(chunk), models.OPEN_LOT)
+            .subquery()
+        )
+        remaining = ranked.c.requested - ranked.c.covered
+        db.execute(
+            update(lot)
+            .where(lot.id == ranked.c.id, ranked.c.covered < ranked.c.requested)
+            .values(quantity=case((lot.quantity <= remaining, 0), else_=lot.quantity - remaining))
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _trim_lots(db: Session, product_id: int, quantity: Decimal) -> None:
+    """Après une correction manuelle, ramène les lots ouverts à la quantité du
+    produit (l'écart d'inventaire est pris FEFO, comme une sortie).
+    """
+    in_lots = db.scalar(
+        select(func.sum(models.Lot.quantity)).where(models.Lot.product_id == product_id, models.OPEN_LOT)
+    )
+    if in_lots is not None:
+        _consume_lots(db, {product_id: Decimal(in_lots) - quantity})
+
+
+# Colonnes renvoyées par l'API pour un lot (schemas.LotOut)
+LOT_COLUMNS = (
+    models.Lot.id,
+    models.Lot.site_id,
+    models.Lot.product_id,
+    models.Product.name.label("product_name"),
+    models.Product.unit,
+    models.Lot.movement_id,
+    models.Lot.lot_number,
+    models.Lot.received_date,
+    models.Lot.expiry_date,
+    models.Lot.initial_quantity,
+    models.Lot.quantity,
+    models.Lot.created_at,
+)
+
+
+def get_lot_rows(
+    db: Session, site_id: int, product_id: Optional[int] = None, include_empty: bool = False
+) -> list:
+    """Lots du site (ouverts seulement, sauf `include_empty`), dans l'ordre de prélèvement."""
+    stmt = (
+        select(*LOT_COLUMNS)
+        .join(models.Product, models.Product.id == models.Lot.product_id)
+        .where(models.Lot.site_id == site_id)
+    )
+    if product_id:
+        stmt = stmt.where(models.Lot.product_id == product_id)
+    if not include_empty:
+        stmt = stmt.where(models.OPEN_LOT)
+    return db.execute(stmt.order_by(models.Lot.product_id, *FEFO_ORDER)).all()
+
+
+def get_expiring_lots(
+    db: Session, site_id: int, within_days: int, category: Optional[str] = None
+) -> list[schemas.ExpiringLot]:
+    """Lots ouverts dont la date limite tombe d'ici `within_days` jours (ou est
+    passée), les plus urgents d'abord : un parcours de ix_lots_site_expiry.
+    """
+    today = date.today()
+    stmt = (
+        select(*LOT_COLUMNS, models.Product.category)
+        .join(models.Product, models.Product.id == models.Lot.product_id)
+        .where(
+            models.Lot.site_id == site_id,
+            models.OPEN_LOT,
+            models.Lot.expiry_date <= today + timedelta(days=within_days),
+        )
+    )
+    if category:
+        stmt = stmt.where(models.Product.category == category)
+    rows = db.execute(stmt.order_by(models.Lot.expiry_date, models.Lot.id))
+    return [
+        schemas.ExpiringLot(**row._mapping, days_left=(row.expiry_date - today).days)
+        for row in rows
+    ]
+
+
+def _lot_expiry_query(site_id: int):
+    """Lots à échéance pour le tableau de bord (même parcours d'index que
+    get_expiring_lots, borné à LOT_EXPIRY_WARNING_DAYS) : un agrégat d'une
+    ligne, que get_dashboard_stats joint à la lecture des compteurs.
+    """
+    today = date.today()
+    lot = models.Lot
+    expired = lot.expiry_date < today
+    return (
+        select(
+            func.count(lot.id).label("due_lots"),
+            func.count(case((expired, lot.id))).label("expired_lots"),
+            func.sum(case((expired, lot.quantity * models.Product.price_per_unit))).label("expired_value"),
+        )
+        .join(models.Product, models.Product.id == lot.product_id)
+        .where(
+            lot.site_id == site_id,
+            models.OPEN_LOT,
+            lot.expiry_date <= today + timedelta(days=settings.lot_expiry_warning_days),
+        )
+    )
+
+
+def _lot_expiry_stats(due: int, expired_lots: int, expired_value) -> dict:
+    return {
+        "expiring_lots": due - expired_lots,
+        "expired_lots": expired_lots,
+        "expired_stock_value": Decimal(str(expired_value or 0)),
+    }
+
+
+# ─── Photos de stock ──────────────────────────────────────────────────────────
+
+def _shift_snapshots(db: Session, shifts: dict[tuple[int, date], Decimal]) -> None:
+    """Reporte des variations de stock sur les photos datées du jour du mouvement
+    ou après (mouvement saisi après coup, ou après la photo du jour).
+
+    Les variations sont celles réellement appliquées au stock (sortie ramenée à
+    zéro comprise) ; à appeler après la mise à jour des produits.
+    """
+    params = [
+        {"b_product_id": product_id, "b_date": day, "b_delta": delta}
+        for (product_id, day), delta in sorted(shifts.items())
+        if delta
+    ]
+    if not params:
+        return
+    snapshot = models.StockSnapshot.__table__
+    db.execute(
+        snapshot.update()
+        .where(
+            snapshot.c.product_id == bindparam("b_product_id"),
+            snapshot.c.date >= bindparam("b_date"),
+        )
+        .values(quantity=snapshot.c.quantity + bindparam("b_delta")),
+        params,
+    )
+
+
+def _net_movements(
+    site_id: Optional[int], date_from: Optional[date], date_to: Optional[date], product_ids=None
+):
+    """Sous-requête (product_id, net) des mouvements datés dans ]date_from, date_to]."""
+    q = select(
+        models.Movement.product_id,
+        func.sum(models.SIGNED_QUANTITY).label("net"),
+    )
+    if site_id is not None:
+        q = q.where(models.Movement.site_id == site_id)
+    if date_from is not None:
+        q = q.where(models.Movement.date > date_from)
+    if date_to is not None:
+        q = q.where(models.Movement.date <= date_to)
+    if product_ids is not None:
+        q = q.where(models.Movement.product_id.in_(product_ids))
+    return q.group_by(models.Movement.product_id).subquery()
+
+
+def take_stock_snapshot(db: Session, day: Optional[date] = None, site_id: Optional[int] = None) -> None:
+    """Photographie le stock de chaque produit (d'un site, ou de tous) en fin de
+    journée `day`.
+
+    Les mouvements datés après `day` sont retirés de la quantité actuelle : on
+    peut donc aussi photographier un jour passé. Reprendre une photo existante
+    la remplace.
+    """
+    day = day or date.today()
+    snapshot = models.StockSnapshot
+    later = _net_movements(site_id, day, None)
+    vanished = delete(snapshot).where(
+        snapshot.date == day,
+        snapshot.product_id.not_in(select(models.Product.id)),
+    )
+    source = (
+        select(
+            literal(day, Date),
+            models.Product.id,
+            models.Product.site_id,
+            models.Product.name,
+            models.Product.category,
+            models.Product.unit,
+            models.Product.quantity - func.coalesce(later.c.net, 0),
+            models.Product.price_per_unit,
+        )
+        .outerjoin(later, later.c.product_id == models.Product.id)
+        # SQLite exige un WHERE avant ON CONFLICT dans un INSERT … SELECT
+        .where(true())
+    )
+    if site_id is not None:
+        vanished = vanished.where(snapshot.site_id == site_id)
+        source = source.where(models.Product.site_id == site_id)
+    db.execute(vanished)
+    stmt = _upsert(db, snapshot).from_select(
+        ["date", "product_id", "site_id", "name", "category", "unit", "quantity", "price_per_unit"],
+        source,
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[snapshot.date, snapshot.product_id],
+            set_={
+                "name": stmt.excluded.name,
+                "category": stmt.excluded.category,
+                "unit": stmt.excluded.unit,
+                "quantity": stmt.excluded.quantity,
+                "price_per_unit": stmt.excluded.price_per_unit,
+                "taken_at": func.now(),
+            },
+        )
+    )
+    db.commit()
+    if site_id is None:
+        cache.invalidate(cache.ANALYTICS)
+    else:
+        cache.invalidate(cache.scoped(cache.ANALYTICS, site_id))
+
+
+def prune_stock_snapshots(db: Session, keep_days: int) -> int:
+    """Ne garde que la photo de fin de mois au-delà de `keep_days` jours."""
+    snapshot = models.StockSnapshot
+    cutoff = date.today() - timedelta(days=keep_days)
+    old = db.scalars(select(snapshot.date).where(snapshot.date < cutoff).distinct()).all()
+    dropped = [day for day in old if (day + timedelta(days=1)).day != 1]
+    for chunk in _chunks(dropped):
+        db.execute(delete(snapshot).where(snapshot.date.in_(chunk)))
+    db.commit()
+    return len(dropped)
+
+
+def get_snapshot_summaries(
+    db: Session,
+    site_id: Optional[int],
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> list[schemas.SnapshotSummary]:
+    """Photos disponibles d'un site (ou de tous les sites si site_id est None)."""
+    snapshot = models.StockSnapshot
+    q = select(
+        snapshot.date,
+        func.count(snapshot.product_id),
+        func.coalesce(func.sum(snapshot.quantity * snapshot.price_per_unit), 0),
+    )
+    if site_id is not None:
+        q = q.where(snapshot.site_id == site_id)
+    if date_from:
+        q = q.where(snapshot.date >= date_from)
+    if date_to:
+        q = q.where(snapshot.date <= date_to)
+    rows = db.execute(q.group_by(snapshot.date).order_by(snapshot.date.desc()))
+    return [
+        schemas.SnapshotSummary(date=day, products=count, total_value=Decimal(str(value)))
+        for day, count, value in rows
+    ]
+
+
+def get_stock_as_of(
+    db: Session, site_id: int, as_of: date, category: Optional[str] = None
+) -> schemas.StockValuation:
+    """Stock et valorisation en fin de journée `as_of`.
+
+    Part de la dernière photo antérieure et n'y ajoute que les mouvements datés
+    entre la photo et `as_of` : le coût ne dépend que de l'écart entre les deux.
+    Les produits absents de cette photo (créés depuis) sont reconstitués à
+    rebours depuis leur quantité actuelle.
+    """
+    snapshot = models.StockSnapshot
+    product = models.Product
+    snapshot_date = db.scalar(
+        select(func.max(snapshot.date)).where(snapshot.site_id == site_id, snapshot.date <= as_of)
+    )
+
+    rows = []
+    if snapshot_date is not None:
+        since = _net_movements(site_id, snapshot_date, as_of)
+        q = (
+            select(
+                snapshot.product_id,
+                snapshot.name,
+                snapshot.category,
+                snapshot.unit,
+                snapshot.quantity + func.coalesce(since.c.net, 0),
+                snapshot.price_per_unit,
+            )
+            .outerjoin(since, since.c.product_id == snapshot.product_id)
+            .where(snapshot.site_id == site_id, snapshot.date == snapshot_date)
+        )
+        if category:
+            q = q.where(snapshot.category == category)
+        rows += db.execute(q).all()
+
+    # Produits qui existaient à as_of sans figurer sur la photo : créés avant,
+    # ou ayant un mouvement daté d'avant (historique importé après coup)
+    missing = select(product.id).where(product.site_id == site_id).where(
+        (product.created_at < as_of + timedelta(days=1))
+        | product.created_at.is_(None)
+        | exists().where(
+            models.Movement.product_id == product.id,
+            models.Movement.date <= as_of,
+        )
+    )
+    if category:
+        missing = missing.where(product.category == category)
+    if snapshot_date is not None:
+        missing = missing.where(
+            product.id.not_in(select(snapshot.product_id).where(snapshot.date == snapshot_date))
+        )
+    later = _net_movements(site_id, as_of, None, missing)
+    rows += db.execute(
+        select(
+            product.id,
+            product.name,
+            product.category,
+            product.unit,
+            product.quantity - func.coalesce(later.c.net, 0),
+            product.price_per_unit,
+        )
+        .outerjoin(later, later.c.product_id == product.id)
+        .where(product.id.in_(missing))
+    ).all()
+
+    items = [
+        schemas.StockValuationLine(
+            product_id=product_id,
+            name=name,
+            category=category_,
+            unit=unit,
+            quantity=quantity,
+            price_per_unit=price,
+            value=Decimal(str(quantity)) * Decimal(str(price)),
+        )
+        for product_id, name, category_, unit, quantity, price in rows
+    ]
+    items.sort(key=lambda item: (item.category, item.name, item.product_id))
+    return schemas.StockValuation(
+        as_of=as_of,
+        snapshot_date=snapshot_date,
+        total_value=sum((item.value for item in items), Decimal("0")),
+        items=items,
+    )
+
+
+# ─── Événements d'alerte ──────────────────────────────────────────────────────
+
+def _alert_events(db: Session, site_id: int, changes: list[StockChange]) -> list[dict]:
+    """Changements de statut (OK / Alerte / Rupture) des produits.
+
+    Relevés par _track_stock_changes, puis numérotés et inscrits par
+    _log_changes dans la même transaction : pas d'événement sans écriture, ni
+    l'inverse. Une création déjà en alerte et la suppression d'un produit en
+    alerte comptent comme des changements.
+    """
+    crossings = []
+    for product_id, before, after in changes:
+        previous = before.status if before else None
+        status = after.status if after else None
+        # Création ou suppression d'un produit en stock suffisant : rien à signaler
+        if previous == status or {previous, status} <= {None, "OK"}:
+            continue
+        crossings.append((product_id, previous, status, after or before))
+    if not crossings:
+        return []
+    names = dict(
+        db.execute(
+            select(models.Product.id, models.Product.name)
+            .where(models.Product.id.in_([c[0] for c in crossings]))
+        ).all()
+    )
+    return [
+        {
+            "site_id": site_id,
+            "product_id": product_id,
+            "product_name": names.get(product_id, ""),
+            "previous_status": previous,
+            "status": status,
+            "quantity": state.quantity,
+            "min_threshold": state.min_threshold,
+        }
+        for product_id, previous, status, state in crossings
+    ]
+
+
+def get_alert_events(
+    db: Session, positions: dict[int, int], limit: int = 1000
+) -> list[models.AlertEvent]:
+    """Événements des sites de `positions` postérieurs à leur numéro, par site
+    puis numéro croissant.
+
+    Les numéros sont validés dans l'ordre (crud._log_changes) : un événement
+    lu après n n'a jamais de prédécesseur encore invisible.
+    """
+    if not positions:
+        return []
+    event = models.AlertEvent
+    return (
+        db.query(event)
+        .filter(or_(*(and_(event.site_id == s, event.seq > seq) for s, seq in positions.items())))
+        .order_by(event.site_id, event.seq)
+        .limit(limit)
+        .all()
+    )
+
+
+def get_last_alert_seq(db: Session, site_id: int) -> int:
+    """Numéro du dernier événement d'alerte validé du site."""
+    return db.scalar(select(models.SyncState.alert_seq).where(models.SyncState.site_id == site_id)) or 0
+
+
+def prune_alert_events(db: Session, keep_days: int) -> int:
+    cutoff = date.today() - timedelta(days=keep_days)
+    result = db.execute(delete(models.AlertEvent).where(models.AlertEvent.created_at < cutoff))
+    db.commit()
+    return result.rowcount
+
+
+# ─── Synchronisation des clients hors ligne ───────────────────────────────────
+
+def _log_changes(
+    db: Session,
+    site_id: int,
+    products: Iterable[int] = (),
+    movements: Iterable[int] = (),
+    deleted_products: Iterable[int] = (),
+    alert_events: Sequence[dict] = (),
+) -> None:
+    """Inscrit des changements au journal de synchronisation (app/sync.py),
+    et les événements d'alerte relevés par _track_stock_changes.
+
+    Ils reçoivent tous le numéro suivant du site, pris sur sa ligne de
+    sync_state ; les événements d'alerte, chacun le sien (alert_seq). Elle
+    reste verrouillée jusqu'au commit : les numéros sont donc validés dans
+    l'ordre, un client ne voit jamais n+1 avant n. À appeler en fin de
+    transaction (après les compteurs du tableau de bord), pour tenir ce verrou
+    le moins longtemps possible.
+    """
+    rows = {("product", product_id): False for product_id in products}
+    rows.update({("movement", movement_id): False for movement_id in movements})
+    rows.update({("product", product_id): True for product_id in deleted_products})
+    if not rows:
+        return
+    state = models.SyncState
+    alerts_count = len(alert_events)
+    seq, alert_seq = db.execute(
+        _upsert(db, state)
+        .values(site_id=site_id, last_seq=1, alert_seq=alerts_count)
+        .on_conflict_do_update(
+            index_elements=[state.site_id],
+            set_={"last_seq": state.last_seq + 1, "alert_seq": state.alert_seq + alerts_count},
+        )
+        .returning(state.last_seq, state.alert_seq)
+    ).one()
+    if alert_events:
+        first = alert_seq - alerts_count + 1
+        db.execute(
+            insert(models.AlertEvent),
+            [{**event, "seq": first + i} for i, event in enumerate(alert_events)],
+        )
+    change = models.SyncChange
+    stmt = _upsert(db, change)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[change.site_id, change.entity, change.entity_id],
+        set_={"seq": stmt.excluded.seq, "deleted": stmt.excluded.deleted, "changed_at": func.now()},
+    )
+    # executemany : instruction compilée une fois (cache), lignes envoyées par paquets
+    db.execute(stmt, [
+        {"site_id": site_id, "entity": entity, "entity_id": entity_id, "seq": seq, "deleted": deleted}
+        for (entity, entity_id), deleted in rows.items()
+    ])
+
+
+def create_movements_once(
+    db: Session, site_id: int, items: list[schemas.QueuedMovement]
+) -> list[schemas.QueuedMovementResult]:
+    """Mouvements saisis hors ligne, appliqués une seule fois chacun même si le
+    client renvoie sa file après une coupure.
+
+    Les clés d'idempotence sont réservées d'abord (INSERT … ON CONFLICT DO
+    NOTHING) : une clé déjà connue, ou réservée par une requête concurrente
+    (on attend alors son commit), renvoie le mouvement d'origine sans rien
+    réappliquer. Les nouveaux mouvements sont écrits comme une saisie groupée,
+    dans la même transaction que leurs clés. Un mouvement dont le produit
+    n'existe pas est refusé, et ce refus est mémorisé comme le reste.
+
+    Appliqué ou rejoué, le mouvement renvoyé est la ligne stockée (voir
+    _write_movements) : le même JSON que /api/movements et /api/sync, que le
+    client peut comparer octet pour octet.
+    """
+    unique: dict[str, schemas.QueuedMovement] = {}
+    for item in items:
+        unique.setdefault(item.idempotency_key, item)
+    key = models.IdempotencyKey
+    reserved: set[str] = set()
+    for chunk in _chunks(list(unique)):
+        reserved.update(db.scalars(
+            _upsert(db, key)
+            .values([{"site_id": site_id, "key": k} for k in chunk])
+            .on_conflict_do_nothing(index_elements=[key.site_id, key.key])
+            .returning(key.key)
+        ))
+
+    results: dict[str, schemas.QueuedMovementResult] = {}
+    new = [item for k, item in unique.items() if k in reserved]
+    if new:
+        for item, movement in zip(new, _write_movements(db, site_id, new)):
+            results[item.idempotency_key] = schemas.QueuedMovementResult(
+                idempotency_key=item.idempotency_key,
+                status="applied" if movement else "rejected",
+                movement=movement,
+            )
+        applied = [
+            {"b_key": k, "b_movement_id": result.movement.id}
+            for k, result in results.items() if result.movement
+        ]
+        if applied:
+            db.execute(
+                key.__table__.update()
+                .where(key.site_id == site_id, key.key == bindparam("b_key"))
+                .values(movement_id=bindparam("b_movement_id")),
+                applied,
+            )
+
+    known = [k for k in unique if k not in reserved]
+    if known:
+        movement_ids = dict(
+            db.execute(select(key.key, key.movement_id).where(key.site_id == site_id, key.key.in_(known))).all()
+        )
+        rows = db.execute(
+            select(*MOVEMENT_COLUMNS)
+            .join(models.Product, models.Product.id == models.Movement.product_id)
+            .where(models.Movement.id.in_([i for i in movement_ids.values() if i is not None]))
+        ).all()
+        movements = {row.id: schemas.MovementOut.model_validate(row) for row in rows}
+        for k in known:
+            movement_id = movement_ids.get(k)
+            results[k] = schemas.QueuedMovementResult(
+                idempotency_key=k,
+                status="rejected" if movement_id is None else "duplicate",
+                movement=movements.get(movement_id),
+            )
+    db.commit()
+    if new:
+        _invalidate_stock_views(site_id)
+    # Clé répétée dans la même file : seule la première occurrence est appliquée
+    return [
+        results[item.idempotency_key]
+        if unique[item.idempotency_key] is item or results[item.idempotency_key].status == "rejected"
+        else results[item.idempotency_key].model_copy(update={"status": "duplicate"})
+        for item in items
+    ]
+
+
+def prune_sync_log(db: Session, keep_days: int) -> int:
+    """Oublie les changements et les clés d'idempotence de plus de `keep_days` jours.
+
+    Pour chaque site, le journal est effacé jusqu'au dernier numéro trop ancien,
+    retenu comme horizon (pruned_seq) : un client dont le curseur est antérieur
+    recharge tout (SyncDelta.reset).
+    """
+    cutoff = date.today() - timedelta(days=keep_days)
+    state, change = models.SyncState, models.SyncChange
+    pruned = 0
+    for site_id in get_site_ids(db):
+        horizon = db.scalar(
+            select(func.max(change.seq)).where(change.site_id == site_id, change.changed_at < cutoff)
+        )
+        if horizon is None:
+            continue
+        db.execute(
+            update(state)
+            .where(state.site_id == site_id, state.pruned_seq < horizon)
+            .values(pruned_seq=horizon)
+        )
+        pruned += db.execute(delete(change).where(change.site_id == site_id, change.seq <= horizon)).rowcount
+    db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.created_at < cutoff))
+    db.commit()
+    return pruned
+
+
 # ─── Dashboard ────────────────────────────────────────────────────────────────
 
-def get_dashboard_stats(db: Session) -> schemas.DashboardStats:
-    total_products = db.query(func.count(models.Product.id)).scalar()
+DAILY_RECONCILE_DAYS = 31
+
+
+def _track_stock_changes(db: Session, site_id: int, changes: list[StockChange]) -> list[dict]:
+    """Reporte des changements de produits sur les compteurs du tableau de bord.
+
+    À appeler après la mise à jour des produits et avant _bump_daily_counts :
+    cet ordre de verrouillage est aussi celui de reconcile_dashboard_stats.
+    Renvoie les événements d'alerte, à passer à _log_changes.
+    """
+    alert_events = _alert_events(db, site_id, changes)
+    products = low_stock = 0
+    value = Decimal("0")
+    for _, before, after in changes:
+        if before is not None:
+            products -= 1
+            low_stock -= before.is_low
+            value -= before.value
+        if after is not None:
+            products += 1
+            low_stock += after.is_low
+            value += after.value
+    if not (products or low_stock or value):
+        return alert_events
+    counters = models.DashboardCounters
+    db.execute(
+        update(counters)
+        .where(counters.id == site_id)
+        .values(
+            total_products=counters.total_products + products,
+            low_stock_count=counters.low_stock_count + low_stock,
+            total_stock_value=counters.total_stock_value + value,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return alert_events
+
+
+def _bump_daily_counts(db: Session, site_id: int, counts: dict[date, int]) -> None:
+    counts = {day: n for day, n in counts.items() if n}
+    if not counts:
+        return
+    stmt = _upsert(db, models.DailyMovementCount).values(
+        [{"site_id": site_id, "date": day, "count": n} for day, n in sorted(counts.items())]
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[models.DailyMovementCount.site_id, models.DailyMovementCount.date],
+            set_={"count": models.DailyMovementCount.count + stmt.excluded["count"]},
+        )
+    )
+
+
+def compute_dashboard_stats(db: Session, site_id: int) -> schemas.DashboardStats:
+    """Statistiques recalculées à partir des tables (cinq agrégats sur le site)."""
+    in_site = models.Product.site_id == site_id
+    total_products = db.query(func.count(models.Product.id)).filter(in_site).scalar()
 
     low_stock_count = (
         db.query(func.count(models.Product.id))
-        .filter(models.Product.quantity < models.Product.min_threshold)
+        .filter(in_site, models.LOW_STOCK)
         .scalar()
     )
 
     today = date.today()
     today_movements = (
         db.query(func.count(models.Movement.id))
-        .filter(models.Movement.date == today)
+        .filter(models.Movement.site_id == site_id, models.Movement.date == today)
         .scalar()
     )
 
@@ -125,7 +1293,7 @@ def get_dashboard_stats(db: Session) -> schemas.DashboardStats:
                 cast(models.Product.quantity, Numeric) *
                 cast(models.Product.price_per_unit, Numeric)
             )
-        ).scalar()
+        ).filter(in_site).scalar()
         or Decimal("0")
     )
 
@@ -134,4 +1302,81 @@ def get_dashboard_stats(db: Session) -> schemas.DashboardStats:
         low_stock_count=low_stock_count or 0,
         today_movements=today_movements or 0,
         total_stock_value=Decimal(str(total_value)),
+        **_lot_expiry_stats(*db.execute(_lot_expiry_query(site_id)).one()),
+    )
+
+
+def reconcile_dashboard_stats(db: Session, site_id: int) -> schemas.DashboardStats:
+    """Recale les compteurs d'un site sur les tables (au démarrage puis périodiquement)."""
+    counters = models.DashboardCounters
+    db.execute(
+        _upsert(db, counters).values(id=site_id).on_conflict_do_nothing(index_elements=[counters.id])
+    )
+    # Verrouiller les compteurs avant de compter : une écriture en cours attend
+    # notre commit puis applique sa variation sur des valeurs déjà justes.
+    row = db.query(counters).filter(counters.id == site_id).with_for_update().one()
+    stats = compute_dashboard_stats(db, site_id)
+    row.total_products = stats.total_products
+    row.low_stock_count = stats.low_stock_count
+    row.total_stock_value = stats.total_stock_value
+    row.reconciled_at = func.now()
+
+    since = date.today() - timedelta(days=DAILY_RECONCILE_DAYS)
+    daily = models.DailyMovementCount
+    db.execute(delete(daily).where(daily.site_id == site_id, daily.date >= since))
+    db.execute(
+        insert(daily).from_select(
+            ["site_id", "date", "count"],
+            select(models.Movement.site_id, models.Movement.date, func.count(models.Movement.id))
+            .where(models.Movement.site_id == site_id, models.Movement.date >= since)
+            .group_by(models.Movement.site_id, models.Movement.date),
+        )
+    )
+    db.commit()
+    cache.invalidate(cache.scoped(cache.DASHBOARD, site_id))
+    return stats
+
+
+def get_dashboard_stats(db: Session, site_id: int) -> schemas.DashboardStats:
+    """Lecture des compteurs maintenus et des lots à échéance (parcours d'index
+    borné) en une seule requête, indépendante du volume.
+
+    Les lots à échéance ne sont pas des compteurs : ils dépendent de la date du
+    jour et changent sans écriture, d'où l'agrégat joint plutôt que maintenu.
+    """
+    counters = models.DashboardCounters
+    daily = models.DailyMovementCount
+    today_movements = (
+        select(daily.count)
+        .where(daily.site_id == site_id, daily.date == date.today())
+        .scalar_subquery()
+    )
+    expiry = _lot_expiry_query(site_id).subquery()
+    row = (
+        db.query(
+            counters.total_products,
+            counters.low_stock_count,
+            counters.total_stock_value,
+            today_movements,
+            expiry.c.due_lots,
+            expiry.c.expired_lots,
+            expiry.c.expired_value,
+        )
+        .select_from(counters)
+        .join(expiry, true())
+        .filter(counters.id == site_id)
+        .first()
+    )
+    if row is None:
+        if db.info.get("replica"):
+            return compute_dashboard_stats(db, site_id)    # pas d'écriture sur un réplica
+        return reconcile_dashboard_stats(db, site_id)
+
+    total_products, low_stock_count, total_value, today_count, *expiry_row = row
+    return schemas.DashboardStats(
+        total_products=total_products,
+        low_stock_count=low_stock_count,
+        today_movements=today_count or 0,
+        total_stock_value=Decimal(str(total_value)) if total_products else Decimal("0"),
+        **_lot_expiry_stats(*expiry_row),
     )
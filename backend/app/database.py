@@ -1,20 +1,60 @@
 import re
-from sqlalchemy import create_engine
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+from sqlalchemy import Engine, create_engine, text
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from .config import settings
 
-# psycopg2 ne comprend pas ?pgbouncer=true (paramètre Supabase) — on le retire
-_db_url = re.sub(r"[?&]pgbouncer=true", "", settings.database_url)
 
+def _sync_url(url: str) -> str:
+    # psycopg2 ne comprend pas ?pgbouncer=true (paramètre Supabase) — on le retire
+    return re.sub(r"[?&]pgbouncer=true", "", url)
+
+
+def pool_limits(pool_size: int, max_overflow: int, share: float = 1.0) -> tuple[int, int]:
+    """(pool_size, max_overflow) d'un moteur, bornés par la part d'un worker.
+
+    Chaque worker uvicorn a ses propres pools : sans borne, N workers peuvent
+    ouvrir N × (pool_size + max_overflow) connexions. `share` : part du
+    budget du worker revenant à ce moteur (pile synchrone et asynchrone).
+    """
+    if settings.db_max_connections <= 0:
+        return pool_size, max_overflow
+    # Deux au moins : une tâche périodique tient une connexion pour son verrou (exclusive)
+    budget = max(2, int(settings.db_max_connections * share) // max(1, settings.web_concurrency))
+    size = min(pool_size, budget)
+    return size, min(max_overflow, budget - size)
+
+
+# Pile asynchrone active : elle prend la moitié des connexions du worker
+POOL_SHARE = 0.5 if settings.db_async else 1.0
+_pool_size, _max_overflow = pool_limits(settings.db_pool_size, settings.db_max_overflow, POOL_SHARE)
+
+# Aucune connexion n'est ouverte ici : la première l'est par prewarm_pool au
+# démarrage, ou par la première requête
 engine = create_engine(
-    _db_url,
+    _sync_url(settings.database_url),
     pool_pre_ping=True,   # vérifie la connexion avant chaque utilisation
-    pool_size=5,
-    max_overflow=10,
+    pool_size=_pool_size,
+    max_overflow=_max_overflow,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Réplica en lecture (DATABASE_REPLICA_URL, voir app/replicas.py) : mêmes
+# tailles de pool, le budget DB_MAX_CONNECTIONS vaut pour chaque serveur
+replica_engine = create_engine(
+    _sync_url(settings.database_replica_url),
+    pool_pre_ping=True,
+    pool_size=_pool_size,
+    max_overflow=_max_overflow,
+) if settings.database_replica_url else None
+
+ReplicaSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=replica_engine, info={"replica": True}
+)
+
 
 class Base(DeclarativeBase):
     pass
@@ -26,3 +66,42 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def prewarm_pool(bind: Optional[Engine] = None) -> int:
+    """Ouvre d'avance les connexions permanentes du pool, en parallèle.
+
+    Les premières requêtes après un démarrage ne paient pas l'établissement
+    de connexion (TLS, authentification). Renvoie le nombre de connexions.
+    """
+    bind = bind or engine
+    count = bind.pool.size() if hasattr(bind.pool, "size") else 0
+    if count <= 0:
+        return 0
+    connections, errors = [], []
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        for future in [executor.submit(bind.connect) for _ in range(count)]:
+            try:
+                connections.append(future.result())
+            except Exception as e:
+                errors.append(e)
+    for connection in connections:
+        connection.close()    # rendue au pool, qui la garde ouverte
+    if errors:
+        raise errors[0]
+    return len(connections)
+
+
+@contextmanager
+def exclusive(name: str):
+    """Vrai si ce worker est le seul à exécuter la tâche `name` en ce moment.
+
+    Verrou consultatif PostgreSQL lié à une transaction (fiable derrière
+    pgbouncer en mode transaction), relâché à la sortie ; toujours vrai sur
+    SQLite (un seul processus).
+    """
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    with engine.begin() as conn:
+        yield conn.scalar(text("SELECT pg_try_advisory_xact_lock(hashtext(:name))"), {"name": name})
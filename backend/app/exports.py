@@ -0,0 +1,132 @@
+"""
+Export CSV / Excel des mouvements et des produits, en flux.
+
+Les lignes sont lues par lots depuis un curseur serveur et écrites au fil de
+l'eau : la mémoire consommée ne dépend pas du nombre de lignes exportées.
+"""
+import csv
+import io
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, Iterator, Optional
+
+from fastapi.responses import StreamingResponse
+
+from . import models
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+
+CHUNK_ROWS = 1000          # lignes CSV accumulées avant envoi
+FILE_CHUNK_SIZE = 64 * 1024
+
+# Mêmes colonnes que l'ancien export navigateur (frontend/src/utils/exportExcel.js)
+MOVEMENT_HEADERS = ["Date", "Produit", "Type", "Quantité", "Commentaire"]
+MOVEMENT_WIDTHS = [12, 30, 10, 10, 40]
+
+PRODUCT_HEADERS = [
+    "Nom", "Catégorie", "Quantité", "Unité",
+    "Seuil min.", "Prix unit.", "Valeur (€)", "Statut",
+]
+
+
+def movement_row(row) -> list:
+    return [row.date, row.product_name, row.type, row.quantity, row.comment or ""]
+
+
+def product_status(product: models.Product) -> str:
+    if product.quantity <= 0:
+        return "Rupture"
+    if product.quantity < product.min_threshold:
+        return "Alerte"
+    return "OK"
+
+
+def product_row(product: models.Product) -> list:
+    value = (Decimal(product.quantity) * Decimal(product.price_per_unit)).quantize(Decimal("0.01"))
+    return [
+        product.name,
+        product.category,
+        product.quantity,
+        product.unit,
+        product.min_threshold,
+        product.price_per_unit,
+        value,
+        product_status(product),
+    ]
+
+
+def export_filename(prefix: str, fmt: str) -> str:
+    return f"{prefix}_{date.today().isoformat()}.{fmt}"
+
+
+# ─── CSV ──────────────────────────────────────────────────────────────────────
+
+def iter_csv(headers: list[str], rows: Iterable[list]) -> Iterator[str]:
+    # BOM + « ; » : ouverture directe dans un Excel configuré en français
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    buffer.write("\ufeff")
+    writer.writerow(headers)
+    for i, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if i % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+# ─── Excel ────────────────────────────────────────────────────────────────────
+
+def iter_xlsx(
+    sheet_title: str,
+    headers: list[str],
+    rows: Iterable[list],
+    widths: Optional[list[int]] = None,
+) -> Iterator[bytes]:
+    # Importé ici : openpyxl alourdit le démarrage de chaque worker
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    # Classeur en mode write_only : openpyxl écrit chaque ligne dans un fichier
+    # temporaire au lieu de garder la feuille en mémoire.
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_title)
+    for index, width in enumerate(widths or [], start=1):
+        sheet.column_dimensions[get_column_letter(index)].width = width
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(row)
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook.save(path)
+        with open(path, "rb") as f:
+            while chunk := f.read(FILE_CHUNK_SIZE):
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def streaming_export(
+    prefix: str,
+    sheet_title: str,
+    fmt: str,
+    headers: list[str],
+    rows: Iterable[list],
+    widths: Optional[list[int]] = None,
+) -> StreamingResponse:
+    if fmt == "csv":
+        body, media_type = iter_csv(headers, rows), CSV_MEDIA_TYPE
+    else:
+        body, media_type = iter_xlsx(sheet_title, headers, rows, widths), XLSX_MEDIA_TYPE
+    filename = export_filename(prefix, fmt)
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,348 @@
+"""
+Prévisions de consommation et recommandations de réapprovisionnement.
+
+Tout le calcul est vectoriel (NumPy) sur une matrice produits × jours des
+sorties : pas de boucle Python par produit.
+
+- Jours ouverts : un jour où le site consomme presque rien (week-end,
+  vacances scolaires, fermeture) est écarté ; la proportion de jours ouverts
+  par jour de semaine sert à projeter le calendrier à venir, en plus des
+  périodes de fermeture déclarées (FORECAST_HOLIDAYS).
+- Consommation : moyenne pondérée (demi-vie FORECAST_HALFLIFE_DAYS) par jour
+  de semaine ouvert, pour chaque produit.
+- Rupture : premier jour où la consommation cumulée prévue atteint le stock.
+- Seuil recommandé : consommation prévue pendant le délai de livraison plus un
+  stock de sécurité (z × écart type × √jours ouverts) ; quantité à commander :
+  de quoi couvrir délai + période de couverture.
+
+refresh() recalcule tout le site une fois par jour (l'historique glisse), et
+sinon les seuls produits modifiés depuis le passage précédent : chaque
+mouvement met à jour products.updated_at.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import Date, Float, Integer, cast, delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from . import cache, models, schemas
+from .config import settings
+
+# Un jour est ouvert si le site y consomme au moins cette part de la médiane
+OPEN_DAY_RATIO = 0.2
+# Au-delà, un passage incrémental coûterait autant qu'un calcul complet
+INCREMENTAL_MAX_PRODUCTS = 5000
+WRITE_BATCH_SIZE = 5000
+RATE_WINDOW_DAYS = 28
+
+
+@dataclass
+class Params:
+    history_days: int = 182
+    horizon_days: int = 120
+    lead_days: int = 7
+    cover_days: int = 14
+    halflife_days: float = 28.0
+    service_z: float = 1.65
+    holidays: tuple[tuple[date, date], ...] = ()
+
+    @classmethod
+    def from_settings(cls) -> "Params":
+        # Le seuil se lit au dernier jour du délai : il en faut au moins un
+        if settings.forecast_lead_days < 1:
+            raise ValueError(
+                f"FORECAST_LEAD_DAYS doit valoir au moins 1 (reçu : {settings.forecast_lead_days})"
+            )
+        return cls(
+            history_days=settings.forecast_history_days,
+            horizon_days=settings.forecast_horizon_days,
+            lead_days=settings.forecast_lead_days,
+            cover_days=settings.forecast_cover_days,
+            halflife_days=settings.forecast_halflife_days,
+            service_z=settings.forecast_service_z,
+            holidays=parse_holidays(settings.forecast_holidays),
+        )
+
+
+def parse_holidays(value: str) -> tuple[tuple[date, date], ...]:
+    """« 2026-10-17:2026-11-02,2026-12-19:2027-01-03 » → périodes (bornes incluses)."""
+    periods = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        start, _, end = item.partition(":")
+        periods.append((date.fromisoformat(start), date.fromisoformat(end or start)))
+    return tuple(periods)
+
+
+def _holiday_mask(first: date, days: int, holidays) -> np.ndarray:
+    offsets = np.arange(days)
+    mask = np.zeros(days, dtype=bool)
+    for start, end in holidays:
+        mask |= (offsets >= (start - first).days) & (offsets <= (end - first).days)
+    return mask
+
+
+def _weekday_onehot(first: date, days: int) -> np.ndarray:
+    """Matrice 7 × jours : 1 au jour de semaine de chaque jour."""
+    onehot = np.zeros((7, days), dtype=np.float32)
+    onehot[(first.weekday() + np.arange(days)) % 7, np.arange(days)] = 1
+    return onehot
+
+
+@dataclass
+class Result:
+    daily_rate: np.ndarray
+    daily_std: np.ndarray
+    observed_days: np.ndarray
+    stockout_in: np.ndarray            # jours avant rupture, -1 : pas sur l'horizon
+    recommended_threshold: np.ndarray
+    reorder_quantity: np.ndarray
+
+
+def compute(
+    consumption: np.ndarray,
+    site_totals: np.ndarray,
+    quantities: np.ndarray,
+    today: date,
+    params: Params,
+) -> Result:
+    """Prévisions de P produits.
+
+    consumption : P × D sorties par jour, du jour today - D au jour today - 1
+    site_totals : D sorties du site entier les mêmes jours (calendrier d'ouverture)
+    quantities  : P stocks actuels
+    """
+    days = consumption.shape[1]
+    first = today - timedelta(days=days)
+    horizon = max(params.horizon_days, params.lead_days + params.cover_days, RATE_WINDOW_DAYS)
+
+    # Calendrier observé depuis la première sortie du site : jours ouverts,
+    # et proportion par jour de semaine
+    offsets = np.arange(days)
+    positive = site_totals[site_totals > 0]
+    threshold = OPEN_DAY_RATIO * np.median(positive) if positive.size else np.inf
+    opened = site_totals > threshold
+    onehot = _weekday_onehot(first, days)
+    known = ~_holiday_mask(first, days, params.holidays) & (offsets >= np.argmax(site_totals > 0))
+    known_by_weekday = onehot @ known
+    open_by_weekday = np.divide(
+        onehot @ (opened & known), known_by_weekday,
+        out=np.zeros(7, dtype=np.float32), where=known_by_weekday > 0,
+    )
+
+    # Consommation par jour ouvert, pondérée vers le récent, chaque produit
+    # depuis sa première sortie (un produit récent n'est pas dilué par les
+    # jours où il n'existait pas)
+    weights = (0.5 ** ((days - 1 - offsets) / params.halflife_days) * opened).astype(np.float32)
+    by_weekday = onehot * weights                                    # 7 × D
+    # Poids cumulés de chaque jour à la fin : tail[:, d] = poids des jours >= d
+    tail = np.zeros((7, days + 1), dtype=np.float32)
+    tail[:, :days] = np.cumsum(by_weekday[:, ::-1], axis=1)[:, ::-1]
+    seen = consumption > 0
+    start = np.where(seen.any(axis=1), np.argmax(seen, axis=1), days)
+    weekday_weight = tail[:, start].T                                 # P × 7
+    rates = np.divide(
+        consumption @ by_weekday.T, weekday_weight,
+        out=np.zeros_like(weekday_weight), where=weekday_weight > 0,
+    )
+    total_weight = weekday_weight.sum(axis=1)
+    mean = np.divide(consumption @ weights, total_weight, out=np.zeros_like(total_weight), where=total_weight > 0)
+    square = np.divide(
+        (consumption * consumption) @ weights, total_weight,
+        out=np.zeros_like(total_weight), where=total_weight > 0,
+    )
+    std = np.sqrt(np.maximum(square - mean * mean, 0))
+
+    # Demande cumulée prévue à partir de demain : P × 7 @ 7 × H
+    future_first = today + timedelta(days=1)
+    future_onehot = _weekday_onehot(future_first, horizon)
+    factor = (open_by_weekday @ future_onehot) * ~_holiday_mask(future_first, horizon, params.holidays)
+    cumulated = rates @ np.cumsum(future_onehot * factor, axis=1)
+
+    # Rupture : nombre de jours où le cumul reste sous le stock (cumul croissant)
+    remaining = (cumulated < quantities[:, None]).sum(axis=1)
+    stockout_in = np.where(remaining < horizon, remaining + 1, -1)
+    stockout_in = np.where(quantities <= 0, 0, stockout_in)
+
+    lead, cover = params.lead_days, params.lead_days + params.cover_days
+    safety = params.service_z * std * np.sqrt(factor[:lead].sum())
+    threshold = cumulated[:, lead - 1] + safety
+    order_up_to = cumulated[:, cover - 1] + safety
+    return Result(
+        daily_rate=cumulated[:, RATE_WINDOW_DAYS - 1] / RATE_WINDOW_DAYS,
+        daily_std=std,
+        observed_days=seen.sum(axis=1),
+        stockout_in=stockout_in,
+        recommended_threshold=np.ceil(threshold * 100) / 100,
+        reorder_quantity=np.ceil(np.maximum(order_up_to - quantities, 0) * 100) / 100,
+    )
+
+
+# ─── Lecture de l'historique ──────────────────────────────────────────────────
+
+def _day_index(dialect: str, first: date):
+    """Rang du jour du mouvement depuis `first`, calculé par la base."""
+    if dialect == "postgresql":
+        return models.Movement.date - literal(first, Date)
+    return cast(func.julianday(models.Movement.date) - func.julianday(literal(first, Date)), Integer)
+
+
+def _load(db: Session, site_id: int, product_ids: Optional[list[int]], today: date, days: int):
+    """(ids, stocks, matrice des sorties, sorties du site par jour)."""
+    first = today - timedelta(days=days)
+    day = _day_index(db.get_bind().dialect.name, first).label("day")
+    movement = models.Movement
+    sorties = (
+        movement.site_id == site_id,
+        movement.type == "Sortie",
+        movement.date >= first,
+        movement.date < today,
+    )
+
+    products = select(models.Product.id, cast(models.Product.quantity, Float)).where(
+        models.Product.site_id == site_id
+    )
+    if product_ids is not None:
+        products = products.where(models.Product.id.in_(product_ids))
+    rows = db.execute(products.order_by(models.Product.id)).all()
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    quantities = np.array([r[1] for r in rows], dtype=np.float32)
+
+    consumption = np.zeros((len(ids), days), dtype=np.float32)
+    per_product = select(movement.product_id, day, cast(func.sum(movement.quantity), Float)).where(*sorties)
+    if product_ids is not None:
+        per_product = per_product.where(movement.product_id.in_(product_ids))
+    rows = db.execute(per_product.group_by(movement.product_id, movement.date)).all()
+    if rows and len(ids):
+        pid, day_index, quantity = (np.array(col) for col in zip(*rows))
+        row = np.searchsorted(ids, pid)
+        known = (row < len(ids)) & (ids[np.minimum(row, len(ids) - 1)] == pid)
+        consumption[row[known], day_index[known].astype(np.int64)] = quantity[known]
+
+    site_totals = np.zeros(days, dtype=np.float32)
+    rows = db.execute(
+        select(day, cast(func.sum(movement.quantity), Float)).where(*sorties).group_by(movement.date)
+    ).all()
+    if rows:
+        day_index, quantity = (np.array(col) for col in zip(*rows))
+        site_totals[day_index.astype(np.int64)] = quantity
+    return ids, quantities, consumption, site_totals
+
+
+# ─── Calcul et enregistrement ─────────────────────────────────────────────────
+
+def _write(db: Session, site_id: int, ids: np.ndarray, result: Result, today: date, full: bool) -> None:
+    forecast = models.Forecast
+    clear = delete(forecast).where(forecast.site_id == site_id)
+    if not full:
+        clear = clear.where(forecast.product_id.in_(ids.tolist()))
+    db.execute(clear)
+    columns = zip(
+        ids.tolist(),
+        result.daily_rate.tolist(),
+        result.daily_std.tolist(),
+        result.observed_days.tolist(),
+        result.stockout_in.tolist(),
+        result.recommended_threshold.tolist(),
+        result.reorder_quantity.tolist(),
+    )
+    rows = [
+        {
+            "product_id": product_id,
+            "site_id": site_id,
+            "daily_rate": round(rate, 4),
+            "daily_std": round(std, 4),
+            "observed_days": observed,
+            "stockout_date": today + timedelta(days=stockout) if stockout >= 0 else None,
+            "recommended_threshold": round(threshold, 2),
+            "reorder_quantity": round(reorder, 2),
+        }
+        for product_id, rate, std, observed, stockout, threshold, reorder in columns
+    ]
+    for i in range(0, len(rows), WRITE_BATCH_SIZE):
+        db.execute(insert(forecast), rows[i:i + WRITE_BATCH_SIZE])
+
+
+def refresh(db: Session, site_id: int, full: bool = False, params: Optional[Params] = None) -> tuple[int, bool]:
+    """Met à jour les prévisions d'un site ; renvoie (produits recalculés, calcul complet)."""
+    params = params or Params.from_settings()
+    today = date.today()
+    started_at = db.scalar(select(func.now()))
+    run = db.get(models.ForecastRun, site_id)
+    product_ids = None
+    if not (full or run is None or run.full_date != today):
+        # Marge d'une seconde : updated_at et started_at peuvent être à la seconde près
+        since = run.started_at - timedelta(seconds=1)
+        product_ids = list(db.scalars(
+            select(models.Product.id).where(
+                models.Product.site_id == site_id, models.Product.updated_at >= since
+            )
+        ))
+        if len(product_ids) > INCREMENTAL_MAX_PRODUCTS:
+            product_ids = None
+    full = product_ids is None
+
+    count = 0
+    if full or product_ids:
+        ids, quantities, consumption, site_totals = _load(db, site_id, product_ids, today, params.history_days)
+        result = compute(consumption, site_totals, quantities, today, params)
+        _write(db, site_id, ids, result, today, full)
+        count = len(ids)
+
+    if run is None:
+        run = models.ForecastRun(site_id=site_id, started_at=started_at, full_date=today)
+        db.add(run)
+    run.started_at = started_at
+    if full:
+        run.full_date = today
+    db.commit()
+    if count:
+        cache.invalidate(cache.scoped(cache.FORECASTS, site_id))
+    return count, full
+
+
+def get_forecasts(
+    db: Session,
+    site_id: int,
+    category: Optional[str] = None,
+    within_days: Optional[int] = None,
+    product_id: Optional[int] = None,
+) -> list[schemas.ForecastOut]:
+    """Prévisions des produits du site, ruptures les plus proches d'abord."""
+    forecast, product = models.Forecast, models.Product
+    q = (
+        select(
+            forecast, product.name, product.category, product.unit,
+            product.quantity, product.min_threshold,
+        )
+        .join(product, product.id == forecast.product_id)
+        .where(forecast.site_id == site_id)
+    )
+    if product_id:
+        q = q.where(forecast.product_id == product_id)
+    if category:
+        q = q.where(product.category == category)
+    today = date.today()
+    if within_days is not None:
+        q = q.where(forecast.stockout_date <= today + timedelta(days=within_days))
+    q = q.order_by(forecast.stockout_date.is_(None), forecast.stockout_date, product.name)
+    return [
+        schemas.ForecastOut(
+            product_id=f.product_id,
+            name=name,
+            category=category_,
+            unit=unit,
+            quantity=quantity,
+            min_threshold=min_threshold,
+            daily_rate=f.daily_rate,
+            daily_std=f.daily_std,
+            observed_days=f.observed_days,
+            stockout_date=f.stockout_date,
+            days_to_stockout=(f.stockout_date - today).days if f.stockout_date else None,
+            recommended_threshold=f.recommended_threshold,
+            reorder_quantity=f.reorder_quantity,
+            computed_at=f.computed_at,
+        )
+        for f, name, category_, unit, quantity, min_threshold in db.execute(q)
+    ]
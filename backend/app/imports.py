@@ -0,0 +1,158 @@
+"""
+Import en masse de produits et de mouvements (JSON, CSV ou Excel).
+
+Chaque ligne est validée avec les schémas de l'API ; les lignes valides sont
+insérées en une seule transaction par requêtes multi-lignes, les autres sont
+renvoyées dans le rapport avec leur numéro de ligne.
+"""
+import csv
+import io
+import json
+from typing import Any
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from . import crud, schemas
+from .exports import XLSX_MEDIA_TYPE
+
+MOVEMENT_TYPES = ("Entrée", "Sortie")
+
+# En-têtes des fichiers produits par l'export (exports.py) → champs de l'API
+PRODUCT_ALIASES = {
+    "Nom":        "name",
+    "Catégorie":  "category",
+    "Quantité":   "quantity",
+    "Unité":      "unit",
+    "Seuil min.": "min_threshold",
+    "Prix unit.": "price_per_unit",
+}
+
+MOVEMENT_ALIASES = {
+    "Date":        "date",
+    "Produit":     "product_name",
+    "Type":        "type",
+    "Quantité":    "quantity",
+    "Commentaire": "comment",
+    "Lot":         "lot_number",
+    "DLC":         "expiry_date",
+}
+
+
+# ─── Lecture du fichier ───────────────────────────────────────────────────────
+
+def _clean(row: dict, aliases: dict[str, str]) -> dict:
+    cleaned = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        key = str(key).strip()
+        if isinstance(value, str):
+            value = value.strip()
+        cleaned[aliases.get(key, key)] = None if value == "" else value
+    return cleaned
+
+
+def _read_csv(body: bytes) -> list[dict]:
+    text = body.decode("utf-8-sig")
+    dialect = csv.Sniffer().sniff(text[:4096], delimiters=";,\t")
+    return list(csv.DictReader(io.StringIO(text), dialect=dialect))
+
+
+def _read_xlsx(body: bytes) -> list[dict]:
+    from openpyxl import load_workbook    # voir exports.iter_xlsx
+
+    workbook = load_workbook(io.BytesIO(body), read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = next(rows, ())
+        return [
+            dict(zip(headers, values))
+            for values in rows
+            if any(v is not None for v in values)
+        ]
+    finally:
+        workbook.close()
+
+
+def parse_upload(content_type: str, body: bytes) -> list[dict]:
+    """Lève ValueError si le contenu est illisible."""
+    media_type = content_type.split(";")[0].strip().lower()
+    try:
+        if media_type == "application/json":
+            rows = json.loads(body)
+            if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+                raise ValueError("un tableau JSON d'objets est attendu")
+            return rows
+        if media_type in ("text/csv", "application/csv"):
+            return _read_csv(body)
+        if media_type == XLSX_MEDIA_TYPE:
+            return _read_xlsx(body)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"fichier illisible ({e})") from e
+    raise ValueError(f"type de contenu non supporté : {media_type or 'inconnu'}")
+
+
+def _format_errors(e: ValidationError) -> list[str]:
+    return [
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+        for err in e.errors()
+    ]
+
+
+# ─── Import ───────────────────────────────────────────────────────────────────
+
+def import_products(db: Session, site_id: int, rows: list[dict[str, Any]]) -> schemas.ImportReport:
+    valid: list[schemas.ProductCreate] = []
+    errors: list[schemas.ImportRowError] = []
+    for number, row in enumerate(rows, start=1):
+        try:
+            valid.append(schemas.ProductCreate(**_clean(row, PRODUCT_ALIASES)))
+        except ValidationError as e:
+            errors.append(schemas.ImportRowError(row=number, errors=_format_errors(e)))
+
+    inserted = crud.bulk_create_products(db, site_id, valid) if valid else 0
+    return schemas.ImportReport(inserted=inserted, errors=errors)
+
+
+def import_movements(db: Session, site_id: int, rows: list[dict[str, Any]]) -> schemas.ImportReport:
+    rows = [_clean(row, MOVEMENT_ALIASES) for row in rows]
+
+    # Les fichiers exportés désignent le produit par son nom : résolution en une passe
+    names = {row["product_name"] for row in rows if not row.get("product_id") and row.get("product_name")}
+    ids_by_name = crud.get_product_ids_by_name(db, site_id, names) if names else {}
+
+    candidates: list[tuple[int, schemas.MovementCreate]] = []
+    errors: list[schemas.ImportRowError] = []
+    for number, row in enumerate(rows, start=1):
+        name = row.pop("product_name", None)
+        if not row.get("product_id") and name:
+            matches = ids_by_name.get(name, [])
+            if len(matches) != 1:
+                detail = "Produit introuvable" if not matches else "Nom de produit ambigu"
+                errors.append(schemas.ImportRowError(row=number, errors=[f"product_name: {detail}"]))
+                continue
+            row["product_id"] = matches[0]
+        try:
+            item = schemas.MovementCreate(**row)
+        except ValidationError as e:
+            errors.append(schemas.ImportRowError(row=number, errors=_format_errors(e)))
+            continue
+        if item.type not in MOVEMENT_TYPES:
+            errors.append(schemas.ImportRowError(row=number, errors=["type: 'Entrée' ou 'Sortie' attendu"]))
+            continue
+        candidates.append((number, item))
+
+    existing = crud.get_existing_product_ids(db, site_id, {item.product_id for _, item in candidates})
+    valid = []
+    for number, item in candidates:
+        if item.product_id in existing:
+            valid.append(item)
+        else:
+            errors.append(schemas.ImportRowError(row=number, errors=["product_id: Produit introuvable"]))
+
+    errors.sort(key=lambda e: e.row)
+    inserted = crud.bulk_create_movements(db, site_id, valid) if valid else 0
+    return schemas.ImportReport(inserted=inserted, errors=errors)
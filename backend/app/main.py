@@ -1,22 +1,176 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
 
 from .config import settings
-from .database import Base, engine
-from .routers import products, movements
-from . import crud, schemas
+from .database import engine, exclusive, prewarm_pool, replica_engine
+from .routers import (
+    sites, products, movements, lots, alerts as alert_routes, analytics, snapshots, forecasts, sync,
+    async_routes,
+)
+from . import alerts, cache, crud, forecasting, metrics, migrations, partitions, replicas, schemas
 from .database import SessionLocal
+from .async_database import dispose_async_engine, prewarm_async_pool
+from .replicas import get_read_db
+from .sites import get_site_id
+
+# Le schéma n'est pas touché à l'import : chaque worker uvicorn importe ce
+# module. Mise à niveau par `python -m app.migrations` avant le déploiement,
+# ou au démarrage avec MIGRATE_ON_STARTUP (développement).
+
+
+def _migrate() -> None:
+    try:
+        migrations.upgrade(engine)
+    except Exception as e:
+        print(f"[WARNING] Impossible de créer les tables au démarrage : {e}")
+
+
+async def _prewarm_pools() -> None:
+    # Non bloquant si la DB est injoignable : les requêtes réessaieront
+    try:
+        await run_in_threadpool(prewarm_pool)
+        if settings.db_async:
+            await prewarm_async_pool()
+        if replicas.enabled:
+            await run_in_threadpool(prewarm_pool, replica_engine)
+            if settings.db_async:
+                await prewarm_async_pool(replica=True)
+    except Exception as e:
+        print(f"[WARNING] Ouverture anticipée des connexions impossible : {e}")
+
+
+# Tâches périodiques : chaque worker a sa boucle, mais un seul à la fois
+# exécute une tâche donnée (database.exclusive), les autres passent leur tour.
+
+def _exclusively(name: str, job) -> None:
+    try:
+        with exclusive(name) as acquired:
+            if acquired:
+                job()
+    except Exception as e:
+        print(f"[WARNING] Tâche « {name} » non lancée : {e}")
+
+
+def _reconcile_dashboard() -> None:
+    db = SessionLocal()
+    try:
+        for site_id in crud.get_site_ids(db):
+            crud.reconcile_dashboard_stats(db, site_id)
+    except Exception as e:
+        print(f"[WARNING] Recalage des compteurs du tableau de bord impossible : {e}")
+    finally:
+        db.close()
+
+
+async def _reconcile_dashboard_periodically(interval: int) -> None:
+    while True:
+        await run_in_threadpool(_exclusively, "reconcile_dashboard", _reconcile_dashboard)
+        await asyncio.sleep(interval)
+
+
+def _take_snapshots() -> None:
+    db = SessionLocal()
+    try:
+        today = date.today()
+        # Serveur arrêté à minuit : la photo de la veille est reconstituée
+        if not crud.get_snapshot_summaries(db, None, today - timedelta(days=1), today - timedelta(days=1)):
+            crud.take_stock_snapshot(db, today - timedelta(days=1))
+        crud.take_stock_snapshot(db, today)
+        crud.prune_stock_snapshots(db, settings.snapshot_daily_retention)
+        crud.prune_alert_events(db, settings.alert_event_retention_days)
+        crud.prune_sync_log(db, settings.sync_retention_days)
+    except Exception as e:
+        db.rollback()
+        print(f"[WARNING] Photo du stock impossible : {e}")
+    finally:
+        db.close()
+
+
+async def _take_snapshots_periodically(interval: int) -> None:
+    while True:
+        await run_in_threadpool(_exclusively, "take_snapshots", _take_snapshots)
+        await asyncio.sleep(interval)
+
+
+def _refresh_forecasts() -> None:
+    db = SessionLocal()
+    try:
+        for site_id in crud.get_site_ids(db):
+            forecasting.refresh(db, site_id)
+    except Exception as e:
+        db.rollback()
+        print(f"[WARNING] Calcul des prévisions impossible : {e}")
+    finally:
+        db.close()
+
+
+async def _refresh_forecasts_periodically(interval: int) -> None:
+    while True:
+        await run_in_threadpool(_exclusively, "refresh_forecasts", _refresh_forecasts)
+        await asyncio.sleep(interval)
+
+
+# Partitions mensuelles de movements : créées MONTHS_AHEAD mois à l'avance,
+# une vérification par jour suffit (la première est faite par les migrations)
+PARTITION_CHECK_INTERVAL = 24 * 3600
+
+
+def _ensure_partitions() -> None:
+    try:
+        for name in partitions.ensure_month_partitions(engine):
+            print(f"[INFO] Partition {name} créée")
+    except Exception as e:
+        print(f"[WARNING] Création des partitions de mouvements impossible : {e}")
+
+
+async def _ensure_partitions_periodically(interval: int) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await run_in_threadpool(_exclusively, "ensure_partitions", _ensure_partitions)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.migrate_on_startup:
+        await run_in_threadpool(_migrate)
+    if settings.db_pool_prewarm:
+        await _prewarm_pools()
+    tasks = [
+        asyncio.create_task(_ensure_partitions_periodically(PARTITION_CHECK_INTERVAL)),
+        asyncio.create_task(alerts.hub.run(settings.alert_poll_interval)),
+    ]
+    if replicas.enabled:
+        tasks.append(asyncio.create_task(replicas.monitor(settings.replica_check_interval)))
+    if settings.dashboard_reconcile_interval > 0:
+        tasks.append(asyncio.create_task(
+            _reconcile_dashboard_periodically(settings.dashboard_reconcile_interval)
+        ))
+    if settings.snapshot_interval > 0:
+        tasks.append(asyncio.create_task(
+            _take_snapshots_periodically(settings.snapshot_interval)
+        ))
+    if settings.forecast_interval > 0:
+        tasks.append(asyncio.create_task(
+            _refresh_forecasts_periodically(settings.forecast_interval)
+        ))
+    yield
+    for task in tasks:
+        task.cancel()
+    await dispose_async_engine()
 
-# Créer les tables si elles n'existent pas (non bloquant si la DB est injoignable)
-try:
-    Base.metadata.create_all(bind=engine)
-except Exception as e:
-    print(f"[WARNING] Impossible de créer les tables au démarrage : {e}")
 
 app = FastAPI(
     title="Stock Manager API",
     description="API de gestion des stocks — cantines, mairies, bibliothèques",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -25,19 +179,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", replicas.READ_AFTER_HEADER],
 )
 
+if replicas.enabled:
+    app.add_middleware(replicas.ReadAfterWriteMiddleware)
+
+if settings.db_async:
+    # Enregistrées en premier : elles priment sur les routes synchrones de même chemin
+    app.include_router(async_routes.router)
+app.include_router(sites.router)
 app.include_router(products.router)
 app.include_router(movements.router)
+app.include_router(lots.router)
+app.include_router(alert_routes.router)
+app.include_router(analytics.router)
+app.include_router(snapshots.router)
+app.include_router(forecasts.router)
+app.include_router(sync.router)
+
+if settings.metrics_enabled:
+    metrics.install(app, engine)
+    if replicas.enabled:
+        metrics.instrument_engine(replica_engine, "replica")
+
+
+DASHBOARD_STATS = TypeAdapter(schemas.DashboardStats)
 
 
 @app.get("/api/dashboard", response_model=schemas.DashboardStats, tags=["dashboard"])
-def dashboard_stats():
-    db = SessionLocal()
-    try:
-        return crud.get_dashboard_stats(db)
-    finally:
-        db.close()
+def dashboard_stats(request: Request, site_id: int = Depends(get_site_id), db: Session = Depends(get_read_db)):
+    return cache.cached_json(
+        request, cache.DASHBOARD, site_id, lambda: crud.get_dashboard_stats(db, site_id), DASHBOARD_STATS
+    )
 
 
 @app.get("/health", tags=["health"])
@@ -0,0 +1,276 @@
+"""
+Instrumentation des performances, exposée au format texte Prometheus sur /metrics.
+
+- un middleware ASGI mesure la latence de chaque requête, par route (le gabarit
+  de chemin, ex. /api/products/{product_id}, pas l'URL réelle) ;
+- des hooks d'événements SQLAlchemy comptent les requêtes SQL exécutées pendant
+  chaque requête HTTP et le temps passé en base ;
+- une même instruction SQL répétée plus de N_PLUS_ONE_THRESHOLD fois dans une
+  requête HTTP est signalée (motif N+1 typique d'un accès paresseux à une
+  relation dans une boucle) ;
+- l'état du pool de connexions de chaque moteur instrumenté est relevé à chaque
+  collecte.
+
+Activée par METRICS_ENABLED=true. Les compteurs sont propres à chaque worker
+uvicorn : avec plusieurs workers, chaque collecte ne voit que celui qui répond.
+"""
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PREFIX = "stock"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+N_PLUS_ONE_THRESHOLD = 10
+UNMATCHED_ROUTE = "<unmatched>"
+INF_BUCKET = 'le="+Inf"'
+
+
+class _RequestStats:
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: Counter[str] = Counter()
+
+
+_current: ContextVar[Optional[_RequestStats]] = ContextVar("request_stats", default=None)
+
+
+# ─── Registre ─────────────────────────────────────────────────────────────────
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class _Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: dict[tuple, _Histogram] = {}
+        self.db_seconds: dict[tuple, _Histogram] = {}
+        self.query_counts: dict[tuple, _Histogram] = {}
+        self.requests: Counter[tuple] = Counter()
+        self.n_plus_one: Counter[tuple] = Counter()
+        self.queries_total = 0
+        self.query_seconds = _Histogram(LATENCY_BUCKETS)
+        self.engines: dict[str, Engine] = {}
+        self._reported: set[tuple] = set()
+
+    def record_request(self, method: str, route: str, status: int,
+                       seconds: float, stats: _RequestStats) -> None:
+        key = (method, route)
+        repeated = [s for s, n in stats.statements.items() if n > N_PLUS_ONE_THRESHOLD]
+        with self._lock:
+            self.requests[(method, route, str(status))] += 1
+            self.latency.setdefault(key, _Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.db_seconds.setdefault(key, _Histogram(LATENCY_BUCKETS)).observe(stats.db_seconds)
+            self.query_counts.setdefault(key, _Histogram(QUERY_COUNT_BUCKETS)).observe(stats.queries)
+            if repeated:
+                self.n_plus_one[key] += 1
+            new = [s for s in repeated if (route, s) not in self._reported]
+            self._reported.update((route, s) for s in new)
+        for statement in new:
+            print(f"[WARNING] N+1 probable sur {method} {route} : "
+                  f"{stats.statements[statement]} exécutions de « {' '.join(statement.split())[:200]} »")
+
+    def record_query(self, seconds: float) -> None:
+        with self._lock:
+            self.queries_total += 1
+            self.query_seconds.observe(seconds)
+
+
+registry = _Registry()
+
+
+# ─── Hooks SQLAlchemy ─────────────────────────────────────────────────────────
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_start"].pop()
+    registry.record_query(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        stats.statements[statement] += 1
+
+
+def instrument_engine(engine: Engine, name: str = "default") -> None:
+    """Branche les hooks de comptage sur un moteur et suit son pool de connexions."""
+    if name in registry.engines and registry.engines[name] is engine:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    registry.engines[name] = engine
+
+
+# ─── Middleware ───────────────────────────────────────────────────────────────
+
+class MetricsMiddleware:
+    """Middleware ASGI pur : ne met pas les réponses en tampon (streaming compris)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = _RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            route = scope.get("route")
+            registry.record_request(
+                scope["method"],
+                getattr(route, "path", UNMATCHED_ROUTE),
+                status,
+                elapsed,
+                stats,
+            )
+
+
+# ─── Exposition ───────────────────────────────────────────────────────────────
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_bound(bound: float) -> str:
+    return str(int(bound)) if float(bound).is_integer() else str(bound)
+
+
+def _histogram_lines(name: str, help_: str, series: dict, label_names: tuple) -> list[str]:
+    lines = [f"# HELP {name} {help_}", f"# TYPE {name} histogram"]
+    for values, h in sorted(series.items()):
+        cumulative = 0
+        for bound, n in zip(h.buckets, h.counts):
+            cumulative += n
+            le = f'le="{_format_bound(bound)}"'
+            lines.append(f"{name}_bucket{_labels(label_names, values, le)} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(label_names, values, INF_BUCKET)} {h.count}")
+        lines.append(f"{name}_sum{_labels(label_names, values)} {h.sum}")
+        lines.append(f"{name}_count{_labels(label_names, values)} {h.count}")
+    return lines
+
+
+def _counter_lines(name: str, help_: str, series: dict, label_names: tuple) -> list[str]:
+    lines = [f"# HELP {name} {help_}", f"# TYPE {name} counter"]
+    for values, n in sorted(series.items()):
+        lines.append(f"{name}{_labels(label_names, values)} {n}")
+    return lines
+
+
+def _pool_lines() -> list[str]:
+    gauges = {
+        "size": "Taille nominale du pool de connexions",
+        "checked_out": "Connexions actuellement empruntées",
+        "checked_in": "Connexions disponibles dans le pool",
+        "overflow": "Connexions ouvertes au-delà de la taille nominale",
+    }
+    readers = {
+        "size": "size",
+        "checked_out": "checkedout",
+        "checked_in": "checkedin",
+        "overflow": "overflow",
+    }
+    lines = []
+    for gauge, help_ in gauges.items():
+        name = f"{PREFIX}_db_pool_{gauge}"
+        lines += [f"# HELP {name} {help_}", f"# TYPE {name} gauge"]
+        for engine_name, engine in sorted(registry.engines.items()):
+            reader = getattr(engine.pool, readers[gauge], None)
+            if reader is not None:
+                lines.append(f'{name}{{engine="{_escape(engine_name)}"}} {reader()}')
+    return lines
+
+
+def render() -> str:
+    r = registry
+    route = ("method", "route")
+    with r._lock:
+        lines = _counter_lines(
+            f"{PREFIX}_http_requests_total", "Requêtes HTTP traitées",
+            r.requests, ("method", "route", "status"),
+        )
+        lines += _histogram_lines(
+            f"{PREFIX}_http_request_duration_seconds", "Latence des requêtes HTTP",
+            r.latency, route,
+        )
+        lines += _histogram_lines(
+            f"{PREFIX}_http_request_db_seconds", "Temps passé en base par requête HTTP",
+            r.db_seconds, route,
+        )
+        lines += _histogram_lines(
+            f"{PREFIX}_http_request_db_queries", "Nombre de requêtes SQL par requête HTTP",
+            r.query_counts, route,
+        )
+        lines += _counter_lines(
+            f"{PREFIX}_http_n_plus_one_total",
+            f"Requêtes HTTP ayant répété une même instruction SQL plus de {N_PLUS_ONE_THRESHOLD} fois",
+            r.n_plus_one, route,
+        )
+        lines += _counter_lines(
+            f"{PREFIX}_db_queries_total", "Requêtes SQL exécutées",
+            {(): r.queries_total}, (),
+        )
+        lines += _histogram_lines(
+            f"{PREFIX}_db_query_duration_seconds", "Durée des requêtes SQL",
+            {(): r.query_seconds}, (),
+        )
+    lines += _pool_lines()
+    return "\n".join(lines) + "\n"
+
+
+def install(app: FastAPI, engine: Engine) -> None:
+    instrument_engine(engine)
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
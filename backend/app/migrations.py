@@ -0,0 +1,174 @@
+"""
+Mise à niveau du schéma d'une base existante.
+
+Base.metadata.create_all crée les tables manquantes mais ne touche pas aux
+tables déjà présentes : les colonnes et index ajoutés depuis dans models.py n'y
+sont donc jamais créés. upgrade() crée les tables manquantes, ajoute les
+colonnes absentes, supprime les index devenus inutiles puis crée chaque index
+absent ; sur PostgreSQL les index sont construits avec CREATE INDEX
+CONCURRENTLY pour ne pas bloquer les écritures sur une table déjà volumineuse.
+
+Partitionnement (PostgreSQL, optionnel) : --partition-movements transforme la
+table movements en table partitionnée, par mois (défaut) ou par site ; voir
+app/partitions.py. L'opération recopie la table sous verrou exclusif : à
+lancer hors service.
+
+L'application ne touche pas au schéma au démarrage (sauf MIGRATE_ON_STARTUP,
+pour le développement) : cette commande est l'étape de déploiement à lancer
+avant de démarrer les workers (release du Procfile, preDeployCommand sur
+Render et Railway).
+
+Utilisation : python -m app.migrations [--partition-movements [month|site]]
+"""
+import sys
+from contextlib import contextmanager
+
+from sqlalchemy import Engine, Index, inspect, text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from . import models, partitions, search
+from .database import Base
+
+# Remplacés par les index commençant par site_id
+OBSOLETE_INDEXES = (
+    "ix_products_name",
+    "ix_products_category_name",
+    "ix_products_low_stock",
+    "ix_movements_date_id",
+    "ix_movements_type_date_id",
+    "ix_alert_events_site_id",
+)
+
+# Tables de données dérivées, recréées (puis recalculées) si leur clé a changé
+DERIVED_TABLES = (models.DailyMovementCount.__table__,)
+
+
+def _create_index(engine: Engine, index: Index) -> None:
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    _execute_index_ddl(engine, index.table.name, ddl)
+
+
+def _execute_index_ddl(engine: Engine, table: str, ddl: str) -> None:
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            # CONCURRENTLY : pas de verrou en écriture, mais hors transaction.
+            # Non supporté sur une table partitionnée (index créé partition par partition).
+            if not partitions.is_partitioned(conn, table):
+                ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+            conn.exec_driver_sql(ddl)
+    else:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(ddl)
+
+
+def _drop_index(engine: Engine, name: str) -> None:
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    else:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+
+
+def _add_missing_columns(engine: Engine) -> None:
+    """ALTER TABLE … ADD COLUMN pour les colonnes déclarées mais absentes.
+
+    Avec une valeur par défaut constante, PostgreSQL n'a pas à réécrire la
+    table. Les clés étrangères sont ajoutées NOT VALID puis validées, ce qui ne
+    bloque pas les écritures pendant le contrôle des lignes existantes.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = str(CreateColumn(column).compile(dialect=engine.dialect))
+            with engine.begin() as conn:
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+            if engine.dialect.name != "postgresql":
+                continue    # SQLite : pas d'ajout de contrainte sur une table existante
+            for fk in column.foreign_keys:
+                name = f"{table.name}_{column.name}_fkey"
+                target = fk.column
+                with engine.begin() as conn:
+                    conn.exec_driver_sql(
+                        f"ALTER TABLE {table.name} ADD CONSTRAINT {name} FOREIGN KEY ({column.name}) "
+                        f"REFERENCES {target.table.name} ({target.name}) NOT VALID"
+                    )
+                with engine.begin() as conn:
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} VALIDATE CONSTRAINT {name}")
+
+
+def _recreate_derived_tables(engine: Engine) -> None:
+    inspector = inspect(engine)
+    for table in DERIVED_TABLES:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        if {c.name for c in table.primary_key.columns} <= existing:
+            continue
+        table.drop(bind=engine)
+        table.create(bind=engine)
+
+
+def _ensure_default_site(engine: Engine) -> None:
+    sites = models.Site.__table__
+    with engine.begin() as conn:
+        if conn.scalar(sites.select().with_only_columns(sites.c.id).where(sites.c.id == models.DEFAULT_SITE_ID)):
+            return
+        conn.execute(sites.insert().values(id=models.DEFAULT_SITE_ID, name="Site principal"))
+        if engine.dialect.name == "postgresql":
+            # id explicite : la séquence doit repartir après
+            conn.exec_driver_sql(
+                "SELECT setval(pg_get_serial_sequence('sites', 'id'), (SELECT max(id) FROM sites))"
+            )
+
+
+@contextmanager
+def _migration_lock(engine: Engine):
+    """Une seule mise à niveau à la fois (déploiements simultanés, MIGRATE_ON_STARTUP
+    avec plusieurs workers) ; les suivantes attendent puis ne trouvent rien à faire."""
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": "stock_manager.migrations"})
+        yield
+
+
+def upgrade(engine: Engine) -> None:
+    with _migration_lock(engine):
+        _upgrade(engine)
+
+
+def _upgrade(engine: Engine) -> None:
+    Base.metadata.create_all(bind=engine)
+    _ensure_default_site(engine)
+    _recreate_derived_tables(engine)
+    _add_missing_columns(engine)
+    for name in OBSOLETE_INDEXES:
+        _drop_index(engine, name)
+    for table in Base.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            _create_index(engine, index)
+    if engine.dialect.name == "postgresql":
+        # Recherche : index GIN propres à PostgreSQL (f_unaccent, pg_trgm)
+        search.ensure_postgres_objects(engine)
+        for table, ddl in search.POSTGRES_INDEXES:
+            _execute_index_ddl(engine, table, ddl)
+    partitions.ensure_month_partitions(engine)
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    upgrade(engine)
+    args = sys.argv[1:]
+    if "--partition-movements" in args:
+        following = args[args.index("--partition-movements") + 1:]
+        by = following[0] if following and following[0] in ("month", "site") else "month"
+        partitions.partition_movements(engine, by)
+    print("✓ Schéma à jour.")
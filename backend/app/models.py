@@ -1,17 +1,37 @@
 from datetime import date, datetime
 from decimal import Decimal
 from sqlalchemy import (
-    Column, Integer, String, Numeric, Date, Text,
-    ForeignKey, DateTime, CheckConstraint, func,
+    Column, Integer, BigInteger, Boolean, String, Numeric, Date, Text,
+    ForeignKey, DateTime, CheckConstraint, Index, case, func, literal_column,
 )
 from sqlalchemy.orm import relationship
 from .database import Base
 
 
+# Site par défaut : celui des données antérieures au multi-site
+DEFAULT_SITE_ID = 1
+
+
+class Site(Base):
+    """Structure (cantine, service, bibliothèque…) dont on gère le stock."""
+    __tablename__ = "sites"
+
+    id         = Column(Integer, primary_key=True)
+    name       = Column(String(255), nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# Toutes les requêtes sont filtrées par site : les index commencent par site_id.
+
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("ix_products_site_name", "site_id", "name"),
+        Index("ix_products_site_category_name", "site_id", "category", "name"),
+    )
 
     id            = Column(Integer, primary_key=True, index=True)
+    site_id       = Column(Integer, ForeignKey("sites.id"), nullable=False, server_default=str(DEFAULT_SITE_ID))
     name          = Column(String(255), nullable=False)
     category      = Column(String(100), nullable=False)
     quantity      = Column(Numeric(10, 2), nullable=False, default=0)
@@ -28,9 +48,15 @@ class Movement(Base):
     __tablename__ = "movements"
     __table_args__ = (
         CheckConstraint("type IN ('Entrée', 'Sortie')", name="movement_type_check"),
+        # Tri (date desc, id desc) de crud.get_movements, avec ou sans filtre
+        Index("ix_movements_site_date_id", "site_id", "date", "id"),
+        Index("ix_movements_product_date_id", "product_id", "date", "id"),
+        Index("ix_movements_site_type_date_id", "site_id", "type", "date", "id"),
     )
 
     id         = Column(Integer, primary_key=True, index=True)
+    # Recopié du produit : filtre et clé de partitionnement sans jointure
+    site_id    = Column(Integer, ForeignKey("sites.id"), nullable=False, server_default=str(DEFAULT_SITE_ID))
     product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
     type       = Column(String(10), nullable=False)
     quantity   = Column(Numeric(10, 2), nullable=False)
@@ -39,3 +65,212 @@ class Movement(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     product = relationship("Product", back_populates="movements")
+
+
+# Variation de stock d'un mouvement : + pour une entrée, − pour une sortie
+SIGNED_QUANTITY = case(
+    (Movement.type == "Entrée", Movement.quantity),
+    else_=-Movement.quantity,
+)
+
+# Produits en alerte : index partiel, limité aux lignes sous le seuil et trié
+# sur le ratio utilisé par crud.alert_product_rows_stmt.
+LOW_STOCK = Product.quantity < Product.min_threshold
+ALERT_RATIO = Product.quantity / func.nullif(Product.min_threshold, 0)
+
+Index(
+    "ix_products_site_low_stock",
+    Product.site_id,
+    ALERT_RATIO,
+    postgresql_where=LOW_STOCK,
+    sqlite_where=LOW_STOCK,
+)
+
+
+# ─── Lots ─────────────────────────────────────────────────────────────────────
+# Une entrée crée un lot (date limite facultative) ; les sorties puisent dans
+# les lots ouverts, la date limite la plus proche d'abord (FEFO, puis ordre
+# d'arrivée), par crud._consume_lots. La somme des lots ouverts d'un produit ne
+# dépasse jamais sa quantité : le reste est du stock sans lot (antérieur aux
+# lots, ou corrigé à la main). Pas de clé étrangère vers movements : la table
+# peut être partitionnée et ses vieux mois archivés.
+
+class Lot(Base):
+    __tablename__ = "lots"
+
+    id               = Column(Integer, primary_key=True)
+    site_id          = Column(Integer, ForeignKey("sites.id"), nullable=False)
+    product_id       = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    movement_id      = Column(Integer, nullable=True)      # entrée d'origine
+    lot_number       = Column(String(100), nullable=True)  # numéro du fournisseur
+    received_date    = Column(Date, nullable=False)
+    expiry_date      = Column(Date, nullable=True)         # None : non périssable
+    initial_quantity = Column(Numeric(10, 2), nullable=False)
+    quantity         = Column(Numeric(10, 2), nullable=False)   # restant, 0 : lot épuisé
+    created_at       = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# Index partiels limités aux lots ouverts (les lots épuisés restent pour la
+# traçabilité mais ne sont plus jamais parcourus) : ordre FEFO par produit, et
+# échéances par site pour crud.get_expiring_lots et le tableau de bord.
+# Littéral et non paramètre : le planificateur doit reconnaître le prédicat de l'index
+OPEN_LOT = Lot.quantity > literal_column("0")
+
+Index(
+    "ix_lots_product_fefo",
+    Lot.product_id, Lot.expiry_date, Lot.id,
+    postgresql_where=OPEN_LOT,
+    sqlite_where=OPEN_LOT,
+)
+Index(
+    "ix_lots_site_expiry",
+    Lot.site_id, Lot.expiry_date,
+    postgresql_where=OPEN_LOT,
+    sqlite_where=OPEN_LOT,
+)
+
+# ─── Compteurs du tableau de bord ─────────────────────────────────────────────
+# Maintenus par les écritures de crud.py, recalculés périodiquement par
+# crud.reconcile_dashboard_stats. Une ligne par site.
+
+class DashboardCounters(Base):
+    __tablename__ = "dashboard_counters"
+
+    id                = Column(Integer, primary_key=True)   # id du site
+    total_products    = Column(Integer, nullable=False, default=0)
+    low_stock_count   = Column(Integer, nullable=False, default=0)
+    total_stock_value = Column(Numeric(20, 4), nullable=False, default=0)
+    reconciled_at     = Column(DateTime(timezone=True), nullable=True)
+
+
+class DailyMovementCount(Base):
+    __tablename__ = "daily_movement_counts"
+
+    site_id = Column(Integer, primary_key=True)
+    date    = Column(Date, primary_key=True)
+    count   = Column(Integer, nullable=False, default=0)
+
+
+# ─── Photos de stock ──────────────────────────────────────────────────────────
+# Quantité de chaque produit en fin de journée (mouvements datés de ce jour
+# compris), prise périodiquement par crud.take_stock_snapshot. Pas de clé
+# étrangère : la photo d'un produit supprimé depuis reste valable pour l'audit.
+
+class StockSnapshot(Base):
+    __tablename__ = "stock_snapshots"
+    __table_args__ = (
+        Index("ix_stock_snapshots_product_date", "product_id", "date"),
+        Index("ix_stock_snapshots_site_date", "site_id", "date"),
+    )
+
+    date           = Column(Date, primary_key=True)
+    product_id     = Column(Integer, primary_key=True)
+    site_id        = Column(Integer, nullable=False, server_default=str(DEFAULT_SITE_ID))
+    name           = Column(String(255), nullable=False)
+    category       = Column(String(100), nullable=False)
+    unit           = Column(String(50), nullable=False)
+    quantity       = Column(Numeric(10, 2), nullable=False)
+    price_per_unit = Column(Numeric(10, 2), nullable=False)
+    taken_at       = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# ─── Événements d'alerte ──────────────────────────────────────────────────────
+# Passage d'un produit d'un statut de stock à un autre (OK / Alerte / Rupture),
+# relevé par crud._track_stock_changes, inscrit par crud._log_changes dans la
+# transaction de l'écriture et diffusé aux navigateurs par app/alerts.py. Pas de clé étrangère : l'événement
+# de suppression d'un produit doit lui survivre.
+
+ALERT_STATUSES = ("OK", "Alerte", "Rupture")
+
+
+class AlertEvent(Base):
+    __tablename__ = "alert_events"
+    __table_args__ = (
+        Index("ix_alert_events_site_seq", "site_id", "seq"),
+    )
+
+    id              = Column(Integer, primary_key=True)
+    site_id         = Column(Integer, nullable=False)
+    # Numéro dans le site, attribué sous le verrou de sync_state (crud._log_changes) :
+    # croissant dans l'ordre des commits, contrairement à l'id
+    seq             = Column(BigInteger, nullable=False, server_default="0")
+    product_id      = Column(Integer, nullable=False)
+    product_name    = Column(String(255), nullable=False)
+    previous_status = Column(String(10), nullable=True)    # None : produit créé
+    status          = Column(String(10), nullable=True)    # None : produit supprimé
+    quantity        = Column(Numeric(10, 2), nullable=False)
+    min_threshold   = Column(Numeric(10, 2), nullable=False)
+    created_at      = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# ─── Prévisions de consommation ───────────────────────────────────────────────
+# Calculées par app/forecasting.py à partir de l'historique des sorties ;
+# recalculées en entier une fois par jour, et au fil de l'eau pour les seuls
+# produits modifiés depuis le passage précédent (products.updated_at).
+
+class Forecast(Base):
+    __tablename__ = "forecasts"
+    __table_args__ = (
+        Index("ix_forecasts_site_stockout", "site_id", "stockout_date"),
+    )
+
+    product_id            = Column(Integer, primary_key=True)
+    site_id               = Column(Integer, nullable=False)
+    daily_rate            = Column(Numeric(12, 4), nullable=False)   # moyenne par jour calendaire
+    daily_std             = Column(Numeric(12, 4), nullable=False)   # écart type par jour ouvert
+    observed_days         = Column(Integer, nullable=False)          # jours avec sortie dans l'historique
+    stockout_date         = Column(Date, nullable=True)              # None : pas de rupture sur l'horizon
+    recommended_threshold = Column(Numeric(10, 2), nullable=False)
+    reorder_quantity      = Column(Numeric(10, 2), nullable=False)
+    computed_at           = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ForecastRun(Base):
+    """Dernier passage par site : point de départ du calcul incrémental."""
+    __tablename__ = "forecast_runs"
+
+    site_id    = Column(Integer, primary_key=True)
+    started_at = Column(DateTime(timezone=True), nullable=False)   # heure de la base
+    full_date  = Column(Date, nullable=False)                      # dernier calcul complet
+
+
+# ─── Synchronisation des clients hors ligne ───────────────────────────────────
+# Journal des changements lu par app/sync.py : une ligne par produit ou
+# mouvement modifié, remplacée à chaque nouveau changement (la taille suit le
+# nombre d'objets, pas le nombre d'écritures), avec le numéro de la
+# transaction qui l'a écrite. Une suppression de produit y laisse une pierre
+# tombale (deleted). Écrit par crud._log_changes, élagué par crud.prune_sync_log.
+
+class SyncState(Base):
+    """Dernier numéro attribué par site, et horizon de l'élagage du journal."""
+    __tablename__ = "sync_state"
+
+    site_id    = Column(Integer, primary_key=True)
+    last_seq   = Column(BigInteger, nullable=False, default=0)
+    pruned_seq = Column(BigInteger, nullable=False, default=0)   # journal effacé jusqu'ici
+    alert_seq  = Column(BigInteger, nullable=False, server_default="0")   # dernier événement d'alerte
+
+
+class SyncChange(Base):
+    __tablename__ = "sync_changes"
+    __table_args__ = (
+        # Lecture des changements postérieurs à un curseur, dans l'ordre
+        Index("ix_sync_changes_site_seq", "site_id", "seq", "entity", "entity_id"),
+    )
+
+    site_id    = Column(Integer, primary_key=True)
+    entity     = Column(String(10), primary_key=True)     # 'movement' | 'product'
+    entity_id  = Column(Integer, primary_key=True)
+    seq        = Column(BigInteger, nullable=False)
+    deleted    = Column(Boolean, nullable=False, default=False)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class IdempotencyKey(Base):
+    """Clé fournie par le client pour un mouvement : il n'est appliqué qu'une fois."""
+    __tablename__ = "idempotency_keys"
+
+    site_id     = Column(Integer, primary_key=True)
+    key         = Column(String(100), primary_key=True)
+    movement_id = Column(Integer, nullable=True)    # None : refusé (produit introuvable)
+    created_at  = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,171 @@
+"""
+Partitionnement de la table movements (PostgreSQL, optionnel).
+
+Deux découpages possibles, choisis une fois pour toutes par
+`python -m app.migrations --partition-movements {month,site}` :
+
+- month : une partition par mois (RANGE sur date). Les requêtes bornées par
+  date ne lisent que les mois concernés, et les vieux mois peuvent être
+  archivés puis détachés (app/archive.py). Les partitions des mois à venir
+  sont créées à l'avance par ensure_month_partitions, appelée périodiquement.
+- site : une partition par site (LIST sur site_id).
+
+Dans les deux cas une partition DEFAULT reçoit les lignes hors découpage
+(mouvement antidaté sur un mois archivé, site sans partition…).
+"""
+from datetime import date
+from typing import Literal, Optional
+
+from sqlalchemy import Engine, text
+from sqlalchemy.schema import CreateIndex
+
+from . import models, search
+
+Strategy = Literal["month", "site"]
+
+# Mois créés à l'avance, mois courant compris
+MONTHS_AHEAD = 3
+
+
+def strategy(conn, table: str = "movements") -> Optional[Strategy]:
+    """Découpage de la table, None si elle n'est pas partitionnée."""
+    if conn.dialect.name != "postgresql":
+        return None
+    code = conn.scalar(
+        text("SELECT partstrat FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)"),
+        {"t": table},
+    )
+    return {"r": "month", "l": "site"}.get(code)
+
+
+def is_partitioned(conn, table: str) -> bool:
+    return strategy(conn, table) is not None
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_partition(month: date) -> str:
+    return f"movements_{month.year}_{month.month:02d}"
+
+
+def _site_partition(site_id: int) -> str:
+    return f"movements_site_{site_id}"
+
+
+def _create_month_partition(conn, month: date) -> None:
+    """Crée la partition d'un mois, en y déplaçant ses lignes déjà rangées dans DEFAULT.
+
+    PostgreSQL refuse de créer une partition dont des lignes sont dans DEFAULT :
+    la table est créée à part, remplie, puis attachée.
+    """
+    name, start, end = month_partition(month), month, add_months(month, 1)
+    conn.exec_driver_sql(
+        f"CREATE TABLE {name} (LIKE movements INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    )
+    conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM movements_default WHERE date >= :start AND date < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        {"start": start, "end": end},
+    )
+    conn.exec_driver_sql(
+        f"ALTER TABLE movements ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def ensure_month_partitions(engine: Engine, months_ahead: int = MONTHS_AHEAD) -> list[str]:
+    """Crée les partitions manquantes du mois courant et des suivants."""
+    if engine.dialect.name != "postgresql":
+        return []
+    created = []
+    with engine.begin() as conn:
+        if strategy(conn) != "month":
+            return []
+        first = date.today().replace(day=1)
+        for n in range(months_ahead):
+            month = add_months(first, n)
+            if conn.scalar(text("SELECT to_regclass(:t)"), {"t": month_partition(month)}) is None:
+                _create_month_partition(conn, month)
+                created.append(month_partition(month))
+    return created
+
+
+def ensure_site_partition(engine: Engine, site_id: int) -> None:
+    """Crée la partition d'un nouveau site si movements est partitionnée par site.
+
+    Sans elle, les mouvements du site iraient dans la partition DEFAULT.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        if strategy(conn) != "site":
+            return
+        conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {_site_partition(site_id)} "
+            f"PARTITION OF movements FOR VALUES IN ({int(site_id)})"
+        )
+
+
+def partition_movements(engine: Engine, by: Strategy = "month") -> None:
+    """Recrée movements en table partitionnée (par mois ou par site).
+
+    La clé primaire devient (id, date) ou (id, site_id) : PostgreSQL exige que
+    la clé de partitionnement en fasse partie. L'id reste unique (même séquence).
+    L'opération recopie la table sous verrou exclusif : à lancer hors service.
+    """
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("Le partitionnement n'est disponible que sur PostgreSQL")
+    key = "date" if by == "month" else "site_id"
+    table = models.Movement.__table__
+    search.ensure_postgres_objects(engine)    # f_unaccent, pour l'index GIN des commentaires
+    with engine.begin() as conn:
+        current = strategy(conn)
+        if current:
+            print(f"movements est déjà partitionnée (par {current}).")
+            return
+        conn.exec_driver_sql("ALTER TABLE movements RENAME TO movements_legacy")
+        conn.exec_driver_sql(
+            "CREATE TABLE movements (LIKE movements_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY {'RANGE' if by == 'month' else 'LIST'} ({key})"
+        )
+        # La séquence suit la nouvelle table (sinon supprimée avec l'ancienne)
+        sequence = conn.scalar(text("SELECT pg_get_serial_sequence('movements_legacy', 'id')"))
+        conn.exec_driver_sql(f"ALTER SEQUENCE {sequence} OWNED BY movements.id")
+        conn.exec_driver_sql("CREATE TABLE movements_default PARTITION OF movements DEFAULT")
+        if by == "month":
+            oldest = conn.scalar(text("SELECT min(date) FROM movements_legacy")) or date.today()
+            month, last = oldest.replace(day=1), add_months(date.today().replace(day=1), MONTHS_AHEAD - 1)
+            while month <= last:
+                _create_month_partition(conn, month)
+                month = add_months(month, 1)
+        else:
+            for site_id in conn.scalars(text("SELECT id FROM sites ORDER BY id")):
+                conn.exec_driver_sql(
+                    f"CREATE TABLE {_site_partition(site_id)} PARTITION OF movements FOR VALUES IN ({int(site_id)})"
+                )
+        conn.exec_driver_sql("INSERT INTO movements SELECT * FROM movements_legacy")
+        # Contraintes et index après la copie, et après la suppression de
+        # l'ancienne table qui porte encore les mêmes noms
+        conn.exec_driver_sql("DROP TABLE movements_legacy")
+        conn.exec_driver_sql(f"ALTER TABLE movements ADD PRIMARY KEY (id, {key})")
+        for fk in sorted(table.foreign_keys, key=lambda f: f.parent.name):
+            ondelete = f" ON DELETE {fk.ondelete}" if fk.ondelete else ""
+            conn.exec_driver_sql(
+                f"ALTER TABLE movements ADD FOREIGN KEY ({fk.parent.name}) "
+                f"REFERENCES {fk.column.table.name} ({fk.column.name}){ondelete}"
+            )
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            conn.execute(CreateIndex(index, if_not_exists=True))
+        # Index propres à PostgreSQL, hors models.py (recherche dans les commentaires)
+        for table_name, ddl in search.POSTGRES_INDEXES:
+            if table_name == "movements":
+                conn.exec_driver_sql(ddl)
+        count = conn.scalar(
+            text("SELECT count(*) FROM pg_inherits WHERE inhparent = 'movements'::regclass")
+        )
+    print(f"✓ movements partitionnée par {by} ({count} partitions).")
@@ -0,0 +1,233 @@
+"""
+Routage des lectures vers un réplica (DATABASE_REPLICA_URL).
+
+Les routes de lecture prennent leur session par get_read_db (get_async_read_db
+pour la pile asynchrone), les écritures restent sur get_db, le primaire. Une
+lecture part sur le réplica s'il est joignable, s'il a moins de
+REPLICA_MAX_LAG secondes de retard, et s'il a déjà rejoué les écritures du
+client qui lit :
+
+- chaque écriture réussie renvoie un jeton X-Read-After (heure et position
+  WAL du primaire après le commit), que le client joint ensuite à ses
+  requêtes (services/api.js) ; un reset de /api/sync aussi, le curseur
+  renvoyé étant lu sur le primaire ;
+- tant que le réplica n'a pas rejoué cette position (faute de position WAL,
+  pendant REPLICA_MAX_LAG secondes), les lectures de ce client vont au
+  primaire : il relit toujours ce qu'il vient d'écrire.
+
+Chaque worker relève l'état du réplica toutes les REPLICA_CHECK_INTERVAL
+secondes (monitor). Le retard est mesuré en position WAL rejouée : depuis
+combien de temps le primaire a-t-il dépassé la position où en est le réplica.
+Un primaire inactif n'est donc pas pris pour du retard, et un flux de
+réplication coupé l'est bien. Un réplica injoignable à l'ouverture d'une
+session est écarté aussitôt, jusqu'au prochain relevé réussi. Les réponses
+mises en cache à partir du réplica (cache.py) sont rangées à part, et ne
+vivent que REPLICA_MAX_LAG secondes.
+
+Essai en local : deux instances PostgreSQL en réplication, ou deux fichiers
+SQLite (le « réplica » étant une copie du primaire, sans position WAL).
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from typing import NamedTuple, Optional
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .async_database import AsyncSessionLocal
+from .config import settings
+from .database import ReplicaSessionLocal, SessionLocal, engine, replica_engine
+
+READ_AFTER_HEADER = "X-Read-After"
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+enabled = replica_engine is not None
+
+
+class ReplicaStatus(NamedTuple):
+    available:  bool
+    lag:        float = 0.0             # secondes
+    replay_lsn: Optional[int] = None    # position rejouée (PostgreSQL en réplication)
+    checked_at: float = 0.0             # time.monotonic() du relevé
+
+
+status = ReplicaStatus(available=False)
+
+# Positions WAL du primaire aux derniers relevés : (instant, position)
+_primary_positions: deque[tuple[float, int]] = deque(
+    maxlen=math.ceil(settings.replica_max_lag / max(1, settings.replica_check_interval)) + 2
+)
+
+
+def parse_lsn(lsn: Optional[str]) -> Optional[int]:
+    """'16/B374D848' → entier comparable."""
+    if not lsn:
+        return None
+    high, _, low = lsn.partition("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+def _current_lsn() -> Optional[int]:
+    if engine.dialect.name != "postgresql":
+        return None
+    with engine.connect() as conn:
+        return parse_lsn(conn.scalar(text("SELECT pg_current_wal_lsn()::text")))
+
+
+def _replay_lsn() -> Optional[int]:
+    """Position rejouée par le réplica ; None s'il n'est pas en réplication."""
+    with replica_engine.connect() as conn:
+        if replica_engine.dialect.name != "postgresql":
+            conn.execute(text("SELECT 1"))
+            return None
+        recovering, replayed = conn.execute(
+            text("SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text")
+        ).one()
+        return parse_lsn(replayed) if recovering else None
+
+
+def _lag(now: float, replayed: Optional[int]) -> float:
+    """Depuis combien de temps le primaire a-t-il dépassé la position rejouée."""
+    if replayed is None:
+        return 0.0
+    # Historique borné : au-delà de REPLICA_MAX_LAG, la valeur exacte importe peu
+    behind = [at for at, position in _primary_positions if position > replayed]
+    return now - behind[0] if behind else 0.0
+
+
+def check() -> ReplicaStatus:
+    """Relève l'état du réplica (appelé par monitor)."""
+    global status
+    try:
+        primary = _current_lsn()
+        now = time.monotonic()
+        if primary is not None:
+            _primary_positions.append((now, primary))
+        replayed = _replay_lsn()
+        status = ReplicaStatus(True, _lag(now, replayed), replayed, now)
+    except Exception as e:
+        mark_unavailable(e)
+    return status
+
+
+def mark_unavailable(error: Exception) -> None:
+    global status
+    if status.available:
+        print(f"[WARNING] Réplica écarté, lectures sur le primaire : {error}")
+    status = ReplicaStatus(False, checked_at=time.monotonic())
+
+
+def _healthy() -> bool:
+    fresh = time.monotonic() - status.checked_at <= 3 * settings.replica_check_interval
+    return status.available and fresh and status.lag <= settings.replica_max_lag
+
+
+async def monitor(interval: int) -> None:
+    while True:
+        await run_in_threadpool(check)
+        await asyncio.sleep(interval)
+
+
+# ─── Lire ses propres écritures ───────────────────────────────────────────────
+
+def write_token() -> str:
+    """Jeton renvoyé après une écriture : heure, et position WAL du primaire."""
+    lsn = _current_lsn()
+    written_at = f"{time.time():.3f}"
+    return written_at if lsn is None else f"{written_at}@{lsn}"
+
+
+def _caught_up(token: str) -> bool:
+    written_at, _, lsn = token.partition("@")
+    if lsn and status.replay_lsn is not None:
+        return status.replay_lsn >= int(lsn)
+    return time.time() - float(written_at) > settings.replica_max_lag
+
+
+def use_replica(request: Request) -> bool:
+    if not enabled or not _healthy():
+        return False
+    token = request.headers.get(READ_AFTER_HEADER)
+    if not token:
+        return True
+    try:
+        return _caught_up(token)
+    except ValueError:
+        return False
+
+
+class ReadAfterWriteMiddleware:
+    """Ajoute le jeton X-Read-After aux réponses des écritures réussies.
+
+    Middleware ASGI pur, comme celui de metrics.py : pas de mise en tampon.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_token(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                try:
+                    token = await run_in_threadpool(write_token)
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (READ_AFTER_HEADER.lower().encode(), token.encode()),
+                    ]
+                except Exception as e:
+                    print(f"[WARNING] Jeton de lecture après écriture impossible : {e}")
+            await send(message)
+
+        await self.app(scope, receive, send_with_token)
+
+
+# ─── Sessions de lecture ──────────────────────────────────────────────────────
+
+def read_session(request: Request) -> Session:
+    """Session sur le réplica si la requête peut y aller, sinon sur le primaire.
+
+    La connexion au réplica est ouverte tout de suite : s'il est tombé depuis
+    le dernier relevé, la requête repart sur le primaire.
+    """
+    if use_replica(request):
+        db = ReplicaSessionLocal()
+        try:
+            db.connection()
+            request.state.replica = True
+            return db
+        except Exception as e:
+            db.close()
+            mark_unavailable(e)
+    return SessionLocal()
+
+
+def get_read_db(request: Request):
+    db = read_session(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    if use_replica(request):
+        db = AsyncSessionLocal(replica=True)
+        try:
+            await db.connection()
+            request.state.replica = True
+        except Exception as e:
+            await db.close()
+            mark_unavailable(e)
+            db = AsyncSessionLocal()
+    else:
+        db = AsyncSessionLocal()
+    async with db:
+        yield db
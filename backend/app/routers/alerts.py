@@ -0,0 +1,36 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from .. import alerts, crud, schemas
+from ..database import get_db
+from ..sites import get_site_id
+
+router = APIRouter(prefix="/api/alerts", tags=["alerts"])
+
+
+@router.get("/events", response_model=list[schemas.AlertEventOut])
+def list_alert_events(
+    after:   int = Query(0, ge=0),
+    limit:   int = Query(100, ge=1, le=alerts.FETCH_LIMIT),
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_db),
+):
+    """Événements de numéro (seq) postérieur à `after` (reprise pour les clients sans SSE)."""
+    return crud.get_alert_events(db, {site_id: after}, limit)
+
+
+@router.get("/stream")
+async def stream_alert_events(
+    last_event_id: Optional[int] = Header(None),
+    after:         Optional[int] = Query(None, ge=0),
+    site_id:       int = Depends(get_site_id),
+):
+    """Flux Server-Sent Events des changements de statut de stock du site."""
+    return StreamingResponse(
+        alerts.stream(site_id, last_event_id if last_event_id is not None else after),
+        media_type="text/event-stream",
+        # Pas de mise en tampon par un proxy (nginx) : chaque événement part aussitôt
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,91 @@
+from datetime import date, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from .. import analytics, cache, schemas
+from ..replicas import get_read_db
+from ..sites import get_site_id
+
+router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+
+DEFAULT_DAYS = 90
+MAX_DAYS = 3 * 366
+
+STOCK_LEVELS = TypeAdapter(schemas.StockLevels)
+CONSUMPTION = TypeAdapter(schemas.Consumption)
+TOP_CONSUMERS = TypeAdapter(schemas.TopConsumers)
+
+
+def _period(date_from: Optional[date], date_to: Optional[date]) -> tuple[date, date]:
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=DEFAULT_DAYS - 1)
+    if date_from > date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Période invalide")
+    if (date_to - date_from).days >= MAX_DAYS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Période trop longue")
+    return date_from, date_to
+
+
+@router.get("/stock-levels", response_model=schemas.StockLevels)
+def stock_levels(
+    request:    Request,
+    group_by:   analytics.Grouping = "total",
+    product_id: Optional[int] = None,
+    category:   Optional[str] = None,
+    date_from:  Optional[date] = None,
+    date_to:    Optional[date] = None,
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_read_db),
+):
+    """Niveau de stock en fin de journée, un tableau de valeurs par série.
+
+    Par défaut une seule série, le total du site : `group_by=product` renvoie
+    une série par produit, à restreindre par `product_id` ou `category`.
+    """
+    date_from, date_to = _period(date_from, date_to)
+    return cache.cached_json(
+        request, cache.ANALYTICS, site_id,
+        lambda: analytics.stock_levels(db, site_id, date_from, date_to, group_by, product_id, category),
+        STOCK_LEVELS,
+    )
+
+
+@router.get("/consumption", response_model=schemas.Consumption)
+def consumption(
+    request:    Request,
+    period:     analytics.Period = "month",
+    group_by:   analytics.Grouping = "total",
+    product_id: Optional[int] = None,
+    category:   Optional[str] = None,
+    date_from:  Optional[date] = None,
+    date_to:    Optional[date] = None,
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_read_db),
+):
+    """Sorties par jour / semaine / mois, avec la période précédente en regard."""
+    date_from, date_to = _period(date_from, date_to)
+    return cache.cached_json(
+        request, cache.ANALYTICS, site_id,
+        lambda: analytics.consumption(db, site_id, date_from, date_to, period, group_by, product_id, category),
+        CONSUMPTION,
+    )
+
+
+@router.get("/top-consumers", response_model=schemas.TopConsumers)
+def top_consumers(
+    request:   Request,
+    limit:     int = Query(10, ge=1, le=100),
+    category:  Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to:   Optional[date] = None,
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_read_db),
+):
+    date_from, date_to = _period(date_from, date_to)
+    return cache.cached_json(
+        request, cache.ANALYTICS, site_id,
+        lambda: analytics.top_consumers(db, site_id, date_from, date_to, limit, category),
+        TOP_CONSUMERS,
+    )
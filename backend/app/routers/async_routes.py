@@ -0,0 +1,138 @@
+"""
+Versions asynchrones des routes les plus sollicitées (DB_ASYNC=true).
+
+Déclarées avant les routeurs synchrones dans main.py, elles les remplacent
+pour ces chemins ; les autres routes (exports, imports…) restent synchrones.
+"""
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import async_crud, cache, crud, schemas, serialization
+from ..async_database import get_async_db
+from ..replicas import get_async_read_db
+from ..sites import get_site_id
+from .movements import check_batch_size, check_cursor, check_movement_once, movement_once
+
+router = APIRouter()
+
+PRODUCT_LIST = TypeAdapter(list[schemas.ProductOut])
+DASHBOARD_STATS = TypeAdapter(schemas.DashboardStats)
+
+
+@router.get("/api/products", response_model=list[schemas.ProductOut], tags=["products"])
+async def list_products(
+    request: Request,
+    category: Optional[str] = None,
+    site_id: int = Depends(get_site_id),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    async def build():
+        return serialization.dumps(await async_crud.get_product_rows(db, site_id, category), schemas.ProductOut)
+
+    return await cache.cached_json_async(request, cache.PRODUCTS, site_id, build, PRODUCT_LIST)
+
+
+@router.get("/api/products/alerts", response_model=list[schemas.ProductOut], tags=["products"])
+async def list_alert_products(
+    request: Request,
+    site_id: int = Depends(get_site_id),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    async def build():
+        return serialization.dumps(await async_crud.get_alert_product_rows(db, site_id), schemas.ProductOut)
+
+    return await cache.cached_json_async(request, cache.ALERTS, site_id, build, PRODUCT_LIST)
+
+
+# Convertisseur :int pour laisser passer /api/products/export vers le routeur synchrone
+@router.get("/api/products/{product_id:int}", response_model=schemas.ProductOut, tags=["products"])
+async def get_product(
+    product_id: int,
+    site_id: int = Depends(get_site_id),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    product = await async_crud.get_product(db, site_id, product_id)
+    if not product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produit introuvable")
+    return product
+
+
+@router.get("/api/movements", response_model=list[schemas.MovementOut], tags=["movements"])
+async def list_movements(
+    product_id: Optional[int] = None,
+    type:       Optional[str] = None,
+    date_from:  Optional[date] = None,
+    date_to:    Optional[date] = None,
+    cursor:     Optional[str] = None,
+    limit:      Optional[int] = None,
+    site_id:    int = Depends(get_site_id),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    check_cursor(cursor)
+    rows = await async_crud.get_movement_rows(
+        db,
+        site_id,
+        product_id=product_id,
+        type=type,
+        date_from=date_from,
+        date_to=date_to,
+        cursor=cursor,
+        limit=limit,
+    )
+    headers = {}
+    if limit and len(rows) == limit:
+        headers["X-Next-Cursor"] = crud.encode_movement_cursor(rows[-1])
+    return serialization.json_response(rows, schemas.MovementOut, headers)
+
+
+@router.post(
+    "/api/movements",
+    response_model=schemas.MovementOut,
+    status_code=status.HTTP_201_CREATED,
+    tags=["movements"],
+)
+async def create_movement(
+    data: schemas.MovementCreate,
+    idempotency_key: Optional[str] = Header(None),
+    site_id: int = Depends(get_site_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if idempotency_key is not None:
+        [result] = await async_crud.create_movements_once(db, site_id, [movement_once(data, idempotency_key)])
+        return check_movement_once(result)
+    movement = await async_crud.create_movement(db, site_id, data)
+    if not movement:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produit introuvable")
+    return movement
+
+
+@router.post(
+    "/api/movements/batch",
+    response_model=list[schemas.MovementOut],
+    status_code=status.HTTP_201_CREATED,
+    tags=["movements"],
+)
+async def create_movements_batch(
+    items: list[schemas.MovementCreate],
+    site_id: int = Depends(get_site_id),
+    db: AsyncSession = Depends(get_async_db),
+):
+    check_batch_size(items)
+    created = await async_crud.create_movements_batch(db, site_id, items)
+    if created is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produit introuvable")
+    return created
+
+
+@router.get("/api/dashboard", response_model=schemas.DashboardStats, tags=["dashboard"])
+async def dashboard_stats(
+    request: Request,
+    site_id: int = Depends(get_site_id),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return await cache.cached_json_async(
+        request, cache.DASHBOARD, site_id, lambda: async_crud.get_dashboard_stats(db, site_id), DASHBOARD_STATS
+    )
@@ -0,0 +1,51 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from .. import cache, forecasting, schemas
+from ..database import get_db
+from ..replicas import get_read_db
+from ..sites import get_site_id
+
+router = APIRouter(prefix="/api/forecasts", tags=["forecasts"])
+
+FORECASTS = TypeAdapter(list[schemas.ForecastOut])
+
+
+@router.get("", response_model=list[schemas.ForecastOut])
+def list_forecasts(
+    request:     Request,
+    category:    Optional[str] = None,
+    within_days: Optional[int] = Query(None, ge=0),
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_read_db),
+):
+    """Prévisions des produits, ruptures les plus proches d'abord.
+
+    `within_days` : seulement les produits en rupture d'ici ce nombre de jours.
+    """
+    return cache.cached_json(
+        request, cache.FORECASTS, site_id,
+        lambda: forecasting.get_forecasts(db, site_id, category, within_days),
+        FORECASTS,
+    )
+
+
+@router.post("/refresh", response_model=schemas.ForecastRefresh)
+def refresh_forecasts(
+    full: bool = False,
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_db),
+):
+    """Recalcule les prévisions du site (produits modifiés seulement, sauf `full`)."""
+    refreshed, full = forecasting.refresh(db, site_id, full)
+    return schemas.ForecastRefresh(refreshed=refreshed, full=full)
+
+
+@router.get("/{product_id}", response_model=schemas.ForecastOut)
+def get_forecast(product_id: int, site_id: int = Depends(get_site_id), db: Session = Depends(get_read_db)):
+    forecasts = forecasting.get_forecasts(db, site_id, product_id=product_id)
+    if not forecasts:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prévision introuvable")
+    return forecasts[0]
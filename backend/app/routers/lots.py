@@ -0,0 +1,35 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas, serialization
+from ..replicas import get_read_db
+from ..sites import get_site_id
+
+router = APIRouter(prefix="/api/lots", tags=["lots"])
+
+
+@router.get("", response_model=list[schemas.LotOut])
+def list_lots(
+    product_id:    Optional[int] = None,
+    include_empty: bool = False,
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_read_db),
+):
+    """Lots du site dans l'ordre où les sorties les consomment (FEFO).
+
+    `include_empty` : lots épuisés compris (traçabilité d'une réception).
+    """
+    rows = crud.get_lot_rows(db, site_id, product_id, include_empty)
+    return serialization.json_response(rows, schemas.LotOut)
+
+
+@router.get("/expiring", response_model=list[schemas.ExpiringLot])
+def list_expiring_lots(
+    within_days: int = Query(7, ge=0),
+    category:    Optional[str] = None,
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_read_db),
+):
+    """Lots ouverts à consommer d'ici `within_days` jours, date limite dépassée comprise."""
+    return crud.get_expiring_lots(db, site_id, within_days, category)
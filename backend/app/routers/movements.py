@@ -1,13 +1,30 @@
 from datetime import date
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
-from .. import crud, schemas
+from .. import archive, crud, exports, imports, schemas, serialization
 from ..database import get_db
+from ..replicas import get_read_db, read_session
+from ..sites import get_site_id
 
 router = APIRouter(prefix="/api/movements", tags=["movements"])
 
+# Au-delà, passer par /import (insertion par lots, rapport d'erreurs par ligne)
+BATCH_MAX_SIZE = 1000
+
+
+def check_cursor(cursor: Optional[str]) -> None:
+    if cursor is None:
+        return
+    try:
+        crud.decode_movement_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Curseur invalide")
+
 
 @router.get("", response_model=list[schemas.MovementOut])
 def list_movements(
@@ -15,41 +32,137 @@ def list_movements(
     type:       Optional[str] = None,
     date_from:  Optional[date] = None,
     date_to:    Optional[date] = None,
+    cursor:     Optional[str] = None,
     limit:      Optional[int] = None,
-    db: Session = Depends(get_db),
+    site_id:    int = Depends(get_site_id),
+    db: Session = Depends(get_read_db),
 ):
-    movements = crud.get_movements(
+    check_cursor(cursor)
+    rows = crud.get_movement_rows(
         db,
+        site_id,
         product_id=product_id,
         type=type,
         date_from=date_from,
         date_to=date_to,
+        cursor=cursor,
         limit=limit,
     )
-    # Inject product_name for the response schema
-    result = []
-    for m in movements:
-        out = schemas.MovementOut(
-            id=m.id,
-            product_id=m.product_id,
-            product_name=m.product.name,
-            type=m.type,
-            quantity=m.quantity,
-            date=m.date,
-            comment=m.comment,
-            created_at=m.created_at,
+    # Page pleine : il reste peut-être des lignes, on donne le curseur suivant
+    headers = {}
+    if limit and len(rows) == limit:
+        headers["X-Next-Cursor"] = crud.encode_movement_cursor(rows[-1])
+    # Lignes sérialisées directement, sans repasser par MovementOut
+    return serialization.json_response(rows, schemas.MovementOut, headers)
+
+
+@router.get("/stream")
+def stream_movements(
+    request:    Request,
+    product_id: Optional[int] = None,
+    type:       Optional[str] = None,
+    date_from:  Optional[date] = None,
+    date_to:    Optional[date] = None,
+    cursor:     Optional[str] = None,
+    site_id:    int = Depends(get_site_id),
+):
+    """Historique complet en NDJSON (un mouvement JSON par ligne), envoyé au fil de l'eau."""
+    check_cursor(cursor)
+
+    def generate():
+        # Session propre au flux : celle de get_read_db est fermée avant l'envoi de la réponse
+        db = read_session(request)
+        try:
+            rows = crud.iter_movement_rows(
+                db,
+                site_id,
+                product_id=product_id,
+                type=type,
+                date_from=date_from,
+                date_to=date_to,
+                cursor=cursor,
+            )
+            for row in rows:
+                yield serialization.dumps_one(row, schemas.MovementOut) + b"\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.get("/export")
+def export_movements(
+    request:    Request,
+    format:     Literal["xlsx", "csv"] = "xlsx",
+    product_id: Optional[int] = None,
+    type:       Optional[str] = None,
+    date_from:  Optional[date] = None,
+    date_to:    Optional[date] = None,
+    site_id:    int = Depends(get_site_id),
+):
+    if not archive.archives_readable(date_from):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Mouvements archivés illisibles : paquet pyarrow absent du serveur",
         )
-        result.append(out)
-    return result
+
+    def rows():
+        db = read_session(request)
+        try:
+            movements = archive.iter_movement_rows_with_archives(
+                db,
+                site_id,
+                product_id=product_id,
+                type=type,
+                date_from=date_from,
+                date_to=date_to,
+            )
+            for row in movements:
+                yield exports.movement_row(row)
+        finally:
+            db.close()
+
+    return exports.streaming_export(
+        "mouvements", "Mouvements", format,
+        exports.MOVEMENT_HEADERS, rows(), exports.MOVEMENT_WIDTHS,
+    )
+
+
+def movement_once(data: schemas.MovementCreate, idempotency_key: str) -> schemas.QueuedMovement:
+    """Mouvement accompagné d'un en-tête Idempotency-Key (voir app/sync.py)."""
+    try:
+        return schemas.QueuedMovement(**data.model_dump(), idempotency_key=idempotency_key)
+    except ValidationError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Clé d'idempotence invalide")
+
+
+def check_movement_once(result: schemas.QueuedMovementResult) -> schemas.MovementOut:
+    if result.status == "rejected":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produit introuvable")
+    if result.movement is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Mouvement déjà enregistré, puis archivé")
+    return result.movement
 
 
 @router.post("", response_model=schemas.MovementOut, status_code=status.HTTP_201_CREATED)
-def create_movement(data: schemas.MovementCreate, db: Session = Depends(get_db)):
-    movement = crud.create_movement(db, data)
+def create_movement(
+    data: schemas.MovementCreate,
+    idempotency_key: Optional[str] = Header(None),
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_db),
+):
+    """Avec l'en-tête Idempotency-Key, un renvoi après expiration du délai
+    renvoie le mouvement déjà enregistré au lieu de le compter deux fois.
+    """
+    if idempotency_key is not None:
+        [result] = crud.create_movements_once(db, site_id, [movement_once(data, idempotency_key)])
+        return check_movement_once(result)
+    movement = crud.create_movement(db, site_id, data)
     if not movement:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produit introuvable")
     return schemas.MovementOut(
         id=movement.id,
+        site_id=movement.site_id,
         product_id=movement.product_id,
         product_name=movement.product.name,
         type=movement.type,
@@ -58,3 +171,39 @@ def create_movement(data: schemas.MovementCreate, db: Session = Depends(get_db))
         comment=movement.comment,
         created_at=movement.created_at,
     )
+
+
+def check_batch_size(items: list) -> None:
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Aucun mouvement")
+    if len(items) > BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{BATCH_MAX_SIZE} mouvements au maximum par lot",
+        )
+
+
+@router.post("/batch", response_model=list[schemas.MovementOut], status_code=status.HTTP_201_CREATED)
+def create_movements_batch(
+    items: list[schemas.MovementCreate],
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_db),
+):
+    """Plusieurs mouvements en une requête : tous enregistrés, ou aucun."""
+    check_batch_size(items)
+    movements = crud.create_movements_batch(db, site_id, items)
+    if movements is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produit introuvable")
+    return movements
+
+
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_movements(
+    request: Request, site_id: int = Depends(get_site_id), db: Session = Depends(get_db)
+):
+    """Import en masse : tableau JSON, CSV ou fichier Excel (.xlsx) dans le corps de la requête."""
+    try:
+        rows = imports.parse_upload(request.headers.get("content-type", ""), await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return await run_in_threadpool(imports.import_movements, db, site_id, rows)
@@ -1,46 +1,121 @@
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
-from .. import crud, schemas
+from pydantic import TypeAdapter
+
+from .. import cache, crud, exports, imports, schemas, search, serialization
 from ..database import get_db
+from ..replicas import get_read_db, read_session
+from ..sites import get_site_id
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
+PRODUCT_LIST = TypeAdapter(list[schemas.ProductOut])
+
 
 @router.get("", response_model=list[schemas.ProductOut])
-def list_products(category: Optional[str] = None, db: Session = Depends(get_db)):
-    return crud.get_products(db, category=category)
+def list_products(
+    request: Request,
+    category: Optional[str] = None,
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_read_db),
+):
+    return cache.cached_json(
+        request, cache.PRODUCTS, site_id,
+        lambda: serialization.dumps(crud.get_product_rows(db, site_id, category), schemas.ProductOut),
+        PRODUCT_LIST,
+    )
 
 
 @router.get("/alerts", response_model=list[schemas.ProductOut])
-def list_alert_products(db: Session = Depends(get_db)):
-    return crud.get_alert_products(db)
+def list_alert_products(request: Request, site_id: int = Depends(get_site_id), db: Session = Depends(get_read_db)):
+    return cache.cached_json(
+        request, cache.ALERTS, site_id,
+        lambda: serialization.dumps(crud.get_alert_product_rows(db, site_id), schemas.ProductOut),
+        PRODUCT_LIST,
+    )
+
+
+@router.get("/search", response_model=list[schemas.ProductSearchHit])
+def search_products(
+    q:      str = Query(..., max_length=200),
+    limit:  int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_read_db),
+):
+    """Recherche dans le nom, la catégorie et les commentaires des mouvements.
+
+    Sans accents ni casse, chaque mot comme début de mot, tolérante aux fautes
+    de frappe ; classée par pertinence.
+    """
+    return search.search_products(db, site_id, q, limit, offset)
+
+
+@router.get("/export")
+def export_products(
+    request: Request,
+    format: Literal["xlsx", "csv"] = "xlsx",
+    category: Optional[str] = None,
+    site_id: int = Depends(get_site_id),
+):
+    def rows():
+        db = read_session(request)
+        try:
+            for product in crud.iter_products(db, site_id, category=category):
+                yield exports.product_row(product)
+        finally:
+            db.close()
+
+    return exports.streaming_export(
+        "produits", "Produits", format, exports.PRODUCT_HEADERS, rows()
+    )
 
 
 @router.get("/{product_id}", response_model=schemas.ProductOut)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = crud.get_product(db, product_id)
+def get_product(product_id: int, site_id: int = Depends(get_site_id), db: Session = Depends(get_read_db)):
+    product = crud.get_product(db, site_id, product_id)
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produit introuvable")
     return product
 
 
 @router.post("", response_model=schemas.ProductOut, status_code=status.HTTP_201_CREATED)
-def create_product(data: schemas.ProductCreate, db: Session = Depends(get_db)):
-    return crud.create_product(db, data)
+def create_product(
+    data: schemas.ProductCreate, site_id: int = Depends(get_site_id), db: Session = Depends(get_db)
+):
+    return crud.create_product(db, site_id, data)
 
 
 @router.put("/{product_id}", response_model=schemas.ProductOut)
-def update_product(product_id: int, data: schemas.ProductUpdate, db: Session = Depends(get_db)):
-    product = crud.update_product(db, product_id, data)
+def update_product(
+    product_id: int,
+    data: schemas.ProductUpdate,
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_db),
+):
+    product = crud.update_product(db, site_id, product_id, data)
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produit introuvable")
     return product
 
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_product(product_id: int, db: Session = Depends(get_db)):
-    deleted = crud.delete_product(db, product_id)
+def delete_product(product_id: int, site_id: int = Depends(get_site_id), db: Session = Depends(get_db)):
+    deleted = crud.delete_product(db, site_id, product_id)
     if not deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Produit introuvable")
+
+
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_products(
+    request: Request, site_id: int = Depends(get_site_id), db: Session = Depends(get_db)
+):
+    """Import en masse : tableau JSON, CSV ou fichier Excel (.xlsx) dans le corps de la requête."""
+    try:
+        rows = imports.parse_upload(request.headers.get("content-type", ""), await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return await run_in_threadpool(imports.import_products, db, site_id, rows)
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from .. import crud, partitions, schemas
+from ..database import get_db, engine
+
+router = APIRouter(prefix="/api/sites", tags=["sites"])
+
+
+@router.get("", response_model=list[schemas.SiteOut])
+def list_sites(db: Session = Depends(get_db)):
+    return crud.get_sites(db)
+
+
+@router.post("", response_model=schemas.SiteOut, status_code=status.HTTP_201_CREATED)
+def create_site(data: schemas.SiteCreate, db: Session = Depends(get_db)):
+    if crud.get_site_by_name(db, data.name):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Site déjà existant")
+    site = crud.create_site(db, data)
+    partitions.ensure_site_partition(engine, site.id)
+    return site
@@ -0,0 +1,56 @@
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from .. import cache, crud, schemas
+from ..database import get_db
+from ..replicas import get_read_db
+from ..sites import get_site_id
+
+router = APIRouter(prefix="/api/snapshots", tags=["snapshots"])
+
+STOCK_VALUATION = TypeAdapter(schemas.StockValuation)
+
+
+@router.get("", response_model=list[schemas.SnapshotSummary])
+def list_snapshots(
+    date_from: Optional[date] = None,
+    date_to:   Optional[date] = None,
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_read_db),
+):
+    return crud.get_snapshot_summaries(db, site_id, date_from, date_to)
+
+
+@router.post("", response_model=schemas.SnapshotSummary, status_code=status.HTTP_201_CREATED)
+def take_snapshot(
+    day: Optional[date] = None,
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_db),
+):
+    """Prend (ou reprend) la photo d'un jour, aujourd'hui par défaut."""
+    day = day or date.today()
+    if day > date.today():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Date future")
+    crud.take_stock_snapshot(db, day, site_id)
+    summaries = crud.get_snapshot_summaries(db, site_id, day, day)
+    # Site sans produit : aucune ligne photographiée
+    return summaries[0] if summaries else schemas.SnapshotSummary(date=day, products=0, total_value=0)
+
+
+@router.get("/valuation", response_model=schemas.StockValuation)
+def stock_valuation(
+    request:  Request,
+    as_of:    date,
+    category: Optional[str] = None,
+    site_id:  int = Depends(get_site_id),
+    db: Session = Depends(get_read_db),
+):
+    """Stock et valorisation en fin de journée `as_of` (ex. inventaire au 31/12)."""
+    return cache.cached_json(
+        request, cache.ANALYTICS, site_id,
+        lambda: crud.get_stock_as_of(db, site_id, as_of, category),
+        STOCK_VALUATION,
+    )
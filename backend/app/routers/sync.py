@@ -0,0 +1,51 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session
+
+from .. import crud, replicas, schemas, sync
+from ..database import get_db
+from ..sites import get_site_id
+from .movements import check_batch_size
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+
+@router.get("", response_model=schemas.SyncDelta)
+def get_changes(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit:  int = Query(500, ge=1, le=5000),
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_db),
+):
+    """Produits et mouvements changés depuis `cursor` (voir app/sync.py).
+
+    Sans curseur, ou s'il est trop ancien : `reset`, le client recharge les
+    listes complètes puis reprend au curseur renvoyé.
+
+    Ce curseur est lu sur le primaire, et les listes passent par les routes de
+    lecture : le reset porte un jeton X-Read-After, comme une écriture, pour que
+    le rechargement ne parte pas sur un réplica qui n'a pas encore rejoué les
+    changements d'avant le curseur (ils seraient perdus pour ce client).
+    """
+    try:
+        sync.decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Curseur invalide")
+    delta = sync.get_changes(db, site_id, cursor, limit)
+    if delta.reset and replicas.enabled:
+        response.headers[replicas.READ_AFTER_HEADER] = replicas.write_token()
+    return delta
+
+
+@router.post("/movements", response_model=list[schemas.QueuedMovementResult])
+def push_movements(
+    items: list[schemas.QueuedMovement],
+    site_id: int = Depends(get_site_id),
+    db: Session = Depends(get_db),
+):
+    """File de mouvements saisis hors ligne : chacun appliqué une seule fois
+    (clé d'idempotence), un résultat par mouvement dans l'ordre de la file.
+    """
+    check_batch_size(items)
+    return crud.create_movements_once(db, site_id, items)
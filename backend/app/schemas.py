@@ -1,7 +1,20 @@
 from datetime import date, datetime
 from decimal import Decimal
-from typing import Optional
-from pydantic import BaseModel, ConfigDict
+from typing import Optional, Union
+from pydantic import BaseModel, ConfigDict, Field
+
+
+# ─── Sites ────────────────────────────────────────────────────────────────────
+
+class SiteCreate(BaseModel):
+    name: str
+
+
+class SiteOut(SiteCreate):
+    model_config = ConfigDict(from_attributes=True)
+
+    id:         int
+    created_at: Optional[datetime] = None
 
 
 # ─── Products ────────────────────────────────────────────────────────────────
@@ -27,10 +40,15 @@ class ProductOut(ProductBase):
     model_config = ConfigDict(from_attributes=True)
 
     id:         int
+    site_id:    int
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
 
+class ProductSearchHit(ProductOut):
+    score: float     # pertinence, décroissante dans la liste
+
+
 # ─── Movements ────────────────────────────────────────────────────────────────
 
 class MovementBase(BaseModel):
@@ -42,13 +60,20 @@ class MovementBase(BaseModel):
 
 
 class MovementCreate(MovementBase):
-    pass
+    # Entrée seulement : lot créé par la réception (ignorés pour une sortie)
+    lot_number:  Optional[str] = None
+    expiry_date: Optional[date] = None
+
+    def movement_fields(self) -> dict:
+        """Colonnes de la table movements (sans les champs du lot)."""
+        return self.model_dump(include=set(MovementBase.model_fields))
 
 
 class MovementOut(MovementBase):
     model_config = ConfigDict(from_attributes=True)
 
     id:           int
+    site_id:      int
     product_name: str
     created_at:   Optional[datetime] = None
 
@@ -56,7 +81,168 @@ class MovementOut(MovementBase):
 # ─── Dashboard ────────────────────────────────────────────────────────────────
 
 class DashboardStats(BaseModel):
-    total_products:    int
-    low_stock_count:   int
-    today_movements:   int
-    total_stock_value: Decimal
+    total_products:      int
+    low_stock_count:     int
+    today_movements:     int
+    total_stock_value:   Decimal
+    expiring_lots:       int = 0     # lots ouverts arrivant à échéance (LOT_EXPIRY_WARNING_DAYS)
+    expired_lots:        int = 0     # lots ouverts dont la date limite est passée
+    expired_stock_value: Decimal = Decimal("0")
+
+
+# ─── Lots ─────────────────────────────────────────────────────────────────────
+
+class LotOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id:               int
+    site_id:          int
+    product_id:       int
+    product_name:     str
+    unit:             str
+    movement_id:      Optional[int] = None    # entrée d'origine
+    lot_number:       Optional[str] = None
+    received_date:    date
+    expiry_date:      Optional[date] = None   # None : non périssable
+    initial_quantity: Decimal
+    quantity:         Decimal                 # restant
+    created_at:       Optional[datetime] = None
+
+
+class ExpiringLot(LotOut):
+    category:  str
+    days_left: int          # négatif : date limite dépassée
+
+
+# ─── Événements d'alerte ──────────────────────────────────────────────────────
+
+class AlertEventOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id:              int
+    seq:             int                    # ordre des événements du site (Last-Event-ID)
+    site_id:         int
+    product_id:      int
+    product_name:    str
+    previous_status: Optional[str] = None   # None : produit créé
+    status:          Optional[str] = None   # None : produit supprimé
+    quantity:        Decimal
+    min_threshold:   Decimal
+    created_at:      Optional[datetime] = None
+
+
+# ─── Import ───────────────────────────────────────────────────────────────────
+
+class ImportRowError(BaseModel):
+    row:    int          # numéro de ligne de données, à partir de 1
+    errors: list[str]
+
+
+class ImportReport(BaseModel):
+    inserted: int
+    errors:   list[ImportRowError]
+
+
+# ─── Photos de stock / valorisation à date ────────────────────────────────────
+
+class SnapshotSummary(BaseModel):
+    date:        date
+    products:    int
+    total_value: Decimal
+
+
+class StockValuationLine(BaseModel):
+    product_id:     int
+    name:           str
+    category:       str
+    unit:           str
+    quantity:       Decimal
+    price_per_unit: Decimal
+    value:          Decimal
+
+
+class StockValuation(BaseModel):
+    as_of:         date
+    snapshot_date: Optional[date] = None   # photo de départ (None : reconstitution complète)
+    total_value:   Decimal
+    items:         list[StockValuationLine]
+
+
+# ─── Analytics (tableaux colonnes : un indice = une date / un produit) ────────
+
+class AnalyticsSeries(BaseModel):
+    key:    Union[int, str]     # id produit, catégorie ou "total"
+    label:  str
+    values: list[float]
+
+
+class StockLevels(BaseModel):
+    dates:  list[date]
+    series: list[AnalyticsSeries]
+
+
+class ConsumptionSeries(AnalyticsSeries):
+    previous: list[float]       # consommation de la période précédente
+
+
+class Consumption(BaseModel):
+    period:  str
+    periods: list[date]          # premier jour de chaque période
+    series:  list[ConsumptionSeries]
+
+
+class TopConsumers(BaseModel):
+    product_id:    list[int]
+    name:          list[str]
+    category:      list[str]
+    unit:          list[str]
+    consumed:      list[float]
+    daily_average: list[float]
+    share:         list[float]   # part de la consommation totale de la période
+
+
+# ─── Prévisions ───────────────────────────────────────────────────────────────
+
+class ForecastOut(BaseModel):
+    product_id:            int
+    name:                  str
+    category:              str
+    unit:                  str
+    quantity:              Decimal
+    min_threshold:         Decimal
+    # Demande prévue sur les RATE_WINDOW_DAYS prochains jours (forecasting.py),
+    # ramenée à un jour calendaire : jours fermés et fériés comptés à zéro
+    daily_rate:            Decimal
+    daily_std:             Decimal          # écart type par jour ouvert
+    observed_days:         int              # jours avec sorties dans l'historique
+    stockout_date:         Optional[date] = None   # None : pas de rupture sur l'horizon
+    days_to_stockout:      Optional[int] = None
+    recommended_threshold: Decimal
+    reorder_quantity:      Decimal
+    computed_at:           Optional[datetime] = None
+
+
+class ForecastRefresh(BaseModel):
+    refreshed: int       # produits recalculés
+    full:      bool      # site entier ou seulement les produits modifiés
+
+
+# ─── Synchronisation ──────────────────────────────────────────────────────────
+
+class SyncDelta(BaseModel):
+    cursor:           str               # à renvoyer au prochain appel
+    has_more:         bool = False      # page pleine : rappeler aussitôt avec `cursor`
+    reset:            bool = False      # curseur absent ou trop ancien : tout recharger, puis reprendre à `cursor`
+    products:         list[ProductOut] = []     # créés ou modifiés (état courant)
+    movements:        list[MovementOut] = []    # créés
+    deleted_products: list[int] = []            # leurs mouvements disparaissent avec eux
+
+
+class QueuedMovement(MovementCreate):
+    idempotency_key: str = Field(min_length=1, max_length=100)   # générée par le client (UUID)
+
+
+class QueuedMovementResult(BaseModel):
+    idempotency_key: str
+    status:          str                           # 'applied' | 'duplicate' | 'rejected'
+    movement:        Optional[MovementOut] = None  # None : refusé, ou mouvement archivé depuis
@@ -0,0 +1,314 @@
+"""
+Recherche de produits : nom, catégorie et commentaires de leurs mouvements.
+
+Insensible à la casse et aux accents (« boeuf » trouve « Bœuf haché »,
+« pates » trouve « Pâtes fusilli »), chaque mot de la requête valant comme
+début de mot (« huile ol » trouve « Huile d'olive vierge »), avec une part de
+tolérance aux fautes de frappe (trigrammes). Résultats classés par pertinence
+puis par nom.
+
+- PostgreSQL : recherche plein texte (configuration french, préfixes) et
+  pg_trgm, sur f_unaccent(), une enveloppe IMMUTABLE d'unaccent utilisable
+  dans un index. Extensions, fonction et index GIN sont créés par
+  migrations.upgrade (ensure_postgres_objects, POSTGRES_INDEXES).
+- SQLite (développement, tests) : index de trigrammes et de mots construit
+  en Python (NumPy) par site, reconstruit dès que les produits changent.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+
+import numpy as np
+from sqlalchemy import Engine, func, literal, literal_column, select, union_all
+from sqlalchemy.orm import Session
+
+from . import crud, models, schemas
+
+# Seuil de pg_trgm pour l'opérateur <% (word_similarity), repris par l'index Python
+FUZZY_THRESHOLD = 0.6
+NAME_WEIGHT, CATEGORY_WEIGHT, COMMENT_BONUS = 1.0, 0.4, 0.1
+MIN_QUERY_LENGTH = 2
+
+_LIGATURES = str.maketrans({"œ": "oe", "Œ": "oe", "æ": "ae", "Æ": "ae", "ß": "ss"})
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Minuscules, sans accents ni ligatures, mots séparés par une espace."""
+    text = unicodedata.normalize("NFKD", text.lower().translate(_LIGATURES))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def _trigrams(word: str) -> set[str]:
+    """Trigrammes d'un mot, bornes comprises, comme pg_trgm."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# ─── PostgreSQL ───────────────────────────────────────────────────────────────
+# Les expressions des requêtes doivent être celles des index, à l'identique.
+
+FRENCH = literal_column("'french'")
+
+
+def _document():
+    """Nom (poids A) et catégorie (poids B) en plein texte."""
+    product = models.Product
+    name = func.setweight(func.to_tsvector(FRENCH, func.f_unaccent(product.name)), literal_column("'A'"))
+    category = func.setweight(func.to_tsvector(FRENCH, func.f_unaccent(product.category)), literal_column("'B'"))
+    return name.op("||")(category)
+
+
+def _comment_document():
+    return func.to_tsvector(FRENCH, func.f_unaccent(models.Movement.comment))
+
+
+def _name_trigrams():
+    return func.f_unaccent(func.lower(models.Product.name))
+
+
+POSTGRES_INDEXES = (
+    (
+        "products",
+        "CREATE INDEX IF NOT EXISTS ix_products_search_document ON products USING gin ("
+        "(setweight(to_tsvector('french', f_unaccent(name)), 'A') || "
+        "setweight(to_tsvector('french', f_unaccent(category)), 'B')))",
+    ),
+    (
+        "products",
+        "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products "
+        "USING gin (f_unaccent(lower(name)) gin_trgm_ops)",
+    ),
+    (
+        "movements",
+        "CREATE INDEX IF NOT EXISTS ix_movements_comment_search ON movements "
+        "USING gin (to_tsvector('french', f_unaccent(comment))) WHERE comment IS NOT NULL",
+    ),
+)
+
+
+def ensure_postgres_objects(engine: Engine) -> None:
+    """Extensions pg_trgm et unaccent, et fonction f_unaccent (IMMUTABLE, indexable)."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS unaccent")
+        # Schéma de l'extension (« extensions » sur Supabase) écrit en dur :
+        # la fonction ne doit pas dépendre du search_path de la session
+        schema = conn.exec_driver_sql(
+            "SELECT extnamespace::regnamespace::text FROM pg_extension WHERE extname = 'unaccent'"
+        ).scalar()
+        conn.exec_driver_sql(
+            "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text "
+            "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS "
+            f"$$ SELECT {schema}.unaccent('{schema}.unaccent'::regdictionary, $1) $$"
+        )
+
+
+def _prefix_query(tokens: list[str]):
+    # Mots déjà réduits à [a-z0-9] par normalize : rien à échapper
+    return func.to_tsquery(FRENCH, " & ".join(f"{token}:*" for token in tokens))
+
+
+def search_postgres_stmt(site_id: int, query: str, limit: int, offset: int):
+    """Candidats servis chacun par leur index (plein texte, trigrammes du nom,
+    commentaires), réunis puis joints aux produits pour le classement : un OR
+    entre relations empêcherait le planificateur d'utiliser les index."""
+    tsquery = _prefix_query(query.split())
+    document, name = _document(), _name_trigrams()
+    product, movement = models.Product, models.Movement
+    branches = union_all(
+        select(product.id.label("product_id"), literal(0).label("commented"))
+        .where(product.site_id == site_id, document.op("@@")(tsquery)),
+        select(product.id, literal(0))
+        .where(product.site_id == site_id, literal(query).op("<%")(name)),
+        select(movement.product_id, literal(1))
+        .where(
+            movement.site_id == site_id,
+            movement.comment.isnot(None),
+            _comment_document().op("@@")(tsquery),
+        ),
+    ).subquery("branches")
+    candidates = (
+        select(branches.c.product_id, func.max(branches.c.commented).label("commented"))
+        .group_by(branches.c.product_id)
+        .subquery("candidates")
+    )
+    score = (
+        func.ts_rank(document, tsquery)
+        + func.word_similarity(literal(query), name)
+        + COMMENT_BONUS * candidates.c.commented
+    ).label("score")
+    return (
+        select(*crud.PRODUCT_COLUMNS, score)
+        .select_from(product)
+        .join(candidates, candidates.c.product_id == product.id)
+        .order_by(score.desc(), product.name, product.id)
+        .limit(limit)
+        .offset(offset)
+    )
+
+
+def _search_postgres(db: Session, site_id: int, query: str, limit: int, offset: int) -> list:
+    return db.execute(search_postgres_stmt(site_id, query, limit, offset)).all()
+
+
+# ─── Index Python (SQLite) ────────────────────────────────────────────────────
+
+class _Postings:
+    """Clés triées → documents, stockés à la suite (CSR) : les clés d'un même
+    préfixe sont contiguës, leurs documents aussi."""
+
+    def __init__(self, pairs: list[tuple[str, int]]):
+        pairs.sort()
+        self.keys: list[str] = []
+        starts: list[int] = []
+        for i, (key, _) in enumerate(pairs):
+            if not self.keys or self.keys[-1] != key:
+                self.keys.append(key)
+                starts.append(i)
+        starts.append(len(pairs))
+        self.starts = np.array(starts, dtype=np.int64)
+        self.docs = np.array([doc for _, doc in pairs], dtype=np.int64)
+
+    def exact(self, key: str) -> np.ndarray:
+        i = bisect.bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return self.docs[:0]
+        return self.docs[self.starts[i]:self.starts[i + 1]]
+
+    def prefix(self, prefix: str, size: int) -> np.ndarray:
+        """Masque des documents ayant un mot commençant par `prefix`."""
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + "\uffff")
+        mask = np.zeros(size, dtype=bool)
+        mask[self.docs[self.starts[lo]:self.starts[hi]]] = True
+        return mask
+
+
+class _SiteIndex:
+    def __init__(self, signature, ids: list[int], names: list[str], categories: list[str], comments: dict):
+        self.signature = signature
+        self.ids = np.array(ids, dtype=np.int64)
+        # Rang de chaque produit dans l'ordre (nom, id) : départage des ex aequo
+        self.name_rank = np.empty(len(ids), dtype=np.int64)
+        self.name_rank[sorted(range(len(ids)), key=lambda i: (names[i], ids[i]))] = np.arange(len(ids))
+        words, categories_words, comment_words, trigrams = [], [], [], []
+        for doc, (name, category) in enumerate(zip(names, categories)):
+            name_words = set(name.split())
+            words += [(word, doc) for word in name_words]
+            categories_words += [(word, doc) for word in set(category.split())]
+            comment_words += [(word, doc) for word in set(comments.get(ids[doc], "").split())]
+            trigrams += [(t, doc) for t in set().union(*map(_trigrams, name_words))]
+        self.name_words = _Postings(words)
+        self.category_words = _Postings(categories_words)
+        self.comment_words = _Postings(comment_words)
+        self.name_trigrams = _Postings(trigrams)
+
+    def search(self, query: str, limit: int, offset: int) -> list[tuple[int, float]]:
+        size = len(self.ids)
+        tokens = query.split()
+        in_name = np.zeros(size)
+        in_category = np.zeros(size)
+        matched = np.ones(size, dtype=bool)
+        in_comments = np.ones(size, dtype=bool)
+        for token in tokens:
+            name_hit = self.name_words.prefix(token, size)
+            category_hit = self.category_words.prefix(token, size)
+            in_name += name_hit
+            in_category += category_hit
+            matched &= name_hit | category_hit
+            in_comments &= self.comment_words.prefix(token, size)
+        rank = (NAME_WEIGHT * in_name + CATEGORY_WEIGHT * in_category) / len(tokens)
+
+        # Part des trigrammes de la requête présents dans le nom (≈ word_similarity)
+        grams = set().union(*map(_trigrams, tokens))
+        shared = np.zeros(size)
+        for gram in grams:
+            shared += np.bincount(self.name_trigrams.exact(gram), minlength=size)
+        similarity = shared / len(grams)
+
+        selected = np.flatnonzero(matched | (similarity >= FUZZY_THRESHOLD) | in_comments)
+        score = (rank * matched + similarity + COMMENT_BONUS * in_comments)[selected]
+        page = np.lexsort((self.name_rank[selected], -score))[offset:offset + limit]
+        return [(int(self.ids[selected[i]]), float(score[i])) for i in page]
+
+
+class PythonIndex:
+    """Index en mémoire par site, reconstruit quand ses produits ont changé.
+
+    Toute écriture sur un produit ou ses mouvements met à jour
+    products.updated_at : (nombre, dernier updated_at) suffit à le savoir.
+    """
+
+    def __init__(self):
+        self._sites: dict[int, _SiteIndex] = {}
+        self._lock = threading.Lock()
+
+    def _signature(self, db: Session, site_id: int):
+        product = models.Product
+        return tuple(db.execute(
+            select(func.count(product.id), func.max(product.updated_at)).where(product.site_id == site_id)
+        ).one())
+
+    def _build(self, db: Session, site_id: int, signature) -> _SiteIndex:
+        product, movement = models.Product, models.Movement
+        rows = db.execute(
+            select(product.id, product.name, product.category).where(product.site_id == site_id)
+        ).all()
+        comments: dict[int, str] = {}
+        for product_id, comment in db.execute(
+            select(movement.product_id, movement.comment)
+            .where(movement.site_id == site_id, movement.comment.isnot(None))
+            .distinct()
+        ):
+            comments[product_id] = f"{comments.get(product_id, '')} {normalize(comment)}"
+        return _SiteIndex(
+            signature,
+            [r.id for r in rows],
+            [normalize(r.name) for r in rows],
+            [normalize(r.category) for r in rows],
+            comments,
+        )
+
+    def get(self, db: Session, site_id: int) -> _SiteIndex:
+        signature = self._signature(db, site_id)
+        index = self._sites.get(site_id)
+        if index is None or index.signature != signature:
+            with self._lock:
+                index = self._sites.get(site_id)
+                if index is None or index.signature != signature:
+                    index = self._sites[site_id] = self._build(db, site_id, signature)
+        return index
+
+
+python_index = PythonIndex()
+
+
+def _search_python(db: Session, site_id: int, query: str, limit: int, offset: int) -> list:
+    hits = python_index.get(db, site_id).search(query, limit, offset)
+    if not hits:
+        return []
+    scores = dict(hits)
+    rows = {
+        row.id: row
+        for row in db.execute(select(*crud.PRODUCT_COLUMNS).where(models.Product.id.in_(scores)))
+    }
+    return [(*rows[product_id], score) for product_id, score in hits if product_id in rows]
+
+
+# ─── Recherche ────────────────────────────────────────────────────────────────
+
+def search_products(
+    db: Session, site_id: int, query: str, limit: int = 20, offset: int = 0
+) -> list[schemas.ProductSearchHit]:
+    query = normalize(query)
+    if len(query) < MIN_QUERY_LENGTH:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        rows = _search_postgres(db, site_id, query, limit, offset)
+    else:
+        rows = _search_python(db, site_id, query, limit, offset)
+    fields = (*schemas.ProductOut.model_fields, "score")
+    return [schemas.ProductSearchHit(**dict(zip(fields, row))) for row in rows]
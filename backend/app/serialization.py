@@ -0,0 +1,64 @@
+"""
+Sérialisation directe des listes en JSON, sans objets ORM ni validation.
+
+Les listes de produits et de mouvements sont lues en lignes (colonnes déjà
+typées par SQLAlchemy) puis écrites telles quelles : ni objet ORM à
+construire, ni modèle Pydantic à valider puis resérialiser. Le JSON obtenu est
+identique, octet pour octet, à celui du schéma de réponse
+(TypeAdapter(list[Schéma]).dump_json) : clés dans l'ordre des champs du
+schéma, décimaux en chaînes, dates ISO 8601 avec « Z » pour UTC.
+
+orjson est utilisé s'il est installé (`pip install orjson`), sinon
+pydantic_core.to_json (toujours présent, un peu moins rapide).
+"""
+from decimal import Decimal
+from operator import itemgetter
+from typing import Iterable, Optional
+
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _decimal(value):
+    # Même rendu que Pydantic : str(Decimal), échelle de la colonne conservée
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Type non sérialisable : {type(value).__name__}")
+
+
+def _encode(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=_decimal, option=orjson.OPT_UTC_Z)
+    return to_json(value)
+
+
+def _records(rows: Iterable, schema: type[BaseModel]) -> list[dict]:
+    """Lignes SQLAlchemy → dictionnaires aux clés (et dans l'ordre) du schéma."""
+    fields = tuple(schema.model_fields)
+    records, pick = [], None
+    for row in rows:
+        if pick is None:
+            # Positions calculées une fois : la requête peut ranger ses colonnes autrement
+            pick = itemgetter(*(row._fields.index(field) for field in fields))
+        records.append(dict(zip(fields, pick(row))))
+    return records
+
+
+def dumps(rows: Iterable, schema: type[BaseModel]) -> bytes:
+    """JSON d'une liste de lignes, comme list[schema]."""
+    return _encode(_records(rows, schema))
+
+
+def dumps_one(row, schema: type[BaseModel]) -> bytes:
+    """JSON d'une seule ligne, comme schema(**row).model_dump_json()."""
+    return _encode(_records((row,), schema)[0])
+
+
+def json_response(rows: Iterable, schema: type[BaseModel], headers: Optional[dict] = None) -> Response:
+    return Response(dumps(rows, schema), media_type="application/json", headers=headers)
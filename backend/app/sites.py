@@ -0,0 +1,38 @@
+"""
+Site courant d'une requête.
+
+Le site est donné par l'en-tête X-Site-Id, ou par le paramètre ?site_id= pour
+les liens ouverts directement par le navigateur (exports). Sans l'un ni
+l'autre, c'est le site par défaut. Les ids déjà vus sont gardés en mémoire :
+la base n'est interrogée qu'à la première apparition d'un site.
+"""
+from typing import Optional
+
+from fastapi import Header, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+
+from . import crud
+from .database import SessionLocal
+from .models import DEFAULT_SITE_ID
+
+_known_sites: set[int] = set()
+
+
+def _site_exists(site_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        return crud.site_exists(db, site_id)
+    finally:
+        db.close()
+
+
+async def get_site_id(
+    x_site_id: Optional[int] = Header(None),
+    site_id: Optional[int] = Query(None, include_in_schema=False),
+) -> int:
+    resolved = x_site_id or site_id or DEFAULT_SITE_ID
+    if resolved not in _known_sites:
+        if not await run_in_threadpool(_site_exists, resolved):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Site introuvable")
+        _known_sites.add(resolved)
+    return resolved
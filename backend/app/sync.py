@@ -0,0 +1,106 @@
+"""
+Synchronisation incrémentale des clients hors ligne (tablettes de cuisine).
+
+Chaque écriture de produits ou de mouvements inscrit ce qu'elle a changé au
+journal sync_changes (crud._log_changes), sous un numéro de transaction
+croissant par site et attribué dans l'ordre des commits. Le curseur d'un
+client est le dernier numéro (et, au milieu d'une grosse transaction, la
+dernière ligne) qu'il a reçu : GET /api/sync ne renvoie que ce qui a changé
+depuis, quelques kilo-octets après une coupure au lieu des listes complètes.
+
+Le journal ne garde qu'une ligne par objet (son dernier changement) : un
+produit modifié dix fois depuis le curseur n'est renvoyé qu'une fois, dans
+son état courant. Une suppression laisse une pierre tombale. Au-delà de
+SYNC_RETENTION_DAYS le journal est élagué ; un curseur plus ancien, ou pas
+de curseur du tout, demande au client de tout recharger (reset), puis de
+reprendre au curseur renvoyé.
+
+Les mouvements saisis hors ligne sont renvoyés avec une clé d'idempotence
+générée par le client (crud.create_movements_once) : rejouer la file après une
+coupure ne compte jamais deux fois le même mouvement.
+"""
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from . import crud, models, schemas
+
+ENTITIES = ("movement", "product")
+
+
+class Position(NamedTuple):
+    """Position dans le journal : après la transaction `seq`, ou au milieu."""
+    seq:       int
+    entity:    Optional[str] = None    # dernière ligne reçue de la transaction `seq`
+    entity_id: Optional[int] = None
+
+
+def encode_cursor(position: Position) -> str:
+    if position.entity is None:
+        return str(position.seq)
+    return f"{position.seq}_{position.entity}_{position.entity_id}"
+
+
+def decode_cursor(cursor: str) -> Position:
+    """Lève ValueError si le curseur est mal formé."""
+    seq, *rest = cursor.split("_")
+    if not rest:
+        return Position(int(seq))
+    entity, entity_id = rest
+    if entity not in ENTITIES:
+        raise ValueError(f"entité inconnue : {entity}")
+    return Position(int(seq), entity, int(entity_id))
+
+
+def get_changes(db: Session, site_id: int, cursor: Optional[str], limit: int) -> schemas.SyncDelta:
+    """Produits et mouvements changés depuis `cursor`, dans l'ordre du journal."""
+    # L'état d'abord : une transaction validée entre les deux lectures a un
+    # numéro plus grand, elle sera renvoyée (au pire deux fois, sans dommage).
+    state = db.get(models.SyncState, site_id)
+    last_seq, pruned_seq = (state.last_seq, state.pruned_seq) if state else (0, 0)
+    position = decode_cursor(cursor) if cursor else None
+    if (
+        position is None
+        or position.seq > last_seq
+        or position.seq < pruned_seq
+        or (position.seq == pruned_seq and position.entity is not None)
+    ):
+        return schemas.SyncDelta(cursor=encode_cursor(Position(last_seq)), reset=True)
+
+    change = models.SyncChange
+    q = select(change.seq, change.entity, change.entity_id, change.deleted).where(change.site_id == site_id)
+    if position.entity is None:
+        q = q.where(change.seq > position.seq)
+    else:
+        q = q.where(
+            change.seq >= position.seq,
+            tuple_(change.seq, change.entity, change.entity_id) > tuple_(*position),
+        )
+    rows = db.execute(q.order_by(change.seq, change.entity, change.entity_id).limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if has_more:
+        last = rows[-1]
+        next_position = Position(last.seq, last.entity, last.entity_id)
+    else:
+        next_position = Position(max(last_seq, position.seq))
+
+    product_ids = [r.entity_id for r in rows if r.entity == "product" and not r.deleted]
+    movement_ids = [r.entity_id for r in rows if r.entity == "movement"]
+    products = db.execute(
+        select(*crud.PRODUCT_COLUMNS).where(models.Product.site_id == site_id, models.Product.id.in_(product_ids))
+    ).all() if product_ids else []
+    movements = db.execute(
+        select(*crud.MOVEMENT_COLUMNS)
+        .join(models.Product, models.Product.id == models.Movement.product_id)
+        .where(models.Movement.site_id == site_id, models.Movement.id.in_(movement_ids))
+        .order_by(models.Movement.id)
+    ).all() if movement_ids else []
+    return schemas.SyncDelta(
+        cursor=encode_cursor(next_position),
+        has_more=has_more,
+        products=[schemas.ProductOut.model_validate(row) for row in products],
+        movements=[schemas.MovementOut.model_validate(row) for row in movements],
+        deleted_products=[r.entity_id for r in rows if r.entity == "product" and r.deleted],
+    )
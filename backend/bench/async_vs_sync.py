@@ -0,0 +1,84 @@
+"""
+Compare le débit des routes synchrones et asynchrones (DB_ASYNC) sous forte concurrence.
+
+Lance deux serveurs uvicorn sur la même base (DATABASE_URL du .env), l'un en
+mode synchrone, l'autre avec DB_ASYNC=true, puis envoie le même volume de
+requêtes à chacun avec un nombre croissant de clients simultanés. Sur un
+fichier SQLite local les deux modes font jeu égal ; le mode asynchrone n'est à
+activer que si ce banc montre un gain sur la base PostgreSQL visée.
+
+Utilisation (depuis backend/) :
+    pip install -r bench/requirements.txt
+    python bench/async_vs_sync.py --concurrency 16 64 256 --requests 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from common import percentile, start_server, wait_ready
+
+
+async def hammer(base_url: str, paths: list[str], total: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(paths[i % len(paths)])
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        while not queue.empty():
+            path = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "errors": errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--paths", nargs="+", default=["/api/products", "/api/movements?limit=50", "/api/dashboard"])
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    print(f"{'mode':<6} {'clients':>8} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'erreurs':>8}")
+    for db_async in (False, True):
+        mode = "async" if db_async else "sync"
+        port = args.port + int(db_async)
+        server = start_server(port, db_async=str(db_async).lower(), cache_backend="none")
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            wait_ready(base_url)
+            for concurrency in args.concurrency:
+                r = asyncio.run(hammer(base_url, args.paths, args.requests, concurrency))
+                print(f"{mode:<6} {concurrency:>8} {r['rps']:>10.0f} {r['p50']:>9.1f} {r['p95']:>9.1f} {r['errors']:>8}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
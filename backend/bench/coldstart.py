@@ -0,0 +1,85 @@
+"""
+Mesure le démarrage à froid de l'API et échoue au-delà d'un budget.
+
+Applique d'abord les migrations (étape de déploiement, chronométrée à part),
+puis, pour chaque nombre de workers demandé, lance uvicorn et mesure le temps
+jusqu'à la première réponse de /health puis de /api/products (pool de
+connexions déjà ouvert par le lifespan). Mesure aussi l'import seul de
+app.main, payé par chaque worker. Code de sortie non nul si un démarrage
+dépasse --budget secondes.
+
+Utilisation (depuis backend/) :
+    python bench/coldstart.py --url sqlite:///bench_coldstart.db
+    python bench/coldstart.py --url postgresql://…/stock_bench --workers 1 4 --budget 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from common import BACKEND_DIR, start_server
+
+POLL_INTERVAL = 0.02
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default=os.environ.get("DATABASE_URL", "sqlite:///bench_coldstart.db"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--budget", type=float, default=5.0, help="secondes jusqu'à la première réponse")
+    return parser.parse_args()
+
+
+def timed_command(env: dict, *args: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def first_response(url: str, start: float, timeout: float = 60) -> float:
+    while time.perf_counter() - start < timeout:
+        try:
+            if httpx.get(url, timeout=5).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        time.sleep(POLL_INTERVAL)
+    raise RuntimeError(f"{url} injoignable")
+
+
+def main() -> None:
+    args = parse_args()
+    env = dict(os.environ, DATABASE_URL=args.url, MIGRATE_ON_STARTUP="false")
+    print(f"Migrations (python -m app.migrations) : {timed_command(env, '-m', 'app.migrations'):.2f} s")
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    imported = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+    )
+    print(f"Import de app.main : {float(imported.stdout):.2f} s")
+
+    over_budget = False
+    for workers in args.workers:
+        base_url = f"http://127.0.0.1:{args.port}"
+        start = time.perf_counter()
+        server = start_server(
+            args.port, workers,
+            database_url=args.url, migrate_on_startup="false", web_concurrency=workers,
+        )
+        try:
+            health = first_response(f"{base_url}/health", start)
+            products = first_response(f"{base_url}/api/products", start)
+        finally:
+            server.terminate()
+            server.wait()
+        over_budget |= products > args.budget
+        print(f"{workers} worker(s) : /health {health:.2f} s, /api/products {products:.2f} s")
+    print(f"Budget : {args.budget:.1f} s — {'dépassé' if over_budget else 'respecté'}")
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Générateur de données synthétiques à grande échelle.
+
+Reprend les produits, catégories et unités de seed.py et les décline jusqu'à
+la volumétrie demandée (100k produits, 10M mouvements…). Le chargement passe
+par COPY sur PostgreSQL et par des INSERT multi-lignes ailleurs, par lots, sans
+jamais garder plus d'un lot en mémoire.
+
+Utilisation (depuis backend/, sur une base de test !) :
+    python bench/datagen.py --url sqlite:///bench.db --products 100000 --movements 10000000
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+from datetime import date, timedelta
+from decimal import Decimal
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default=os.environ.get("DATABASE_URL", "sqlite:///bench.db"))
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--movements", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--sites", type=int, default=1, help="produits répartis sur N sites")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="vide les tables avant chargement")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    ARGS = parse_args()
+    os.environ["DATABASE_URL"] = ARGS.url
+
+from sqlalchemy import Engine, create_engine, func, insert, select, text  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app import crud, migrations, models, schemas  # noqa: E402
+from seed import PRODUCTS  # noqa: E402
+
+BATCH_SIZE = 10_000
+
+COMMENTS = [
+    None, None, None,
+    "Livraison hebdomadaire",
+    "Livraison fournisseur",
+    "Repas du midi",
+    "Goûter",
+    "Préparation cuisine centrale",
+    "Inventaire — ajustement",
+    "Réappro matériel",
+]
+
+
+def _product_rows(count: int, site_ids: list[int], rng: random.Random):
+    for i in range(count):
+        base = PRODUCTS[i % len(PRODUCTS)]
+        threshold = Decimal(base["min_threshold"])
+        # ~10 % des produits sous leur seuil, comme le jeu de démonstration
+        low = rng.random() < 0.10
+        quantity = threshold * Decimal(rng.uniform(0, 0.9) if low else rng.uniform(1, 8))
+        price = Decimal(str(base["price_per_unit"])) * Decimal(rng.uniform(0.7, 1.3))
+        yield dict(
+            site_id=site_ids[i % len(site_ids)],
+            name=f"{base['name']} #{i // len(PRODUCTS) + 1}",
+            category=base["category"],
+            quantity=quantity.quantize(Decimal("0.01")),
+            unit=base["unit"],
+            min_threshold=threshold,
+            price_per_unit=price.quantize(Decimal("0.01")),
+        )
+
+
+def _movement_rows(count: int, products: list[tuple[int, int]], days: int, rng: random.Random):
+    start = date.today() - timedelta(days=days - 1)
+    for _ in range(count):
+        entry = rng.random() < 0.3
+        product_id, site_id = rng.choice(products)
+        yield dict(
+            site_id=site_id,
+            product_id=product_id,
+            type="Entrée" if entry else "Sortie",
+            quantity=Decimal(rng.randint(10, 80) if entry else rng.randint(1, 20)),
+            date=start + timedelta(days=rng.randrange(days)),
+            comment=rng.choice(COMMENTS),
+        )
+
+
+def _batches(rows, size: int = BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _copy(engine: Engine, table: str, columns: list[str], batch: list[dict]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        writer.writerow(["" if row[c] is None else row[c] for c in columns])
+    buffer.seek(0)
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def _load(engine: Engine, model, rows) -> None:
+    table = model.__table__
+    for batch in _batches(rows):
+        if engine.dialect.name == "postgresql":
+            _copy(engine, table.name, list(batch[0]), batch)
+        else:
+            with engine.begin() as conn:
+                conn.execute(insert(table), batch)
+
+
+def generate(
+    engine: Engine,
+    products: int,
+    movements: int,
+    days: int = 3 * 365,
+    seed: int = 42,
+    reset: bool = False,
+    sites: int = 1,
+) -> None:
+    migrations.upgrade(engine)
+    rng = random.Random(seed)
+    with Session(engine) as db:
+        for n in range(len(crud.get_site_ids(db)), sites):
+            crud.create_site(db, schemas.SiteCreate(name=f"Site {n + 1}"))
+        site_ids = crud.get_site_ids(db)[:sites]
+    with engine.begin() as conn:
+        if reset:
+            conn.execute(models.Movement.__table__.delete())
+            conn.execute(models.Product.__table__.delete())
+        existing = conn.execute(select(func.count(models.Product.id))).scalar()
+
+    if existing < products:
+        _load(engine, models.Product, _product_rows(products - existing, site_ids, rng))
+    with engine.connect() as conn:
+        product_sites = [tuple(row) for row in conn.execute(select(models.Product.id, models.Product.site_id))]
+        existing = conn.execute(select(func.count(models.Movement.id))).scalar()
+    if existing < movements:
+        _load(engine, models.Movement, _movement_rows(movements - existing, product_sites, days, rng))
+
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    with Session(engine) as db:
+        for site_id in crud.get_site_ids(db):
+            crud.reconcile_dashboard_stats(db, site_id)
+
+
+if __name__ == "__main__":
+    engine = create_engine(ARGS.url)
+    generate(engine, ARGS.products, ARGS.movements, ARGS.days, ARGS.seed, ARGS.reset, ARGS.sites)
+    with engine.connect() as conn:
+        n_products = conn.execute(select(func.count(models.Product.id))).scalar()
+        n_movements = conn.execute(select(func.count(models.Movement.id))).scalar()
+    print(f"✓ {n_products} produits, {n_movements} mouvements.")
@@ -0,0 +1,102 @@
+"""
+Vérifie que les requêtes de mouvements, d'alertes et de recherche restent servies par un index.
+
+Peuple une base de test (à ne pas confondre avec la base de production !) avec
+un volume réaliste, puis contrôle le plan d'exécution (EXPLAIN) de chaque
+requête : aucun parcours complet de `movements` ni de `products` n'est toléré.
+La recherche de produits n'est contrôlée que sur PostgreSQL (index Python sur
+SQLite).
+Code de sortie non nul si un plan régresse.
+
+Utilisation (depuis backend/) :
+    python bench/explain_plans.py --url sqlite:///bench_plans.db
+    python bench/explain_plans.py --url postgresql://…/stock_bench --movements 2000000
+"""
+import argparse
+import os
+import re
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="sqlite:///bench_plans.db")
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--movements", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = args.url
+
+from sqlalchemy import create_engine, func, select  # noqa: E402
+
+from app import crud, models, search  # noqa: E402
+from datagen import generate  # noqa: E402
+
+# Parcours complets interdits, par dialecte
+FULL_SCAN = {
+    "postgresql": re.compile(r"Seq Scan on (movements|products)\b"),
+    "sqlite":     re.compile(r"SCAN (movements|products)(?! USING)"),
+}
+
+
+def queries(dialect: str):
+    today = date.today()
+    site = models.DEFAULT_SITE_ID
+    yield "mouvements récents", crud.movement_rows_stmt(site, limit=50)
+    yield "mouvements d'un produit", crud.movement_rows_stmt(site, product_id=7, limit=50)
+    yield "mouvements par type", crud.movement_rows_stmt(site, type="Sortie", limit=50)
+    yield "mouvements sur une période", crud.movement_rows_stmt(
+        site,
+        date_from=today - timedelta(days=30), date_to=today, limit=50
+    )
+    yield "page suivante (curseur)", crud.movement_rows_stmt(
+        site,
+        cursor=f"{(today - timedelta(days=90)).isoformat()}_1000000", limit=50
+    )
+    yield "produits en alerte", (
+        select(models.Product)
+        .where(models.Product.site_id == site, models.LOW_STOCK)
+        .order_by(models.ALERT_RATIO)
+    )
+    yield "nombre de produits en alerte", select(func.count(models.Product.id)).where(
+        models.Product.site_id == site, models.LOW_STOCK
+    )
+    if dialect == "postgresql":
+        yield "recherche de produits", search.search_postgres_stmt(site, search.normalize("huile ol"), 20, 0)
+
+
+def explain(conn, stmt) -> str:
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.paramstyle in ("format", "pyformat"):
+        # Envoyée sans paramètres : le pilote ne ramène plus %% à %
+        sql = sql.replace("%%", "%")
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    rows = conn.execution_options(no_parameters=True).exec_driver_sql(prefix + sql).all()
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def main() -> int:
+    engine = create_engine(args.url)
+    generate(engine, args.products, args.movements, args.days)
+
+    full_scan = FULL_SCAN[engine.dialect.name]
+    failures = 0
+    with engine.connect() as conn:
+        for label, stmt in queries(engine.dialect.name):
+            plan = explain(conn, stmt)
+            ok = not full_scan.search(plan)
+            failures += not ok
+            print(f"{'✓' if ok else '✗'} {label}")
+            if not ok:
+                print("    " + plan.replace("\n", "\n    "))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
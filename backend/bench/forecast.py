@@ -0,0 +1,75 @@
+"""
+Mesure le temps d'un recalcul complet des prévisions.
+
+Peuple une base de test (à ne pas confondre avec la base de production !)
+puis chronomètre forecasting.refresh(full=True) d'un site : lecture de
+l'historique, calcul NumPy et écriture, chacun séparément. Un recalcul
+incrémental (produits modifiés seulement) est chronométré ensuite.
+
+Utilisation (depuis backend/) :
+    python bench/forecast.py --url sqlite:///bench_forecast.db
+    python bench/forecast.py --url postgresql://…/stock_bench --products 50000 --movements 5000000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="sqlite:///bench_forecast.db")
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--movements", type=int, default=2_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = args.url
+
+from sqlalchemy import create_engine, select, update  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app import forecasting, models  # noqa: E402
+from app.sites import DEFAULT_SITE_ID  # noqa: E402
+from datagen import generate  # noqa: E402
+
+
+def timed(label: str, fn, *a):
+    start = time.perf_counter()
+    result = fn(*a)
+    print(f"  {label:<28} {time.perf_counter() - start:7.2f} s")
+    return result
+
+
+def main() -> None:
+    engine = create_engine(args.url)
+    generate(engine, args.products, args.movements, args.days)
+    params = forecasting.Params.from_settings()
+    today = date.today()
+    with Session(engine) as db:
+        print(f"Site {DEFAULT_SITE_ID}, historique {params.history_days} jours :")
+        ids, quantities, consumption, site_totals = timed(
+            "lecture de l'historique", forecasting._load, db, DEFAULT_SITE_ID, None, today, params.history_days,
+        )
+        print(f"  ({len(ids)} produits × {consumption.shape[1]} jours)")
+        result = timed("calcul", forecasting.compute, consumption, site_totals, quantities, today, params)
+        timed("écriture", forecasting._write, db, DEFAULT_SITE_ID, ids, result, today, True)
+        db.rollback()
+
+        count, _ = timed("recalcul complet", forecasting.refresh, db, DEFAULT_SITE_ID, True, params)
+        print(f"  ({count} produits)")
+        # Quelques produits modifiés depuis : seul leur calcul est refait
+        changed = list(db.scalars(select(models.Product.id).limit(100)))
+        db.execute(update(models.Product).where(models.Product.id.in_(changed)).values(name=models.Product.name))
+        db.commit()
+        count, _ = timed("recalcul incrémental", forecasting.refresh, db, DEFAULT_SITE_ID, False, params)
+        print(f"  ({count} produits)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Écritures concurrentes sur un seul produit : aucune mise à jour de stock perdue.
+
+Pour chaque nombre d'écrivains N (--writers), crée un produit au petit stock
+puis lance N threads qui envoient chacun --requests mouvements sur ce produit
+(POST /api/movements), sorties et entrées mêlées : le stock touche souvent
+zéro et des sorties y sont ramenées. Vérifie ensuite que la quantité finale
+est celle qu'on obtient en rejouant les mouvements acceptés dans l'ordre où la
+base les a appliqués (ordre des id : le mouvement est inséré sous le verrou de
+la ligne produit), bornage à zéro compris. Une écriture écrasée par une autre,
+sortie bornée comprise, fait diverger les deux. Affiche p50 / p95 et le débit
+par N ; code de sortie non nul si une mise à jour est perdue.
+
+Utilisation (depuis backend/, sur une base de test !) :
+    python bench/hot_product.py --url sqlite:///bench_hot.db
+    python bench/hot_product.py --url postgresql://…/stock_bench --writers 1,8,32,64 --workers 4
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default=os.environ.get("DATABASE_URL", "sqlite:///bench_hot.db"))
+    parser.add_argument("--writers", default="1,4,16,32", help="nombres d'écrivains simultanés, séparés par des virgules")
+    parser.add_argument("--requests", type=int, default=50, help="mouvements envoyés par écrivain")
+    parser.add_argument("--initial", type=int, default=20, help="stock de départ du produit")
+    parser.add_argument("--sorties", type=float, default=0.6, help="part des sorties dans les mouvements")
+    parser.add_argument("--workers", type=int, default=1, help="workers uvicorn")
+    parser.add_argument("--port", type=int, default=8210)
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+os.environ["DATABASE_URL"] = ARGS.url
+
+import httpx  # noqa: E402
+from sqlalchemy import create_engine, select  # noqa: E402
+
+from common import percentile, start_server, wait_ready  # noqa: E402
+from app import migrations, models  # noqa: E402
+
+
+def writer(base_url: str, product_id: int, seed: int, start: threading.Barrier,
+           latencies: list[float], errors: list[int]) -> None:
+    rng = random.Random(seed)
+    today = date.today().isoformat()
+    with httpx.Client(base_url=base_url, timeout=120) as client:
+        start.wait()
+        for _ in range(ARGS.requests):
+            body = {
+                "product_id": product_id,
+                "type":       "Sortie" if rng.random() < ARGS.sorties else "Entrée",
+                "quantity":   rng.randint(1, 10),
+                "date":       today,
+                "comment":    "bench",
+            }
+            began = time.perf_counter()
+            try:
+                ok = client.post("/api/movements", json=body).status_code == 201
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - began)
+            if not ok:
+                errors.append(1)
+
+
+def replay(engine, product_id: int) -> tuple[Decimal, int, int]:
+    """Quantité attendue en rejouant les mouvements par id, nombre de
+    mouvements et de sorties ramenées à zéro."""
+    quantity, clamped = Decimal(ARGS.initial), 0
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(models.Movement.type, models.Movement.quantity)
+            .where(models.Movement.product_id == product_id)
+            .order_by(models.Movement.id)
+        ).all()
+    for type_, moved in rows:
+        delta = moved if type_ == "Entrée" else -moved
+        if quantity + delta < 0:
+            clamped += 1
+        quantity = max(Decimal("0"), quantity + delta)
+    return quantity, len(rows), clamped
+
+
+def run(base_url: str, engine, writers: int) -> dict:
+    stamp = datetime.now().strftime("%H%M%S%f")
+    product = httpx.post(f"{base_url}/api/products", json={
+        "name": f"Bench concurrent {writers} {stamp}", "category": "Bench", "quantity": ARGS.initial,
+        "unit": "u", "min_threshold": 5, "price_per_unit": 1,
+    }).json()
+
+    latencies: list[float] = []
+    errors: list[int] = []
+    start = threading.Barrier(writers)
+    threads = [
+        threading.Thread(target=writer, args=(base_url, product["id"], n, start, latencies, errors))
+        for n in range(writers)
+    ]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    final = Decimal(httpx.get(f"{base_url}/api/products/{product['id']}").json()["quantity"])
+    expected, stored, clamped = replay(engine, product["id"])
+    latencies.sort()
+    return {
+        "accepted": len(latencies) - len(errors),
+        "stored":   stored,
+        "errors":   len(errors),
+        "clamped":  clamped,
+        "final":    final,
+        "expected": expected,
+        "rps":      len(latencies) / elapsed,
+        "p50_ms":   percentile(latencies, 50) * 1000,
+        "p95_ms":   percentile(latencies, 95) * 1000,
+    }
+
+
+def main() -> int:
+    engine = create_engine(ARGS.url)
+    migrations.upgrade(engine)
+    base_url = f"http://127.0.0.1:{ARGS.port}"
+    server = start_server(ARGS.port, workers=ARGS.workers, dashboard_reconcile_interval=0)
+    results = {}
+    try:
+        wait_ready(base_url)
+        for writers in (int(n) for n in ARGS.writers.split(",")):
+            results[writers] = run(base_url, engine, writers)
+    finally:
+        server.terminate()
+        server.wait()
+        engine.dispose()
+
+    print(f"\n{'N':>4} {'mouv.':>6} {'err':>4} {'bornées':>8} {'stock':>8} {'attendu':>8} "
+          f"{'req/s':>7} {'p50 ms':>7} {'p95 ms':>7}")
+    lost = 0
+    for writers, r in results.items():
+        # Une écriture perdue : stock final différent du rejeu, ou mouvement
+        # accepté sans ligne enregistrée (ou l'inverse)
+        lost += r["final"] != r["expected"] or r["accepted"] != r["stored"]
+        print(f"{writers:>4} {r['stored']:>6} {r['errors']:>4} {r['clamped']:>8} {r['final']:>8} "
+              f"{r['expected']:>8} {r['rps']:>7.1f} {r['p50_ms']:>7.1f} {r['p95_ms']:>7.1f}")
+    print(f"\nMises à jour perdues : {'aucune' if not lost else f'{lost} série(s) en écart'}")
+    return 1 if lost else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+Banc de charge : rejoue un trafic réaliste contre l'API et mesure chaque route.
+
+1. peuple la base avec datagen.py (volumétrie configurable) ;
+2. lance l'API (uvicorn) sur cette base ;
+3. envoie pendant --duration secondes un mélange pondéré de lectures
+   (/api/products, /api/movements, /api/dashboard…) et d'écritures ;
+4. affiche p50 / p95 / p99 et le débit par route, vérifie qu'aucune mise à
+   jour de stock n'a été perdue sous écritures concurrentes ;
+5. enregistre le résultat dans bench/results/ et le compare au précédent
+   (ou à --baseline) : code de sortie non nul si un p95 régresse de plus de
+   --tolerance.
+
+Utilisation (depuis backend/, sur une base de test !) :
+    pip install -r bench/requirements.txt
+    python bench/loadgen.py --url sqlite:///bench.db --products 10000 --movements 1000000
+    python bench/loadgen.py --url postgresql://…/stock_bench --concurrency 64 --workers 4
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default=os.environ.get("DATABASE_URL", "sqlite:///bench.db"))
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--movements", type=int, default=1_000_000)
+    parser.add_argument("--skip-load", action="store_true", help="réutilise les données déjà en base")
+    parser.add_argument("--duration", type=float, default=30, help="secondes de trafic")
+    parser.add_argument("--concurrency", type=int, default=32, help="clients simultanés")
+    parser.add_argument("--workers", type=int, default=1, help="workers uvicorn")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--hot-products", type=int, default=5, help="produits visés par les écritures")
+    parser.add_argument("--baseline", help="fichier de résultats de référence")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="régression de p95 tolérée")
+    parser.add_argument("--label", default="", help="libellé enregistré avec les résultats")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+os.environ["DATABASE_URL"] = ARGS.url
+
+import httpx  # noqa: E402
+from sqlalchemy import create_engine, select  # noqa: E402
+
+from common import percentile, start_server, wait_ready  # noqa: E402
+from datagen import generate  # noqa: E402
+from app import models  # noqa: E402
+from seed import CATEGORIES  # noqa: E402
+
+
+class Scenario:
+    """Une route du mélange : nom affiché, poids relatif, requête à envoyer."""
+
+    def __init__(self, name: str, weight: int, request):
+        self.name = name
+        self.weight = weight
+        self.request = request
+
+
+def build_mix(product_ids: list[int], hot_ids: list[int], writes: Counter) -> list[Scenario]:
+    today = date.today()
+
+    async def get(client, path, **params):
+        return await client.get(path, params=params)
+
+    async def post_entry(client):
+        product_id = random.choice(hot_ids)
+        response = await client.post("/api/movements", json={
+            "product_id": product_id,
+            "type":       "Entrée",
+            "quantity":   1,
+            "date":       today.isoformat(),
+            "comment":    "bench",
+        })
+        if response.status_code == 201:
+            writes[product_id] += 1
+        return response
+
+    def cursor():
+        day = today - timedelta(days=random.randrange(365))
+        return f"{day.isoformat()}_{2**31 - 1}"
+
+    return [
+        Scenario("GET /api/products", 20, lambda c: get(c, "/api/products")),
+        Scenario("GET /api/products?category", 10,
+                 lambda c: get(c, "/api/products", category=random.choice(CATEGORIES))),
+        Scenario("GET /api/products/alerts", 10, lambda c: get(c, "/api/products/alerts")),
+        Scenario("GET /api/dashboard", 20, lambda c: get(c, "/api/dashboard")),
+        Scenario("GET /api/movements?limit", 15, lambda c: get(c, "/api/movements", limit=50)),
+        Scenario("GET /api/movements?product_id", 10,
+                 lambda c: get(c, "/api/movements", product_id=random.choice(product_ids), limit=50)),
+        Scenario("GET /api/movements?cursor", 5,
+                 lambda c: get(c, "/api/movements", cursor=cursor(), limit=50)),
+        Scenario("POST /api/movements", 10, post_entry),
+    ]
+
+
+async def run_mix(base_url: str, mix: list[Scenario]) -> dict[str, dict]:
+    latencies: dict[str, list[float]] = {s.name: [] for s in mix}
+    errors: Counter = Counter()
+    deadline = time.monotonic() + ARGS.duration
+    weights = [s.weight for s in mix]
+
+    async def client_loop(client: httpx.AsyncClient):
+        while time.monotonic() < deadline:
+            scenario = random.choices(mix, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await scenario.request(client)
+                if response.status_code >= 400:
+                    errors[scenario.name] += 1
+            except httpx.HTTPError:
+                errors[scenario.name] += 1
+            latencies[scenario.name].append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=ARGS.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(ARGS.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    results = {}
+    for name, values in latencies.items():
+        values.sort()
+        results[name] = {
+            "count":  len(values),
+            "errors": errors[name],
+            "rps":    len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    return results
+
+
+def stock_of(base_url: str, product_ids: list[int]) -> dict[int, Decimal]:
+    return {
+        product_id: Decimal(httpx.get(f"{base_url}/api/products/{product_id}").json()["quantity"])
+        for product_id in product_ids
+    }
+
+
+def previous_results() -> Optional[str]:
+    files = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))
+    return files[-1] if files else None
+
+
+def compare(results: dict, baseline_path: str) -> int:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["endpoints"]
+    regressions = 0
+    print(f"\nComparaison avec {os.path.relpath(baseline_path)} :")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before or not before["p95_ms"]:
+            continue
+        change = current["p95_ms"] / before["p95_ms"] - 1
+        flag = "✗" if change > ARGS.tolerance else "✓"
+        regressions += change > ARGS.tolerance
+        print(f"  {flag} {name:<32} p95 {before['p95_ms']:8.1f} → {current['p95_ms']:8.1f} ms ({change:+.0%})")
+    return regressions
+
+
+def main() -> int:
+    engine = create_engine(ARGS.url)
+    if not ARGS.skip_load:
+        print(f"Chargement : {ARGS.products} produits, {ARGS.movements} mouvements…")
+        generate(engine, ARGS.products, ARGS.movements)
+    with engine.connect() as conn:
+        product_ids = list(conn.execute(select(models.Product.id)).scalars())
+    engine.dispose()
+    hot_ids = random.Random(0).sample(product_ids, min(ARGS.hot_products, len(product_ids)))
+
+    base_url = f"http://127.0.0.1:{ARGS.port}"
+    server = start_server(ARGS.port, workers=ARGS.workers, dashboard_reconcile_interval=0)
+    try:
+        wait_ready(base_url)
+        before = stock_of(base_url, hot_ids)
+        writes: Counter = Counter()
+        print(f"Trafic : {ARGS.concurrency} clients pendant {ARGS.duration:.0f} s…")
+        results = asyncio.run(run_mix(base_url, build_mix(product_ids, hot_ids, writes)))
+        after = stock_of(base_url, hot_ids)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"\n{'route':<34} {'req':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'err':>5}")
+    for name, r in results.items():
+        print(f"{name:<34} {r['count']:>7} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>5}")
+
+    # Chaque entrée acceptée doit se retrouver dans le stock : sinon une mise à jour a été écrasée
+    lost = int(sum(writes[p] - (after[p] - before[p]) for p in hot_ids))
+    print(f"\nÉcritures concurrentes : {sum(writes.values())} entrées acceptées, {lost} perdue(s)")
+
+    baseline = ARGS.baseline or previous_results()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(RESULTS_DIR, f"{stamp}.json")
+    with open(path, "w") as f:
+        json.dump({
+            "label":     ARGS.label,
+            "timestamp": stamp,
+            "config": {
+                "database":    engine.dialect.name,
+                "products":    len(product_ids),
+                "concurrency": ARGS.concurrency,
+                "workers":     ARGS.workers,
+                "duration":    ARGS.duration,
+            },
+            "lost_updates": lost,
+            "endpoints": results,
+        }, f, indent=2)
+    print(f"Résultats enregistrés dans {os.path.relpath(path)}")
+
+    regressions = compare(results, baseline) if baseline else 0
+    return 1 if regressions or lost else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
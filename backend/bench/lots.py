@@ -0,0 +1,124 @@
+"""
+Mesure le prélèvement FEFO des sorties et la recherche des lots à échéance.
+
+Peuple une base de test (à ne pas confondre avec la base de production !)
+avec des produits et des dizaines de milliers de lots ouverts, reçus par
+entrées groupées (crud.bulk_create_movements), dont un produit très chargé.
+Chronomètre ensuite, sans HTTP : une sortie unitaire (crud.create_movement)
+sur des produits tirés au hasard, une sortie qui vide des milliers de lots
+d'un coup, une saisie groupée, la liste des lots à échéance et le tableau de
+bord. Code de sortie non nul si une sortie unitaire dépasse le budget au 95e
+centile.
+
+Utilisation (depuis backend/) :
+    python bench/lots.py --url sqlite:///bench_lots.db
+    python bench/lots.py --url postgresql://…/stock_bench --lots 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="sqlite:///bench_lots.db")
+    parser.add_argument("--products", type=int, default=2_000)
+    parser.add_argument("--lots", type=int, default=50_000, help="lots ouverts au départ")
+    parser.add_argument("--heavy-lots", type=int, default=5_000, help="lots du produit le plus chargé")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--budget-ms", type=float, default=20.0, help="latence p95 visée par sortie")
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = args.url
+
+from sqlalchemy import create_engine, func, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app import crud, models, schemas  # noqa: E402
+from app.models import DEFAULT_SITE_ID  # noqa: E402
+from datagen import generate  # noqa: E402
+
+
+def receipts(product_ids: list[int], count: int, rng: random.Random) -> list[schemas.MovementCreate]:
+    today = date.today()
+    return [
+        schemas.MovementCreate(
+            product_id=product_id,
+            type="Entrée",
+            quantity=Decimal(rng.randint(1, 50)),
+            date=today - timedelta(days=rng.randint(0, 60)),
+            lot_number=f"L{n:06d}",
+            # Un lot sur dix sans date limite (non périssable)
+            expiry_date=None if rng.random() < 0.1 else today + timedelta(days=rng.randint(-5, 180)),
+        )
+        for n, product_id in ((n, rng.choice(product_ids)) for n in range(count))
+    ]
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    rng = random.Random(42)
+    engine = create_engine(args.url)
+    generate(engine, args.products, 0, reset=True)
+    with engine.begin() as conn:
+        conn.execute(models.Lot.__table__.delete())
+    with Session(engine) as db:
+        product_ids = list(db.scalars(select(models.Product.id).order_by(models.Product.id)))
+        heavy = product_ids[0]
+        items = receipts(product_ids[1:], args.lots - args.heavy_lots, rng) + receipts([heavy], args.heavy_lots, rng)
+        start = time.perf_counter()
+        for chunk in crud._chunks(items, 5_000):
+            crud.bulk_create_movements(db, DEFAULT_SITE_ID, chunk)
+        print(f"{len(items)} lots reçus en {time.perf_counter() - start:.1f} s")
+        print(f"Lots ouverts : {db.scalar(select(func.count()).where(models.OPEN_LOT))}")
+
+        today = date.today()
+        timings = [
+            timed(lambda: crud.create_movement(db, DEFAULT_SITE_ID, schemas.MovementCreate(
+                product_id=rng.choice(product_ids[1:]), type="Sortie",
+                quantity=Decimal(rng.randint(1, 80)), date=today,
+            )))
+            for _ in range(args.repeat)
+        ]
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        print(f"Sortie unitaire          p50 {statistics.median(timings):7.1f} ms   p95 {p95:7.1f} ms")
+
+        in_lots = db.scalar(select(func.sum(models.Lot.quantity)).where(models.Lot.product_id == heavy, models.OPEN_LOT))
+        ms = timed(lambda: crud.create_movement(db, DEFAULT_SITE_ID, schemas.MovementCreate(
+            product_id=heavy, type="Sortie", quantity=Decimal(in_lots) * Decimal("0.8"), date=today,
+        )))
+        print(f"Sortie sur {args.heavy_lots} lots (80 %)  {ms:7.1f} ms")
+
+        batch = [
+            schemas.MovementCreate(product_id=product_id, type="Sortie", quantity=Decimal(rng.randint(1, 20)), date=today)
+            for product_id in rng.sample(product_ids[1:], min(500, len(product_ids) - 1))
+        ]
+        print(f"Saisie groupée ({len(batch)} sorties)  {timed(lambda: crud.create_movements_batch(db, DEFAULT_SITE_ID, batch)):7.1f} ms")
+
+        for within in (0, 7, 30):
+            lots = []
+            ms = timed(lambda: lots.extend(crud.get_expiring_lots(db, DEFAULT_SITE_ID, within)))
+            print(f"Lots à échéance ≤ {within:>2} j   {len(lots):>6} lots  {ms:7.1f} ms")
+        print(f"Tableau de bord          {timed(lambda: crud.get_dashboard_stats(db, DEFAULT_SITE_ID)):7.1f} ms")
+
+    ok = p95 <= args.budget_ms
+    print(f"Sortie unitaire au 95e centile : {p95:.1f} ms (budget {args.budget_ms:.0f} ms) — {'OK' if ok else 'DÉPASSÉ'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
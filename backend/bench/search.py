@@ -0,0 +1,75 @@
+"""
+Mesure la latence de la recherche de produits, frappe par frappe.
+
+Peuple une base de test (à ne pas confondre avec la base de production !),
+puis rejoue la saisie de quelques requêtes lettre par lettre (« hu », « hui »,
+« huil »…) comme le ferait une recherche à la volée, et donne la latence
+médiane et au 95e centile de chaque requête (search.search_products, sans
+HTTP). La première recherche sur SQLite construit l'index Python : elle est
+chronométrée à part.
+
+Utilisation (depuis backend/) :
+    python bench/search.py --url sqlite:///bench_search.db
+    python bench/search.py --url postgresql://…/stock_bench --products 100000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="sqlite:///bench_search.db")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--movements", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=20.0, help="latence p95 visée par frappe")
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = args.url
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app import search  # noqa: E402
+from app.models import DEFAULT_SITE_ID  # noqa: E402
+from datagen import generate  # noqa: E402
+
+QUERIES = ["huile olive", "boeuf hache", "pates fusilli", "epicerie", "livraison fourn", "tomates pelees"]
+
+
+def keystrokes(query: str) -> list[str]:
+    return [query[:n] for n in range(search.MIN_QUERY_LENGTH, len(query) + 1) if not query[:n].endswith(" ")]
+
+
+def main() -> None:
+    engine = create_engine(args.url)
+    generate(engine, args.products, args.movements)
+    over_budget = 0
+    with Session(engine) as db:
+        start = time.perf_counter()
+        search.search_products(db, DEFAULT_SITE_ID, "huile")
+        print(f"Première recherche (index Python sur SQLite) : {(time.perf_counter() - start) * 1000:.0f} ms")
+        print(f"{'requête':<18} {'résultats':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        for query in QUERIES:
+            for typed in keystrokes(query):
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    hits = search.search_products(db, DEFAULT_SITE_ID, typed)
+                    timings.append((time.perf_counter() - start) * 1000)
+                p95 = statistics.quantiles(timings, n=20)[-1]
+                over_budget += p95 > args.budget_ms
+                print(f"{typed:<18} {len(hits):>9} {statistics.median(timings):8.1f} {p95:8.1f}")
+    print(f"{over_budget} frappe(s) au-delà de {args.budget_ms:.0f} ms au 95e centile")
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Compare la sérialisation des listes : ORM + Pydantic contre lignes + JSON direct.
+
+Peuple une base de test (à ne pas confondre avec la base de production !),
+puis, pour la liste des produits et une page de mouvements, chronomètre :
+- l'ancien chemin : objets ORM (produits) ou MovementOut construits à la main
+  (mouvements), validés par le schéma de réponse puis sérialisés, comme le
+  faisait FastAPI ;
+- le chemin actuel : lignes SQLAlchemy écrites directement en JSON
+  (app/serialization.py, orjson si installé).
+Vérifie au passage que les deux produisent exactement les mêmes octets.
+
+Utilisation (depuis backend/) :
+    python bench/serialization.py --url sqlite:///bench_serialization.db
+    python bench/serialization.py --url postgresql://…/stock_bench --products 50000 --rows 50000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="sqlite:///bench_serialization.db")
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--movements", type=int, default=200_000)
+    parser.add_argument("--rows", type=int, default=20_000, help="taille de la page de mouvements")
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = args.url
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import create_engine, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+from app import crud, models, schemas, serialization  # noqa: E402
+from app.models import DEFAULT_SITE_ID  # noqa: E402
+from datagen import generate  # noqa: E402
+
+PRODUCT_LIST = TypeAdapter(list[schemas.ProductOut])
+MOVEMENT_LIST = TypeAdapter(list[schemas.MovementOut])
+
+
+def products_before(db: Session) -> bytes:
+    products = db.scalars(
+        select(models.Product).where(models.Product.site_id == DEFAULT_SITE_ID).order_by(models.Product.name)
+    ).all()
+    body = PRODUCT_LIST.dump_json(PRODUCT_LIST.validate_python(products, from_attributes=True))
+    db.expunge_all()    # pas de carte d'identité réutilisée d'un tour à l'autre
+    return body
+
+
+def products_after(db: Session) -> bytes:
+    return serialization.dumps(crud.get_product_rows(db, DEFAULT_SITE_ID), schemas.ProductOut)
+
+
+def movements_before(db: Session) -> bytes:
+    rows = crud.get_movement_rows(db, DEFAULT_SITE_ID, limit=args.rows)
+    content = [schemas.MovementOut(**row._mapping) for row in rows]
+    # Ce que faisait FastAPI du résultat : validation par response_model, puis JSONResponse
+    validated = MOVEMENT_LIST.validate_python(content, from_attributes=True)
+    return JSONResponse(jsonable_encoder(MOVEMENT_LIST.dump_python(validated, mode="json"))).body
+
+
+def movements_after(db: Session) -> bytes:
+    rows = crud.get_movement_rows(db, DEFAULT_SITE_ID, limit=args.rows)
+    return serialization.json_response(rows, schemas.MovementOut).body
+
+
+def measure(fn, db: Session) -> tuple[float, bytes]:
+    timings, body = [], b""
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        body = fn(db)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), body
+
+
+def main() -> None:
+    engine = create_engine(args.url)
+    generate(engine, args.products, args.movements)
+    encoder = "orjson" if serialization.orjson is not None else "pydantic_core"
+    print(f"Encodeur : {encoder}, médiane de {args.repeat} passages")
+    failed = False
+    with Session(engine) as db:
+        for label, before, after in (
+            ("produits", products_before, products_after),
+            ("mouvements", movements_before, movements_after),
+        ):
+            t_before, body_before = measure(before, db)
+            t_after, body_after = measure(after, db)
+            count = len(json.loads(body_after))
+            same = body_before == body_after
+            failed |= not same
+            print(
+                f"  {label:<11} {count:>7} lignes  avant {t_before * 1000:8.1f} ms  "
+                f"après {t_after * 1000:8.1f} ms  ×{t_before / t_after:4.1f}  "
+                f"{'identique' if same else 'DIFFÉRENT'}"
+            )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
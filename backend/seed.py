@@ -11,10 +11,9 @@ from decimal import Decimal
 from dotenv import load_dotenv
 load_dotenv()
 
-from app.database import SessionLocal, engine, Base
-from app import models
-
-Base.metadata.create_all(bind=engine)
+from sqlalchemy import select
+from app.database import SessionLocal, engine
+from app import crud, migrations, models
 
 
 def days_ago(n: int) -> date:
@@ -61,7 +60,16 @@ PRODUCTS = [
 ]
 
 
+# Catégories et unités du jeu de démonstration (réutilisées par bench/datagen.py)
+CATEGORIES = sorted({p["category"] for p in PRODUCTS})
+UNITS_BY_CATEGORY = {
+    category: sorted({p["unit"] for p in PRODUCTS if p["category"] == category})
+    for category in CATEGORIES
+}
+
+
 def seed():
+    migrations.upgrade(engine)
     db = SessionLocal()
     try:
         existing = db.query(models.Product).count()
@@ -121,6 +129,8 @@ def seed():
             db.add(obj)
 
         db.commit()
+        # Insertion directe par l'ORM : recaler les compteurs du tableau de bord
+        crud.reconcile_dashboard_stats(db, models.DEFAULT_SITE_ID)
         print(f"✓ {len(PRODUCTS)} produits et {len(MOVEMENTS)} mouvements insérés.")
 
     except Exception as e:
@@ -131,12 +141,35 @@ def seed():
         db.close()
 
 
+# Tables vidées par reset(), dépendantes avant produits et mouvements. Les
+# journaux (sync, alertes) repartent de zéro : un client hors ligne dont le
+# curseur dépasse le nouveau numéro recharge tout.
+RESET_MODELS = (
+    models.IdempotencyKey,
+    models.SyncChange,
+    models.SyncState,
+    models.AlertEvent,
+    models.Forecast,
+    models.ForecastRun,
+    models.DailyMovementCount,
+    models.DashboardCounters,
+    models.StockSnapshot,
+    models.Lot,
+    models.Movement,
+    models.Product,
+)
+
+
 def reset():
+    """Vide les produits, les mouvements et tout ce qui en découle, tous sites
+    confondus, puis recale les compteurs du tableau de bord de chaque site."""
     db = SessionLocal()
     try:
-        db.query(models.Movement).delete()
-        db.query(models.Product).delete()
+        for model in RESET_MODELS:
+            db.query(model).delete()
         db.commit()
+        for site_id in db.scalars(select(models.Site.id)).all():
+            crud.reconcile_dashboard_stats(db, site_id)
         print("Base réinitialisée.")
     finally:
         db.close()
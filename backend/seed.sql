@@ -2,8 +2,18 @@
 -- Coller dans Supabase > SQL Editor > New query > Run
 
 -- Tables
+CREATE TABLE IF NOT EXISTS sites (
+    id         SERIAL PRIMARY KEY,
+    name       VARCHAR(255) NOT NULL UNIQUE,
+    created_at TIMESTAMPTZ  DEFAULT NOW()
+);
+
+INSERT INTO sites (id, name) VALUES (1, 'Site principal') ON CONFLICT (id) DO NOTHING;
+SELECT setval(pg_get_serial_sequence('sites', 'id'), (SELECT max(id) FROM sites));
+
 CREATE TABLE IF NOT EXISTS products (
     id             SERIAL PRIMARY KEY,
+    site_id        INTEGER        NOT NULL DEFAULT 1 REFERENCES sites(id),
     name           VARCHAR(255)   NOT NULL,
     category       VARCHAR(100)   NOT NULL,
     quantity       NUMERIC(10,2)  NOT NULL DEFAULT 0,
@@ -16,6 +26,7 @@ CREATE TABLE IF NOT EXISTS products (
 
 CREATE TABLE IF NOT EXISTS movements (
     id         SERIAL PRIMARY KEY,
+    site_id    INTEGER        NOT NULL DEFAULT 1 REFERENCES sites(id),
     product_id INTEGER        NOT NULL REFERENCES products(id) ON DELETE CASCADE,
     type       VARCHAR(10)    NOT NULL CHECK (type IN ('Entrée', 'Sortie')),
     quantity   NUMERIC(10,2)  NOT NULL,
@@ -24,6 +35,66 @@ CREATE TABLE IF NOT EXISTS movements (
     created_at TIMESTAMPTZ    DEFAULT NOW()
 );
 
+CREATE TABLE IF NOT EXISTS lots (
+    id               SERIAL PRIMARY KEY,
+    site_id          INTEGER        NOT NULL REFERENCES sites(id),
+    product_id       INTEGER        NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    movement_id      INTEGER,
+    lot_number       VARCHAR(100),
+    received_date    DATE           NOT NULL,
+    expiry_date      DATE,
+    initial_quantity NUMERIC(10,2)  NOT NULL,
+    quantity         NUMERIC(10,2)  NOT NULL,
+    created_at       TIMESTAMPTZ    DEFAULT NOW()
+);
+
+-- Synchronisation des clients hors ligne (voir app/sync.py)
+CREATE TABLE IF NOT EXISTS sync_state (
+    site_id    INTEGER PRIMARY KEY,
+    last_seq   BIGINT  NOT NULL DEFAULT 0,
+    pruned_seq BIGINT  NOT NULL DEFAULT 0,
+    alert_seq  BIGINT  NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sync_changes (
+    site_id    INTEGER     NOT NULL,
+    entity     VARCHAR(10) NOT NULL,
+    entity_id  INTEGER     NOT NULL,
+    seq        BIGINT      NOT NULL,
+    deleted    BOOLEAN     NOT NULL DEFAULT FALSE,
+    changed_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (site_id, entity, entity_id)
+);
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    site_id     INTEGER      NOT NULL,
+    key         VARCHAR(100) NOT NULL,
+    movement_id INTEGER,
+    created_at  TIMESTAMPTZ  DEFAULT NOW(),
+    PRIMARY KEY (site_id, key)
+);
+
+-- Index (voir app/models.py ; `python -m app.migrations` les crée aussi sur une base existante)
+CREATE INDEX IF NOT EXISTS ix_products_site_name          ON products (site_id, name);
+CREATE INDEX IF NOT EXISTS ix_products_site_category_name ON products (site_id, category, name);
+CREATE INDEX IF NOT EXISTS ix_products_site_low_stock     ON products (site_id, (quantity / CAST(NULLIF(min_threshold, 0) AS NUMERIC))) WHERE quantity < min_threshold;
+CREATE INDEX IF NOT EXISTS ix_movements_site_date_id      ON movements (site_id, date, id);
+CREATE INDEX IF NOT EXISTS ix_movements_product_date_id   ON movements (product_id, date, id);
+CREATE INDEX IF NOT EXISTS ix_movements_site_type_date_id ON movements (site_id, type, date, id);
+CREATE INDEX IF NOT EXISTS ix_lots_product_fefo           ON lots (product_id, expiry_date, id) WHERE quantity > 0;
+CREATE INDEX IF NOT EXISTS ix_lots_site_expiry            ON lots (site_id, expiry_date) WHERE quantity > 0;
+CREATE INDEX IF NOT EXISTS ix_sync_changes_site_seq       ON sync_changes (site_id, seq, entity, entity_id);
+
+-- Recherche (voir app/search.py) : sans accents, plein texte et trigrammes
+CREATE EXTENSION IF NOT EXISTS pg_trgm  WITH SCHEMA extensions;
+CREATE EXTENSION IF NOT EXISTS unaccent WITH SCHEMA extensions;
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT extensions.unaccent('extensions.unaccent'::regdictionary, $1) $$;
+CREATE INDEX IF NOT EXISTS ix_products_search_document ON products USING gin ((setweight(to_tsvector('french', f_unaccent(name)), 'A') || setweight(to_tsvector('french', f_unaccent(category)), 'B')));
+CREATE INDEX IF NOT EXISTS ix_products_name_trgm       ON products USING gin (f_unaccent(lower(name)) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_movements_comment_search ON movements USING gin (to_tsvector('french', f_unaccent(comment))) WHERE comment IS NOT NULL;
+
 -- Produits
 INSERT INTO products (name, category, quantity, unit, min_threshold, price_per_unit) VALUES
 ('Farine de blé T55',      'Épicerie',           120, 'kg',       50,  0.85),
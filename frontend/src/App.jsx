@@ -25,6 +25,21 @@ export default function App() {
       .finally(() => setLoading(false))
   }, [])
 
+  // Alertes poussées par le serveur (autres onglets, autres postes) : pas de polling
+  useEffect(() => {
+    return api.subscribeAlerts(event => {
+      if (event.status === null) {          // produit supprimé
+        setProducts(prev => prev.filter(p => p.id !== event.productId))
+      } else if (event.previousStatus === null) {   // produit créé ailleurs
+        api.getProducts().then(setProducts).catch(() => {})
+      } else {
+        setProducts(prev => prev.map(p => p.id === event.productId
+          ? { ...p, quantity: event.quantity, minThreshold: event.minThreshold }
+          : p))
+      }
+    })
+  }, [])
+
   const alertCount = useMemo(
     () => products.filter(p => p.quantity < p.minThreshold).length,
     [products]
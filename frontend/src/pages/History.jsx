@@ -1,7 +1,7 @@
 import { useState, useMemo } from 'react'
 import { Download, ArrowUpRight, ArrowDownRight, Filter, X } from 'lucide-react'
 import Layout from '../components/Layout'
-import { exportMovementsToExcel } from '../utils/exportExcel'
+import { api } from '../services/api'
 
 export default function History({ products, movements, alertCount }) {
   const [dateFrom,    setDateFrom]    = useState('')
@@ -26,6 +26,17 @@ export default function History({ products, movements, alertCount }) {
       })
   }, [movements, dateFrom, dateTo, typeFilter, productFilter])
 
+  // Export généré et envoyé en flux par le backend, avec les mêmes filtres
+  const exportExcel = () => {
+    const product = products.find(p => p.name === productFilter)
+    window.location.href = api.movementsExportUrl({
+      date_from:  dateFrom,
+      date_to:    dateTo,
+      type:       typeFilter !== 'Tous' ? typeFilter : null,
+      product_id: product?.id,
+    })
+  }
+
   const clearFilters = () => {
     setDateFrom('')
     setDateTo('')
@@ -93,7 +104,7 @@ export default function History({ products, movements, alertCount }) {
 
           <div className="ml-auto">
             <button
-              onClick={() => exportMovementsToExcel(filtered)}
+              onClick={exportExcel}
               className="flex items-center gap-2 px-4 py-2 bg-green-600 hover:bg-green-700 text-white text-sm font-medium rounded-lg transition-colors"
             >
               <Download size={15} />
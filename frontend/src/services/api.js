@@ -3,13 +3,28 @@
 // En prod : VITE_API_URL pointe vers le backend Render
 const BASE = import.meta.env.VITE_API_URL ?? ''
 
-async function request(method, path, body) {
-  const opts = { method, headers: {} }
+// Site courant (multi-site) : absent = site par défaut côté serveur
+const SITE_KEY = 'siteId'
+
+function currentSite() {
+  return localStorage.getItem(SITE_KEY)
+}
+
+// Jeton renvoyé par la dernière écriture : joint aux requêtes suivantes, il
+// évite de relire depuis un réplica qui n'aurait pas encore reçu cette écriture
+let readAfter = null
+
+async function request(method, path, body, headers = {}) {
+  const opts = { method, headers: { ...headers } }
+  const site = currentSite()
+  if (site) opts.headers['X-Site-Id'] = site
+  if (readAfter) opts.headers['X-Read-After'] = readAfter
   if (body !== undefined) {
     opts.headers['Content-Type'] = 'application/json'
     opts.body = JSON.stringify(body)
   }
   const res = await fetch(`${BASE}${path}`, opts)
+  readAfter = res.headers.get('X-Read-After') ?? readAfter
   if (!res.ok) {
     const detail = await res.text().catch(() => res.statusText)
     throw new Error(`${method} ${path} → ${res.status}: ${detail}`)
@@ -17,6 +32,12 @@ async function request(method, path, body) {
   return res.status === 204 ? null : res.json()
 }
 
+function queryString(params) {
+  return new URLSearchParams(
+    Object.fromEntries(Object.entries(params).filter(([, v]) => v != null && v !== ''))
+  ).toString()
+}
+
 // ─── Normalisation snake_case (API) → camelCase (frontend) ───────────────────
 
 function normalizeProduct(p) {
@@ -46,12 +67,28 @@ function normalizeMovement(m) {
 // ─── Méthodes exposées ────────────────────────────────────────────────────────
 
 export const api = {
+  // Sites
+  async getSites() {
+    return request('GET', '/api/sites')
+  },
+
+  setSite(id) {
+    if (id == null) localStorage.removeItem(SITE_KEY)
+    else localStorage.setItem(SITE_KEY, String(id))
+  },
+
   // Produits
   async getProducts() {
     const data = await request('GET', '/api/products')
     return data.map(normalizeProduct)
   },
 
+  // Recherche serveur (nom, catégorie, commentaires), sans accents, classée
+  async searchProducts(q, params = {}) {
+    const data = await request('GET', `/api/products/search?${queryString({ q, ...params })}`)
+    return data.map(normalizeProduct)
+  },
+
   async createProduct(product) {
     const data = await request('POST', '/api/products', {
       name:           product.name,
@@ -82,21 +119,133 @@ export const api = {
 
   // Mouvements
   async getMovements(params = {}) {
-    const qs = new URLSearchParams(
-      Object.fromEntries(Object.entries(params).filter(([, v]) => v != null))
-    ).toString()
+    const qs = queryString(params)
     const data = await request('GET', `/api/movements${qs ? '?' + qs : ''}`)
     return data.map(normalizeMovement)
   },
 
+  // Avec movement.idempotencyKey (généré une fois, réutilisé pour les
+  // nouvelles tentatives), un renvoi après expiration ne compte pas deux fois
   async createMovement(movement) {
+    const headers = movement.idempotencyKey ? { 'Idempotency-Key': movement.idempotencyKey } : {}
     const data = await request('POST', '/api/movements', {
       product_id: Number(movement.productId),
       type:       movement.type,
       quantity:   Number(movement.quantity),
       date:       movement.date,
       comment:    movement.comment || null,
-    })
+      // Entrée : lot reçu (numéro fournisseur, date limite de consommation)
+      lot_number:  movement.lotNumber || null,
+      expiry_date: movement.expiryDate || null,
+    }, headers)
     return normalizeMovement(data)
   },
+
+  // Saisie groupée (fin de service) : tous enregistrés, ou aucun
+  async createMovements(movements) {
+    const data = await request('POST', '/api/movements/batch', movements.map(m => ({
+      product_id: Number(m.productId),
+      type:       m.type,
+      quantity:   Number(m.quantity),
+      date:       m.date,
+      comment:    m.comment || null,
+      lot_number:  m.lotNumber || null,
+      expiry_date: m.expiryDate || null,
+    })))
+    return data.map(normalizeMovement)
+  },
+
+  // Synchronisation hors ligne : changements depuis `cursor` (null au premier
+  // appel). Si `reset`, recharger getProducts / getMovements puis reprendre
+  // au curseur renvoyé ; si `hasMore`, rappeler aussitôt.
+  async sync(cursor) {
+    const data = await request('GET', `/api/sync?${queryString({ cursor })}`)
+    return {
+      cursor:          data.cursor,
+      hasMore:         data.has_more,
+      reset:           data.reset,
+      products:        data.products.map(normalizeProduct),
+      movements:       data.movements.map(normalizeMovement),
+      deletedProducts: data.deleted_products,
+    }
+  },
+
+  // File de mouvements saisis hors ligne, chacun avec sa clé (crypto.randomUUID()
+  // à la saisie) : la renvoyer après une coupure ne compte rien deux fois
+  async pushMovements(queue) {
+    const data = await request('POST', '/api/sync/movements', queue.map(m => ({
+      idempotency_key: m.idempotencyKey,
+      product_id:      Number(m.productId),
+      type:            m.type,
+      quantity:        Number(m.quantity),
+      date:            m.date,
+      comment:         m.comment || null,
+      lot_number:      m.lotNumber || null,
+      expiry_date:     m.expiryDate || null,
+    })))
+    return data.map(r => ({
+      idempotencyKey: r.idempotency_key,
+      status:         r.status,
+      movement:       r.movement && normalizeMovement(r.movement),
+    }))
+  },
+
+  // Lots, dans l'ordre où les sorties les consomment (date limite la plus proche d'abord)
+  async getLots(params = {}) {
+    return request('GET', `/api/lots?${queryString(params)}`)
+  },
+
+  // Lots à consommer d'ici `within_days` jours (date dépassée comprise)
+  async getExpiringLots(params = {}) {
+    return request('GET', `/api/lots/expiring?${queryString(params)}`)
+  },
+
+  // Analyses (tableaux colonnes calculés côté serveur)
+  async getStockLevels(params = {}) {
+    return request('GET', `/api/analytics/stock-levels?${queryString(params)}`)
+  },
+
+  async getConsumption(params = {}) {
+    return request('GET', `/api/analytics/consumption?${queryString(params)}`)
+  },
+
+  async getTopConsumers(params = {}) {
+    return request('GET', `/api/analytics/top-consumers?${queryString(params)}`)
+  },
+
+  // Prévisions : date de rupture, seuil recommandé et quantité à commander
+  async getForecasts(params = {}) {
+    return request('GET', `/api/forecasts?${queryString(params)}`)
+  },
+
+  // Changements de statut de stock poussés par le serveur (Server-Sent Events).
+  // À la reconnexion, EventSource renvoie Last-Event-ID : rien n'est perdu.
+  // Renvoie la fonction de désabonnement.
+  subscribeAlerts(onEvent) {
+    const qs = queryString({ site_id: currentSite() })
+    const source = new EventSource(`${BASE}/api/alerts/stream${qs ? '?' + qs : ''}`)
+    source.addEventListener('alert', e => {
+      const event = JSON.parse(e.data)
+      onEvent({
+        id:             event.id,
+        productId:      event.product_id,
+        productName:    event.product_name,
+        previousStatus: event.previous_status,
+        status:         event.status,
+        quantity:       Number(event.quantity),
+        minThreshold:   Number(event.min_threshold),
+      })
+    })
+    return () => source.close()
+  },
+
+  // Exports générés côté serveur (format : 'xlsx' | 'csv') ; lien direct,
+  // donc site passé en paramètre plutôt qu'en en-tête
+  movementsExportUrl(params = {}, format = 'xlsx') {
+    return `${BASE}/api/movements/export?${queryString({ ...params, format, site_id: currentSite() })}`
+  },
+
+  productsExportUrl(params = {}, format = 'xlsx') {
+    return `${BASE}/api/products/export?${queryString({ ...params, format, site_id: currentSite() })}`
+  },
 }